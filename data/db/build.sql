@@ -161,3 +161,79 @@ CREATE TABLE IF NOT EXISTS balances (
     active INTEGER NOT NULL DEFAULT 1,
     FOREIGN KEY (guild_id) REFERENCES guilds(guild_id) ON DELETE CASCADE
 );
+
+--------------------------------------------------------------------------------
+
+-- Indexes for the lookups made on every message, member event and
+-- command, checked by `python src/benchmark.py queries`
+CREATE INDEX IF NOT EXISTS member_levels_guild_member
+    ON member_levels (guild_id, member_id);
+CREATE INDEX IF NOT EXISTS member_levels_guild_experience
+    ON member_levels (guild_id, experience);
+CREATE INDEX IF NOT EXISTS balances_guild_member
+    ON balances (guild_id, member_id);
+CREATE INDEX IF NOT EXISTS tickets_guild_active
+    ON tickets (guild_id, active);
+CREATE INDEX IF NOT EXISTS purposed_objects_guild_purpose
+    ON purposed_objects (guild_id, purpose_id);
+
+-- Birthdays are saved as DD/MM/YYYY, index them by the day and month
+-- so the daily check only reads the birthdays it celebrates
+CREATE INDEX IF NOT EXISTS user_birthdays_day
+    ON user_birthdays (substr(birthday, 1, 5));
+
+-- Timezone that each guild celebrates birthdays in, guilds without
+-- one use the default from constants.py
+CREATE TABLE IF NOT EXISTS guild_timezones (
+    guild_id INTEGER PRIMARY KEY,
+    timezone TEXT NOT NULL,
+    FOREIGN KEY (guild_id) REFERENCES guilds(guild_id) ON DELETE CASCADE
+);
+
+-- Where the transcript of a ticket's channel history is archived,
+-- written when the ticket is closed, see src/transcripts.py
+CREATE TABLE IF NOT EXISTS ticket_transcripts (
+    ticket_id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    messages INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (ticket_id) REFERENCES tickets(id) ON DELETE CASCADE
+);
+
+-- Full text search over tickets, the rowid is the ticket id. The guild
+-- id is indexed as a term so searches only match a guild's tickets.
+-- The description is kept in sync by the triggers below, the
+-- transcript is set from the archived messages, see src/transcripts.py
+CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts USING fts5 (
+    guild_id,
+    description,
+    transcript
+);
+
+CREATE TRIGGER IF NOT EXISTS tickets_fts_insert AFTER INSERT ON tickets
+BEGIN
+    INSERT INTO tickets_fts (rowid, guild_id, description, transcript)
+    VALUES (new.id, new.guild_id, new.description, '');
+END;
+
+CREATE TRIGGER IF NOT EXISTS tickets_fts_update
+AFTER UPDATE OF description ON tickets
+BEGIN
+    UPDATE tickets_fts SET description = new.description
+    WHERE rowid = new.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tickets_fts_delete AFTER DELETE ON tickets
+BEGIN
+    DELETE FROM tickets_fts WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS ticket_transcripts_fts_delete
+AFTER DELETE ON ticket_transcripts
+BEGIN
+    UPDATE tickets_fts SET transcript = '' WHERE rowid = old.ticket_id;
+END;
+
+-- Index the tickets made before the search existed
+INSERT INTO tickets_fts (rowid, guild_id, description, transcript)
+SELECT id, guild_id, description, '' FROM tickets
+WHERE id NOT IN (SELECT rowid FROM tickets_fts);
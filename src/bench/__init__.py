@@ -0,0 +1,127 @@
+"""
+Offline benchmarks for the bot, run them with src/benchmark.py
+
+Results are appended to a file per benchmark in the bench directory,
+tagged with the current git commit so that they can be compared.
+"""
+
+import json
+import time
+import logging
+import subprocess
+from pathlib import Path
+
+from constants import BENCH_PATH
+
+
+log = logging.getLogger(__name__)
+
+def git_commit() -> str:
+    """Get the short hash of the current git commit
+
+    Returns:
+        str: The commit hash, or "unknown" outside of a git repo.
+    """
+
+    try:
+        output = subprocess.run(
+            ("git", "rev-parse", "--short", "HEAD"),
+            capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+    return output.stdout.strip()
+
+def save_results(name:str, results:dict) -> Path:
+    """Save the results of a benchmark run
+
+    Args:
+        name (str): The name of the benchmark.
+        results (dict): The results, must be json serializable.
+
+    Returns:
+        Path: The file that the results were saved to.
+    """
+
+    Path(BENCH_PATH).mkdir(parents=True, exist_ok=True)
+    path = Path(BENCH_PATH, f"{name}.jsonl")
+
+    entry = {
+        "commit": git_commit(),
+        "timestamp": int(time.time()),
+        "results": results
+    }
+    with path.open("a", encoding="utf-8") as file:
+        file.write(json.dumps(entry) + "\n")
+
+    log.info("Saved %s results to %s", name, path)
+    return path
+
+def load_results(name:str) -> list[dict]:
+    """Load every saved run of a benchmark, oldest first
+
+    Args:
+        name (str): The name of the benchmark.
+
+    Returns:
+        list[dict]: The saved entries.
+    """
+
+    path = Path(BENCH_PATH, f"{name}.jsonl")
+    if not path.exists():
+        return []
+
+    with path.open("r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+def previous_results(name:str, commit:str=None) -> dict | None:
+    """Get the latest saved run of a benchmark from a different commit
+
+    Args:
+        name (str): The name of the benchmark.
+        commit (str, optional): Get the run from this commit instead.
+
+    Returns:
+        dict: The saved entry.
+        None: If there is no such run.
+    """
+
+    current = git_commit()
+    for entry in reversed(load_results(name)):
+        if commit and entry["commit"].startswith(commit):
+            return entry
+        if not commit and entry["commit"] != current:
+            return entry
+
+    return None
+
+def compare(current:dict, previous:dict, prefix:str="") -> list[tuple]:
+    """Compare the numbers of two sets of results
+
+    Args:
+        current (dict): The new results.
+        previous (dict): The results to compare against.
+        prefix (str, optional): Used for nested results.
+
+    Returns:
+        list[tuple]: Rows of (name, previous, current, change %).
+    """
+
+    rows = []
+    for key, value in current.items():
+        name = f"{prefix}{key}"
+        old = previous.get(key)
+
+        if isinstance(value, dict) and isinstance(old, dict):
+            rows.extend(compare(value, old, f"{name}."))
+            continue
+
+        if not isinstance(value, (int, float)) \
+            or not isinstance(old, (int, float)):
+            continue
+
+        change = (value - old) / old * 100 if old else 0.0
+        rows.append((name, old, value, f"{change:+.1f}%"))
+
+    return rows
@@ -0,0 +1,170 @@
+"""
+Offline cluster benchmark
+
+Runs the gateway replay in a cluster of processes under the real
+cluster supervisor, each cluster replaying the events of the guilds on
+its own shards into the same database. The results are collected over
+the supervisor's pipes, the way the clusters ask each other for stats.
+"""
+
+import os
+import asyncio
+import logging
+from time import perf_counter
+from multiprocessing.connection import Connection
+
+from db import db
+from bot._cluster import ClusterInfo, ClusterClient
+from bot._loop import install_uvloop
+from cluster import ClusterSupervisor
+from bench.gateway import PayloadFactory, DEFAULT_COGS, replay
+
+
+log = logging.getLogger(__name__)
+
+
+class _Finished:
+    """Stands in for the bot of a cluster once its replay is done, so
+    it can be asked for its results until the supervisor stops it"""
+
+    def __init__(self):
+        self.closed = asyncio.Event()
+
+    async def close(self):
+        self.closed.set()
+
+
+def run_worker(
+    info:ClusterInfo,
+    conn:Connection,
+    guilds:int,
+    members:int,
+    events:int,
+    seed:int,
+    crash:bool,
+    use_uvloop:bool
+):
+    """Replay the events of a cluster's shards, in its own process
+
+    Args:
+        info (ClusterInfo): What this cluster runs.
+        conn (Connection): The pipe to the supervisor.
+        guilds (int): The number of guilds on every shard together.
+        members (int): The number of members per guild.
+        events (int): The number of events per cluster.
+        seed (int): The random seed.
+        crash (bool): Crash the first cluster once, before it replays.
+        use_uvloop (bool): Replay on uvloop, if it's installed.
+    """
+
+    if crash and info.cluster_id == 0 and info.attempt == 0:
+        os._exit(1)
+
+    db.share()
+
+    if use_uvloop:
+        install_uvloop()
+
+    asyncio.run(_replay_cluster(info, conn, guilds, members, events, seed))
+
+async def _replay_cluster(
+    info:ClusterInfo,
+    conn:Connection,
+    guilds:int,
+    members:int,
+    events:int,
+    seed:int
+):
+    """Replay the events, then answer with the results until stopped"""
+
+    factory = PayloadFactory(
+        guilds, members, seed + info.cluster_id, info.shard_count
+    )
+    factory.only_shards(info.shard_ids)
+
+    results = await replay(factory.events(events), factory, DEFAULT_COGS)
+    results["shards"] = list(info.shard_ids)
+    results["guilds"] = len(factory.guild_ids)
+    results["attempt"] = info.attempt
+
+    async def answer() -> dict:
+        return results
+
+    finished = _Finished()
+    client = ClusterClient(finished, info, conn)
+    client.add_handler("replay", answer)
+    client.start()
+    client.ready()
+
+    await finished.closed.wait()
+    client.stop()
+
+async def run(
+    clusters:int=2,
+    shard_count:int=4,
+    guilds:int=20,
+    members:int=100,
+    events:int=5_000,
+    seed:int=0,
+    crash:bool=False,
+    use_uvloop:bool=False
+) -> dict:
+    """Run the cluster benchmark
+
+    Args:
+        clusters (int, optional): The number of clusters.
+        shard_count (int, optional): The total number of shards.
+        guilds (int, optional): The number of guilds.
+        members (int, optional): The number of members per guild.
+        events (int, optional): The number of events per cluster.
+        seed (int, optional): The random seed.
+        crash (bool, optional): Crash the first cluster once, to see
+            that it's restarted.
+        use_uvloop (bool, optional): Run the clusters on uvloop.
+
+    Returns:
+        dict: The results of the benchmark.
+    """
+
+    # No identify rate limit offline, the clusters start together
+    supervisor = ClusterSupervisor(
+        run_worker, clusters, shard_count,
+        args=(guilds, members, events, seed, crash, use_uvloop),
+        identify_interval=0,
+        restart_delay=0.5
+    )
+
+    start = perf_counter()
+    task = asyncio.create_task(supervisor.run())
+    await asyncio.gather(
+        *(worker.ready.wait() for worker in supervisor.workers)
+    )
+    elapsed = perf_counter() - start
+
+    answers = await supervisor.query("replay")
+    supervisor.stop()
+    await task
+
+    total = sum(answer["events"] for answer in answers.values())
+    return {
+        "clusters": clusters,
+        "shards": shard_count,
+        "events": total,
+        "seconds": round(elapsed, 4),
+        "events_per_second": round(total / elapsed, 2) if elapsed else 0,
+        "handler_errors": sum(
+            answer["handler_errors"] for answer in answers.values()
+        ),
+        "db_writes": sum(answer["db_writes"] for answer in answers.values()),
+        "restarts": sum(worker.restarts for worker in supervisor.workers),
+        "cluster_results": {
+            cluster_id: {
+                "shards": answer["shards"],
+                "guilds": answer["guilds"],
+                "attempt": answer["attempt"],
+                "events_per_second": answer["events_per_second"],
+                "handler_errors": answer["handler_errors"],
+            }
+            for cluster_id, answer in sorted(answers.items())
+        }
+    }
@@ -0,0 +1,757 @@
+"""
+Offline gateway replay harness
+
+Replays gateway events through the real cog listeners without a
+connection to discord. The events are raw gateway payloads, so they
+are parsed by discord.py exactly as they would be in production, and
+REST calls are answered by a local HTTP stub.
+"""
+
+import re
+import json
+import random
+import logging
+import asyncio
+import importlib
+from time import perf_counter
+from datetime import datetime, timezone
+from itertools import count
+from collections import Counter, deque
+from typing import Iterable, Iterator
+
+import discord
+from aiohttp import web
+
+from db import db
+from bot import Bot
+from bot._stats import LatencyStats
+from bench.levelcards import peak_rss_kb
+from ext import BaseCog
+
+
+log = logging.getLogger(__name__)
+
+# The cogs that are loaded by default, by extension name
+DEFAULT_COGS = ("levels", "economy", "guild_logs", "welcome")
+
+# Default weights for each type of generated event
+DEFAULT_MIX = {
+    "MESSAGE_CREATE": 80,
+    "MESSAGE_UPDATE": 6,
+    "MESSAGE_DELETE": 6,
+    "GUILD_MEMBER_ADD": 4,
+    "GUILD_MEMBER_REMOVE": 4,
+}
+
+# Channel layout of every synthetic guild
+_CHANNELS = ("general", "guildlogs", "welcome", "goodbye", "botlogs")
+
+# Guild ids are this plus the guild's index in the timestamp bits, so
+# consecutive guilds are on consecutive shards
+_GUILD_BASE = 200_000_000_000_000_000
+
+
+def _timestamp() -> str:
+    """The current time as a discord timestamp"""
+
+    return datetime.now(timezone.utc).isoformat()
+
+
+class PayloadFactory:
+    """Builds raw gateway payloads for synthetic guilds, members and
+    messages. Keeps track of what exists so that edits, deletes and
+    leaves refer to real objects."""
+
+    def __init__(
+        self,
+        guilds:int=10,
+        members:int=100,
+        seed:int=0,
+        shard_count:int=1,
+        chunked:bool=False
+    ):
+        self.random = random.Random(seed)
+        self._snowflakes = count(100_000_000_000_000_000)
+
+        self.bot_user = self.user(self.snowflake(), bot=True)
+        self.application_id = int(self.bot_user["id"])
+
+        # Whether GUILD_CREATE has every member, like a guild that's
+        # chunked at startup, or only the bot, like a large guild
+        self.chunked = chunked
+
+        self.shard_count = shard_count
+        self.shard_ids = list(range(shard_count))
+        self.guild_ids = [
+            _GUILD_BASE + (index << 22) for index in range(guilds)
+        ]
+        self.channels: dict[int, dict[str, int]] = {}
+        self.members: dict[int, list[int]] = {}
+        self.messages: dict[int, deque[tuple[int, int, int]]] = {}
+        self._ready: list[tuple[str, dict]] = None
+
+        for guild_id in self.guild_ids:
+            self.channels[guild_id] = {
+                name: self.snowflake() for name in _CHANNELS
+            }
+            self.members[guild_id] = [
+                self.snowflake() for _ in range(members)
+            ]
+            self.messages[guild_id] = deque(maxlen=500)
+
+    def snowflake(self) -> int:
+        """Get a new unique id"""
+
+        return next(self._snowflakes)
+
+    def shard_of(self, guild_id:int) -> int:
+        """The shard a guild is on, worked out the way discord does"""
+
+        return (guild_id >> 22) % self.shard_count
+
+    def only_shards(self, shard_ids:Iterable[int]):
+        """Only make events for the guilds of some of the shards, like
+        the gateway connections of a cluster would receive
+
+        Args:
+            shard_ids (Iterable[int]): The shard IDs.
+        """
+
+        self.shard_ids = list(shard_ids)
+        self.guild_ids = [
+            guild_id for guild_id in self.guild_ids
+            if self.shard_of(guild_id) in self.shard_ids
+        ]
+        for guilds in (self.channels, self.members, self.messages):
+            for guild_id in list(guilds):
+                if guild_id not in self.guild_ids:
+                    del guilds[guild_id]
+
+    def user(self, user_id:int, bot:bool=False) -> dict:
+        """User payload"""
+
+        return {
+            "id": str(user_id),
+            "username": f"user{user_id % 100_000}",
+            "discriminator": f"{user_id % 10_000:04}",
+            "avatar": None,
+            "bot": bot,
+            "public_flags": 0
+        }
+
+    def member(self, user_id:int, guild_id:int=None) -> dict:
+        """Guild member payload"""
+
+        data = {
+            "user": self.user(user_id),
+            "nick": None,
+            "avatar": None,
+            "roles": [],
+            "joined_at": _timestamp(),
+            "premium_since": None,
+            "deaf": False,
+            "mute": False,
+            "pending": False,
+            "communication_disabled_until": None
+        }
+        if guild_id:
+            data["guild_id"] = str(guild_id)
+
+        return data
+
+    def channel(self, channel_id:int, guild_id:int, name:str, position:int) -> dict:
+        """Text channel payload"""
+
+        return {
+            "id": str(channel_id),
+            "guild_id": str(guild_id),
+            "type": 0,
+            "name": name,
+            "position": position,
+            "permission_overwrites": [],
+            "nsfw": False,
+            "parent_id": None,
+            "topic": None,
+            "last_message_id": None,
+            "rate_limit_per_user": 0
+        }
+
+    def guild(self, guild_id:int) -> dict:
+        """Full guild payload, as sent in GUILD_CREATE"""
+
+        member_ids = self.members[guild_id] if self.chunked else ()
+        members = [self.member(uid) for uid in member_ids]
+        members.append(self.member(int(self.bot_user["id"])))
+        members[-1]["user"] = self.bot_user
+
+        return {
+            "id": str(guild_id),
+            "name": f"guild{guild_id % 100_000}",
+            "icon": None,
+            "owner_id": self.bot_user["id"],
+            "unavailable": False,
+            "large": not self.chunked,
+            "member_count": len(self.members[guild_id]) + 1,
+            "roles": [{
+                "id": str(guild_id),
+                "name": "@everyone",
+                "permissions": str(discord.Permissions.all().value),
+                "position": 0,
+                "color": 0,
+                "hoist": False,
+                "managed": False,
+                "mentionable": False
+            }],
+            "channels": [
+                self.channel(channel_id, guild_id, name, position)
+                for position, (name, channel_id)
+                in enumerate(self.channels[guild_id].items())
+            ],
+            "members": members,
+            "presences": [],
+            "voice_states": [],
+            "threads": [],
+            "emojis": [],
+            "stickers": [],
+            "features": [],
+            "stage_instances": [],
+            "guild_scheduled_events": [],
+            "premium_tier": 0,
+            "mfa_level": 0,
+            "verification_level": 0,
+            "explicit_content_filter": 0,
+            "default_message_notifications": 0,
+            "system_channel_flags": 0,
+            "preferred_locale": "en-US",
+            "afk_timeout": 300,
+            "nsfw_level": 0,
+            "premium_progress_bar_enabled": False
+        }
+
+    def load_ready(self, events:Iterator[tuple[str, dict]]):
+        """Take the connection events from the start of a recorded
+        stream, so that the guilds match the events that follow.
+
+        Args:
+            events (Iterator[tuple[str, dict]]): The recorded stream,
+                it is left at the first event after the connection.
+        """
+
+        event, ready = next(events)
+        if event != "READY":
+            raise ValueError(f"Stream must start with READY, not {event}")
+
+        self._ready = [(event, ready)]
+        self.bot_user = ready["user"]
+        self.application_id = int(ready["application"]["id"])
+        self.guild_ids = [int(guild["id"]) for guild in ready["guilds"]]
+        self.channels = {}
+
+        for _ in self.guild_ids:
+            event, guild = next(events)
+            self._ready.append((event, guild))
+            self.channels[int(guild["id"])] = {
+                channel["name"]: int(channel["id"])
+                for channel in guild["channels"]
+            }
+
+    def ready(self) -> list[tuple[str, dict]]:
+        """The events sent when connecting, for each shard a READY and
+        a GUILD_CREATE for every guild on it."""
+
+        if self._ready:
+            return self._ready
+
+        events = []
+        for shard_id in self.shard_ids:
+            guild_ids = [
+                guild_id for guild_id in self.guild_ids
+                if self.shard_of(guild_id) == shard_id
+            ]
+            events.append(("READY", {
+                "v": 10,
+                "user": self.bot_user,
+                "guilds": [
+                    {"id": str(guild_id), "unavailable": True}
+                    for guild_id in guild_ids
+                ],
+                "session_id": f"replay-{shard_id}",
+                "shard": [shard_id, self.shard_count],
+                "application": {"id": str(self.application_id), "flags": 0}
+            }))
+            events.extend(
+                ("GUILD_CREATE", self.guild(guild_id))
+                for guild_id in guild_ids
+            )
+
+        return events
+
+    def message(self, guild_id:int | None, channel_id:int, author_id:int, **extra) -> dict:
+        """Message payload"""
+
+        data = {
+            "id": str(self.snowflake()),
+            "channel_id": str(channel_id),
+            "author": self.user(author_id),
+            "member": {
+                key: value for key, value
+                in self.member(author_id).items() if key != "user"
+            },
+            "content": " ".join(
+                self.random.choice(("hello", "gg", "lol", "nice", "ok"))
+                for _ in range(self.random.randint(1, 12))
+            ),
+            "timestamp": _timestamp(),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": [],
+            "pinned": False,
+            "type": 0
+        }
+        if guild_id:
+            data["guild_id"] = str(guild_id)
+
+        data.update(extra)
+        return data
+
+    def event(self, kind:str) -> tuple[str, dict] | None:
+        """Generate a single event
+
+        Args:
+            kind (str): The gateway event name.
+
+        Returns:
+            tuple[str, dict]: The event name and payload.
+            None: If the event can't happen right now.
+        """
+
+        guild_id = self.random.choice(self.guild_ids)
+        members = self.members[guild_id]
+        messages = self.messages[guild_id]
+
+        match kind:
+
+            case "MESSAGE_CREATE":
+                if not members:
+                    return None
+
+                channel_id = self.channels[guild_id]["general"]
+                data = self.message(
+                    guild_id, channel_id, self.random.choice(members)
+                )
+                messages.append(
+                    (int(data["id"]), channel_id, int(data["author"]["id"]))
+                )
+                return kind, data
+
+            case "MESSAGE_UPDATE":
+                if not messages:
+                    return None
+
+                message_id, channel_id, author_id = self.random.choice(messages)
+                data = self.message(
+                    guild_id, channel_id, author_id,
+                    id=str(message_id),
+                    edited_timestamp=_timestamp()
+                )
+                return kind, data
+
+            case "MESSAGE_DELETE":
+                if not messages:
+                    return None
+
+                message_id, channel_id, _ = messages.popleft()
+                return kind, {
+                    "id": str(message_id),
+                    "channel_id": str(channel_id),
+                    "guild_id": str(guild_id)
+                }
+
+            case "GUILD_MEMBER_ADD":
+                user_id = self.snowflake()
+                members.append(user_id)
+                return kind, self.member(user_id, guild_id)
+
+            case "GUILD_MEMBER_REMOVE":
+                if not members:
+                    return None
+
+                user_id = members.pop(self.random.randrange(len(members)))
+                return kind, {
+                    "guild_id": str(guild_id),
+                    "user": self.user(user_id)
+                }
+
+        raise ValueError(f"Unknown event: {kind}")
+
+    def events(self, amount:int, mix:dict[str, int]=None) -> Iterator[tuple[str, dict]]:
+        """Generate a stream of events
+
+        Args:
+            amount (int): The number of events.
+            mix (dict[str, int], optional): Weight of each event type.
+
+        Yields:
+            tuple[str, dict]: The event name and payload.
+        """
+
+        mix = mix or DEFAULT_MIX
+        kinds, weights = zip(*mix.items())
+
+        generated = 0
+        while generated < amount:
+            event = self.event(self.random.choices(kinds, weights)[0])
+            if event is None:
+                continue
+
+            generated += 1
+            yield event
+
+    def purposes(self) -> list[tuple[str, int, int]]:
+        """The purposed objects of every guild, as tuples of
+        (purpose name, object id, guild id)"""
+
+        return [
+            (name, channel_id, guild_id)
+            for guild_id, channels in self.channels.items()
+            for name, channel_id in channels.items()
+        ]
+
+
+def read_events(path:str) -> Iterator[tuple[str, dict]]:
+    """Read a recorded event stream, one json object per line with
+    the gateway event name as "t" and payload as "d".
+
+    Args:
+        path (str): The file to read.
+    """
+
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                event = json.loads(line)
+                yield event["t"], event["d"]
+
+def write_events(path:str, events:Iterable[tuple[str, dict]]):
+    """Record an event stream so that it can be replayed later
+
+    Args:
+        path (str): The file to write.
+        events (Iterable[tuple[str, dict]]): The events.
+    """
+
+    with open(path, "w", encoding="utf-8") as file:
+        for event, data in events:
+            file.write(json.dumps({"t": event, "d": data}) + "\n")
+
+
+class RestStub:
+    """Local HTTP server that answers the REST calls made by the bot"""
+
+    def __init__(self, factory:PayloadFactory):
+        self.factory = factory
+        self.calls: Counter[str] = Counter()
+        self._runner: web.AppRunner = None
+
+    async def start(self) -> str:
+        """Start the server
+
+        Returns:
+            str: The base url for the API.
+        """
+
+        app = web.Application()
+        app.router.add_route("*", "/{path:.*}", self._handle)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/api/v10"
+
+    async def close(self):
+        """Stop the server"""
+
+        await self._runner.cleanup()
+
+    def _json(self, data, status:int=200) -> web.Response:
+        # discord.py only decodes an exact application/json content type
+        return web.Response(
+            body=json.dumps(data).encode(),
+            status=status,
+            headers={"Content-Type": "application/json"}
+        )
+
+    async def _handle(self, request:web.Request) -> web.Response:
+        path = request.path.removeprefix("/api/v10")
+        route = re.sub(r"\d{5,}", "{id}", path)
+        self.calls[f"{request.method} {route}"] += 1
+
+        match request.method, route:
+
+            case "GET", "/users/@me":
+                return self._json(self.factory.bot_user)
+
+            case "GET", "/oauth2/applications/@me":
+                return self._json({
+                    "id": str(self.factory.application_id),
+                    "name": "OneBot",
+                    "icon": None,
+                    "description": "",
+                    "rpc_origins": [],
+                    "bot_public": True,
+                    "bot_require_code_grant": False,
+                    "owner": self.factory.bot_user,
+                    "summary": "",
+                    "verify_key": "",
+                    "flags": 0
+                })
+
+            case "POST", "/channels/{id}/messages":
+                channel_id = int(path.split("/")[2])
+                return self._json(self.factory.message(
+                    None, channel_id, self.factory.application_id,
+                    author=self.factory.bot_user
+                ))
+
+            case "POST", "/channels/{id}/webhooks":
+                channel_id = path.split("/")[2]
+                return self._json({
+                    "id": str(int(channel_id) + 1),
+                    "type": 1,
+                    "channel_id": channel_id,
+                    "guild_id": None,
+                    "name": (await request.json())["name"],
+                    "avatar": None,
+                    "token": "replay",
+                    "user": self.factory.bot_user
+                })
+
+            case "GET", "/channels/{id}/webhooks":
+                return self._json([])
+
+            case "POST", "/webhooks/{id}/replay":
+                return web.Response(status=204)
+
+            case ("PUT", "/applications/{id}/commands") \
+                | ("GET", "/applications/{id}/commands"):
+                return self._json([])
+
+        if request.method == "GET":
+            return self._json(
+                {"message": "Unknown", "code": 10000},
+                status=404
+            )
+
+        if request.method == "DELETE":
+            return web.Response(status=204)
+
+        return self._json({})
+
+
+class ReplayBot(Bot):
+    """Bot that measures the time taken by every event handler"""
+
+    def __init__(self, **kwargs):
+        # The offline gateway is a single shard by default
+        kwargs.setdefault("shard_count", 1)
+        kwargs.setdefault("shard_ids", [0])
+        super().__init__(**kwargs)
+
+        self.handler_latency: dict[str, LatencyStats] = {}
+        self.handler_errors = 0
+        self._pending: set[asyncio.Task] = set()
+
+    def _schedule_event(self, coro, event_name, *args, **kwargs):
+        task = super()._schedule_event(coro, event_name, *args, **kwargs)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return task
+
+    async def _run_event(self, coro, event_name, *args, **kwargs):
+        start = perf_counter()
+
+        try:
+            await coro(*args, **kwargs)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            self.handler_errors += 1
+            await self.on_error(event_name, *args, **kwargs)
+        finally:
+            name = getattr(coro, "__qualname__", event_name)
+            stats = self.handler_latency.get(name)
+            if stats is None:
+                stats = self.handler_latency[name] = LatencyStats()
+            stats.record(perf_counter() - start)
+
+    async def drain(self):
+        """Wait for every scheduled event handler to finish"""
+
+        while self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def reset_stats(self):
+        """Forget the handler stats recorded so far"""
+
+        self.handler_latency.clear()
+        self.handler_errors = 0
+
+    async def load_replay_cogs(self, names:Iterable[str]):
+        """Add the cogs from the given extensions, whether or not the
+        extension's setup function adds them.
+
+        Args:
+            names (Iterable[str]): The extension names.
+        """
+
+        for name in names:
+            module = importlib.import_module(f"ext.{name}")
+            for obj in vars(module).values():
+                if isinstance(obj, type) and issubclass(obj, BaseCog) \
+                    and obj.__module__ == module.__name__:
+                    await self.add_cog(obj(self))
+                    log.info("Loaded cog %s", obj.__name__)
+
+
+class _WriteCounter:
+    """Counts the statements that write to the database"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, statement:str):
+        if statement.lstrip().upper().startswith(
+            ("INSERT", "UPDATE", "DELETE", "REPLACE")
+        ):
+            self.count += 1
+
+
+def _seed_database(factory:PayloadFactory):
+    """Add the synthetic guilds and their purposed channels"""
+
+    db.multiexec(
+        "INSERT OR IGNORE INTO guilds (guild_id) VALUES (?)",
+        [(guild_id,) for guild_id in factory.guild_ids]
+    )
+    db.multiexec(
+        "INSERT INTO purposed_objects (purpose_id, object_id, guild_id) "
+        "VALUES ((SELECT id FROM purposes WHERE name = ?), ?, ?)",
+        factory.purposes()
+    )
+    db.commit()
+
+
+def _summary(bot:ReplayBot, elapsed:float, events:int) -> dict:
+    """Summarize the handler stats"""
+
+    return {
+        "events": events,
+        "seconds": round(elapsed, 4),
+        "events_per_second": round(events / elapsed, 2) if elapsed else 0,
+        "handler_errors": bot.handler_errors,
+        "handlers": {
+            name: {
+                "calls": stats.count,
+                "p50_ms": round(stats.percentile(50) * 1000, 3),
+                "p99_ms": round(stats.percentile(99) * 1000, 3),
+            }
+            for name, stats in sorted(bot.handler_latency.items())
+        }
+    }
+
+
+async def replay(
+    events:Iterable[tuple[str, dict]],
+    factory:PayloadFactory,
+    cogs:Iterable[str]=DEFAULT_COGS,
+    rate:float=0
+) -> dict:
+    """Connect the bot to the offline gateway and replay the events
+
+    Args:
+        events (Iterable[tuple[str, dict]]): The events to replay.
+        factory (PayloadFactory): The factory that made the events.
+        cogs (Iterable[str], optional): The extensions to load.
+        rate (float, optional): Events per second, 0 for as fast as
+            possible. Defaults to 0.
+
+    Returns:
+        dict: The results of the replay.
+    """
+
+    _seed_database(factory)
+
+    stub = RestStub(factory)
+    discord.http.Route.BASE = await stub.start()
+
+    writes = _WriteCounter()
+    db.conn.set_trace_callback(writes)
+
+    try:
+        async with ReplayBot(
+            shard_count=factory.shard_count,
+            shard_ids=factory.shard_ids
+        ) as bot:
+            await bot.load_replay_cogs(cogs)
+            await bot.login("replay")
+
+            # Connect, all startup tasks are run here
+            state = bot._connection
+            state.guild_ready_timeout = 0.1
+
+            # Normally set when the shards are launched
+            state.shard_count = bot.shard_count
+            state.shard_ids = bot.shard_ids
+
+            start = perf_counter()
+            rss_before = peak_rss_kb()
+            for event, data in factory.ready():
+                state.parsers[event](data)
+
+            await bot.wait_until_ready()
+            await bot.drain()
+            startup = _summary(bot, perf_counter() - start, 0)
+            startup["db_writes"] = writes.count
+            startup["members_cached"] = sum(
+                len(guild.members) for guild in bot.guilds
+            )
+            startup["peak_rss_growth_kb"] = peak_rss_kb() - rss_before
+
+            bot.reset_stats()
+            writes.count = 0
+            total = 0
+
+            # Replay the events at the given rate
+            start = perf_counter()
+            for total, (event, data) in enumerate(events, start=1):
+                if rate:
+                    delay = start + total / rate - perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+                state.parsers[event](data)
+
+                # Let the handlers run while we are generating events
+                if total % 100 == 0:
+                    await asyncio.sleep(0)
+
+            await bot.drain()
+            await bot.outbox.join()
+            results = _summary(bot, perf_counter() - start, total)
+            results["db_writes"] = writes.count
+            results["startup"] = startup
+            results["rest_calls"] = dict(stub.calls.most_common())
+            results["loop"] = type(asyncio.get_running_loop()).__module__
+
+    finally:
+        db.conn.set_trace_callback(None)
+        await stub.close()
+
+    return results
@@ -0,0 +1,327 @@
+"""
+Levelcard render benchmark
+
+Renders the level cards and scoreboard for synthetic members with
+avatars generated locally, so no network is involved. Every drawing
+stage is timed on its own, along with the encoding to png.
+"""
+
+import sys
+import random
+import logging
+import inspect
+from io import BytesIO
+from time import perf_counter
+from functools import wraps
+from dataclasses import dataclass
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+from discord import Status, Colour
+from PIL import Image
+
+from db import db, MemberLevelModel
+from bot._stats import LatencyStats
+from ui import LevelCard, LevelUpCard, ScoreBoard
+
+
+log = logging.getLogger(__name__)
+
+# The drawing methods that make up each stage of a render
+STAGES = {
+    "colours": ("define_colours",),
+    "accent": ("_draw_accent_polygon",),
+    "avatar": ("_draw_avatar",),
+    "status": ("_draw_status_icon",),
+    "bar": ("_draw_progress_bar",),
+    "text": ("_draw_name", "_draw_exp", "_draw_levelrank"),
+    "resize": ("antialias_resize",),
+}
+
+_GUILD_ID = 1
+
+
+def peak_rss_kb() -> int:
+    """Get the peak resident memory of this process
+
+    Returns:
+        int: The peak in kilobytes, 0 if it can't be measured.
+    """
+
+    if resource is None:
+        return 0
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # macOS reports bytes, everywhere else uses kilobytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+@dataclass
+class SyntheticMember:
+    """Stands in for a discord.Member, with only what the cards use"""
+
+    id: int
+    display_name: str
+    discriminator: str
+    status: Status
+    colour: Colour
+    avatar: bytes
+
+
+def make_avatar(rng:random.Random, size:int) -> bytes:
+    """Generate an avatar fixture
+
+    Args:
+        rng (random.Random): Source of the colours.
+        size (int): Width and height of the avatar.
+
+    Returns:
+        bytes: The avatar encoded as png, like a real one.
+    """
+
+    # A gradient with some noise compresses about as well as a photo
+    gradient = Image.radial_gradient("L").resize((size, size))
+    noise = Image.effect_noise((size, size), 48)
+    colour = tuple(rng.randrange(256) for _ in range(3))
+
+    base = Image.blend(gradient, noise, 0.3)
+    image = Image.merge("RGB", [
+        base.point(lambda p, c=c: p * c // 255) for c in colour
+    ])
+
+    output = BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+def make_members(
+    amount:int,
+    avatar_size:int=256,
+    seed:int=0
+) -> list[tuple[SyntheticMember, MemberLevelModel]]:
+    """Create synthetic members and their levels, and save the levels
+    to the database so that their ranks can be looked up.
+
+    Args:
+        amount (int): The number of members.
+        avatar_size (int, optional): Size of the avatars. Defaults to 256.
+        seed (int, optional): Seed for the random values. Defaults to 0.
+
+    Returns:
+        list[tuple[SyntheticMember, MemberLevelModel]]: The members.
+    """
+
+    rng = random.Random(seed)
+    statuses = (Status.online, Status.idle, Status.dnd, Status.offline)
+    colours = (Colour.default(), Colour.blurple(), Colour.teal())
+
+    members = []
+    for i in range(amount):
+        member = SyntheticMember(
+            id=1000 + i,
+            display_name=f"Member {i}" + "x" * rng.randrange(12),
+            discriminator=f"{rng.randrange(10_000):04}",
+            status=statuses[i % len(statuses)],
+            colour=colours[i % len(colours)],
+            avatar=make_avatar(rng, avatar_size)
+        )
+        level = MemberLevelModel(member.id, _GUILD_ID, rng.randrange(10, 500_000))
+        members.append((member, level))
+
+    db.execute("INSERT OR IGNORE INTO guilds (guild_id) VALUES (?)", _GUILD_ID)
+    db.multiexec(
+        "INSERT INTO member_levels (member_id, guild_id, experience) "
+        "VALUES (?, ?, ?)",
+        [(member.id, _GUILD_ID, level.xp_raw) for member, level in members]
+    )
+    db.commit()
+
+    return members
+
+
+class StageTimer:
+    """Collects the time and memory used by each stage of a render"""
+
+    def __init__(self):
+        self.stages = {stage: LatencyStats() for stage in STAGES}
+        self.stages["encode"] = LatencyStats()
+        self.total = LatencyStats()
+        self.rss_growth_kb = dict.fromkeys(self.stages, 0)
+        self.encoded_bytes: list[int] = []
+        self._render: dict[str, float] = {}
+
+    def add(self, stage:str, seconds:float, rss_before:int):
+        """Add the time taken by a call to the current render"""
+
+        self._render[stage] = self._render.get(stage, 0.0) + seconds
+        self.rss_growth_kb[stage] += peak_rss_kb() - rss_before
+
+    def finish(self, seconds:float, encoded:int, record:bool=True):
+        """Finish the current render
+
+        Args:
+            seconds (float): Total time of the render.
+            encoded (int): Size of the encoded image in bytes.
+            record (bool, optional): False for warmup renders.
+        """
+
+        if record:
+            self.total.record(seconds)
+            self.encoded_bytes.append(encoded)
+            for stage, taken in self._render.items():
+                self.stages[stage].record(taken)
+
+        self._render.clear()
+
+    def results(self) -> dict:
+        """Summarize the collected stats"""
+
+        def summary(stats:LatencyStats) -> dict:
+            samples = stats.samples
+            return {
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+                "p50_ms": round(stats.percentile(50) * 1000, 3),
+                "p95_ms": round(stats.percentile(95) * 1000, 3),
+            }
+
+        return {
+            "renders": self.total.count,
+            "total": summary(self.total),
+            "stages": {
+                stage: summary(stats)
+                for stage, stats in self.stages.items() if stats.count
+            },
+            "peak_rss_growth_kb": {
+                stage: growth
+                for stage, growth in self.rss_growth_kb.items() if growth
+            },
+            "encoded_bytes": sum(self.encoded_bytes) // len(self.encoded_bytes)
+        }
+
+
+def _timed(method, stage:str, timer:StageTimer):
+    """Wrap a drawing method so that it adds its time to the timer"""
+
+    if inspect.iscoroutinefunction(method):
+        @wraps(method)
+        async def wrapper(*args, **kwargs):
+            rss = peak_rss_kb()
+            start = perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                timer.add(stage, perf_counter() - start, rss)
+
+        return wrapper
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        rss = peak_rss_kb()
+        start = perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            timer.add(stage, perf_counter() - start, rss)
+
+    return wrapper
+
+def timed_card(cls:type, timer:StageTimer) -> type:
+    """Create a subclass of a card that times its drawing stages and
+    loads the avatar from the synthetic member instead of the network.
+
+    Args:
+        cls (type): The card class.
+        timer (StageTimer): Where the times are collected.
+
+    Returns:
+        type: The subclass.
+    """
+
+    async def _load_avatar(self) -> Image.Image:
+        return Image.open(BytesIO(self.member.avatar)).convert("RGBA")
+
+    namespace = {"_load_avatar": _load_avatar}
+    for stage, methods in STAGES.items():
+        for name in methods:
+            if hasattr(cls, name):
+                namespace[name] = _timed(getattr(cls, name), stage, timer)
+
+    return type(f"Timed{cls.__name__}", (cls,), namespace)
+
+
+async def _render(timer:StageTimer, create, iterations:int, warmup:int):
+    """Render and encode cards, recording the stats of each"""
+
+    for i in range(warmup + iterations):
+        card = create(i)
+
+        start = perf_counter()
+        await card.draw()
+
+        rss = peak_rss_kb()
+        encode_start = perf_counter()
+        encoded = card.editor.image_bytes.getbuffer().nbytes
+        timer.add("encode", perf_counter() - encode_start, rss)
+
+        timer.finish(perf_counter() - start, encoded, record=i >= warmup)
+
+async def run(
+    iterations:int=20,
+    members:int=12,
+    board_size:int=6,
+    avatar_size:int=256,
+    warmup:int=2
+) -> dict:
+    """Benchmark the levelcard, level up card and scoreboard
+
+    Args:
+        iterations (int, optional): Renders of each card. Defaults to 20.
+        members (int, optional): Synthetic members to cycle through.
+            Defaults to 12.
+        board_size (int, optional): Members on the scoreboard.
+            Defaults to 6.
+        avatar_size (int, optional): Size of the avatars. Defaults to 256.
+        warmup (int, optional): Renders before recording. Defaults to 2.
+
+    Returns:
+        dict: The results for each card.
+    """
+
+    pairs = make_members(max(members, board_size), avatar_size)
+    results = {}
+
+    timer = StageTimer()
+    card_cls = timed_card(LevelCard, timer)
+    await _render(
+        timer, lambda i: card_cls(*pairs[i % len(pairs)]),
+        iterations, warmup
+    )
+    results["levelcard"] = timer.results()
+
+    timer = StageTimer()
+    card_cls = timed_card(LevelUpCard, timer)
+    await _render(
+        timer, lambda i: card_cls(*pairs[i % len(pairs)]),
+        iterations, warmup
+    )
+    results["levelupcard"] = timer.results()
+
+    # The scoreboard creates a card for each member, so those need
+    # to be timed too.
+    timer = StageTimer()
+    card_cls = timed_card(LevelCard, timer)
+    board_cls = type(
+        "TimedScoreBoard", (timed_card(ScoreBoard, timer),),
+        {"_create_card": lambda self, member, lvl: card_cls(member, lvl)}
+    )
+    await _render(
+        timer, lambda i: board_cls(pairs[:board_size]),
+        iterations, warmup
+    )
+    results["scoreboard"] = timer.results()
+
+    results["peak_rss_kb"] = peak_rss_kb()
+    return results
@@ -0,0 +1,475 @@
+"""
+Database benchmark and query plan checks
+
+Loads a synthetic database and runs every query the bot makes in
+production, imported from where it's made so they can't drift apart.
+The time taken by each query is recorded along with its query plan,
+and any query that has to scan a whole table fails the run unless it
+is expected to.
+"""
+
+import re
+import random
+import logging
+from time import perf_counter, time
+from dataclasses import dataclass
+from typing import Callable
+
+from db import db
+from db.enums import ChannelPurposes, CategoryPurposes, RolePurposes
+from db.models import (
+    LEVEL_XP_SQL,
+    LEVEL_UPDATE_SQL,
+    LEVEL_DELETE_SQL,
+    LEVEL_RANK_SQL,
+    LEVEL_TOP_SQL
+)
+from bot._stats import LatencyStats
+from bot._purposes import PURPOSES_LOAD_SQL
+from ext.economy import (
+    BALANCE_ENSURE_SQL,
+    BALANCE_EXISTS_SQL,
+    BALANCE_SQL,
+    BALANCE_ACTIVE_SQL,
+    BALANCE_ADD_SQL
+)
+from ext.purpose import (
+    PURPOSE_REMOVE_SQL,
+    PURPOSE_GUILD_SQL,
+    PURPOSE_DESCRIPTIONS_SQL
+)
+from ext.tickets import (
+    TICKET_SQL,
+    TICKET_STATES_SQL,
+    TICKET_SEARCH_SQL,
+    TICKET_INSERT_SQL,
+    TICKET_REOPEN_SQL,
+    tickets_sql
+)
+from ext.birthday import (
+    BIRTHDAYS_SQL,
+    BIRTHDAY_SQL,
+    TIMEZONES_SQL,
+    TIMEZONE_SET_SQL,
+    birthdays_on_sql,
+    birthdays_of_sql
+)
+from ui.views import TICKET_CLOSE_SQL
+from constants import BIRTHDAYS_PER_PAGE
+from transcripts import (
+    TRANSCRIPT_PATH_SQL,
+    TRANSCRIPT_INDEX_SQL,
+    TRANSCRIPT_SAVE_SQL,
+    TRANSCRIPT_DELETE_SQL
+)
+
+
+log = logging.getLogger(__name__)
+
+# Matches a full scan of a table in EXPLAIN QUERY PLAN output, older
+# versions of sqlite write "SCAN TABLE <name>". Virtual tables, like
+# the full text search, are "scanned" through their own index.
+_SCAN_PATTERN = re.compile(r"^SCAN (?:TABLE )?(\w+)\b(?! VIRTUAL TABLE)")
+
+# Words the synthetic ticket descriptions are made from
+_TICKET_WORDS = (
+    "help", "role", "ban", "appeal", "report", "bug", "level", "refund",
+    "channel", "music", "birthday", "spam", "account", "invite", "bot"
+)
+
+
+@dataclass
+class Sample:
+    """Random values from the synthetic data, for query parameters"""
+
+    guild_id: int
+    member_id: int
+    ticket_id: int
+
+
+@dataclass(frozen=True)
+class Query:
+    """The shape of a query made by the bot
+
+    Attributes:
+        name (str): Unique name of the query.
+        source (str): The module and function that make the query.
+        sql (str): The query itself.
+        params (Callable[[Sample], tuple]): Creates the parameters.
+        allow_scan (bool): Whether a full table scan is expected, for
+            queries that read the whole table on purpose.
+    """
+
+    name: str
+    source: str
+    sql: str
+    params: Callable[[Sample], tuple] = lambda sample: ()
+    allow_scan: bool = False
+
+
+QUERIES = (
+
+    # Levels
+    Query(
+        "levels.get_xp", "db.models.MemberLevelModel.from_database",
+        LEVEL_XP_SQL,
+        lambda s: (s.member_id, s.guild_id)
+    ),
+    Query(
+        "levels.update_xp", "db.models.MemberLevelModel.update",
+        LEVEL_UPDATE_SQL,
+        lambda s: (s.member_id % 1000, s.member_id, s.guild_id)
+    ),
+    Query(
+        "levels.delete", "db.models.MemberLevelModel.delete",
+        LEVEL_DELETE_SQL,
+        lambda s: (s.member_id, s.guild_id)
+    ),
+    Query(
+        "levels.rank", "db.models.MemberLevelModel.rank",
+        LEVEL_RANK_SQL,
+        lambda s: (s.guild_id, s.member_id)
+    ),
+    Query(
+        "levels.top", "ui.levelcards.ScoreBoard.from_interaction",
+        LEVEL_TOP_SQL,
+        lambda s: (s.guild_id, 6)
+    ),
+
+    # Economy
+    Query(
+        "economy.ensure", "ext.economy.EconomyCog.ensure_balance",
+        BALANCE_ENSURE_SQL,
+        lambda s: (s.member_id, s.guild_id, s.member_id, s.guild_id)
+    ),
+    Query(
+        "economy.exists", "ext.economy.EconomyCog.on_member_join",
+        BALANCE_EXISTS_SQL,
+        lambda s: (s.member_id, s.guild_id)
+    ),
+    Query(
+        "economy.balance", "ext.economy.EconomyCog.balance_cmd",
+        BALANCE_SQL,
+        lambda s: (s.member_id, s.guild_id)
+    ),
+    Query(
+        "economy.add", "ext.economy.EconomyCog.on_message",
+        BALANCE_ADD_SQL,
+        lambda s: (1, s.member_id, s.guild_id)
+    ),
+    Query(
+        "economy.set_active", "ext.economy.EconomyCog.on_raw_member_remove",
+        BALANCE_ACTIVE_SQL,
+        lambda s: (0, s.member_id, s.guild_id)
+    ),
+
+    # Purposes
+    Query(
+        "purposes.load", "bot._purposes.PurposeMap.load",
+        PURPOSES_LOAD_SQL,
+        allow_scan=True
+    ),
+    Query(
+        "purposes.guild_list", "ext.purpose.PurposeCog.list_purposes_cmd",
+        PURPOSE_GUILD_SQL,
+        lambda s: (s.guild_id,)
+    ),
+    Query(
+        "purposes.remove", "ext.purpose.PurposeCog._remove_object_purpose",
+        PURPOSE_REMOVE_SQL,
+        lambda s: (RolePurposes.mod.value, s.guild_id)
+    ),
+    Query(
+        "purposes.descriptions", "ext.purpose.PurposeCog.list_purposes_cmd",
+        PURPOSE_DESCRIPTIONS_SQL,
+        allow_scan=True
+    ),
+
+    # Tickets
+    Query(
+        "tickets.list", "ext.tickets.TicketsCog.list_tickets_cmd",
+        tickets_sql(),
+        lambda s: (s.guild_id,)
+    ),
+    Query(
+        "tickets.list_active", "ext.tickets.TicketsCog.list_tickets_cmd",
+        tickets_sql(active=True),
+        lambda s: (s.guild_id,)
+    ),
+    Query(
+        "tickets.states", "ext.tickets.TicketsCog.clean_ticket_channels_cmd",
+        TICKET_STATES_SQL,
+        lambda s: (s.guild_id,)
+    ),
+    Query(
+        "tickets.get", "ext.tickets.TicketsCog.reopen_ticket_cmd",
+        TICKET_SQL,
+        lambda s: (s.ticket_id, s.guild_id)
+    ),
+    Query(
+        "tickets.create", "ext.tickets.TicketsCog.new_ticket_cmd",
+        TICKET_INSERT_SQL,
+        lambda s: (s.guild_id, s.member_id, "bench ticket", int(time()))
+    ),
+    Query(
+        "tickets.reopen", "ext.tickets.TicketsCog.reopen_ticket_cmd",
+        TICKET_REOPEN_SQL,
+        lambda s: (s.ticket_id,)
+    ),
+    Query(
+        "tickets.close", "ui.views.ManageTicketView.close_ticket",
+        TICKET_CLOSE_SQL,
+        lambda s: (s.ticket_id, s.guild_id)
+    ),
+    Query(
+        "tickets.search", "ext.tickets.search_tickets",
+        TICKET_SEARCH_SQL,
+        lambda s: (
+            f'guild_id:{s.guild_id} AND '
+            '{description transcript}:("ref"*)', 5, 0
+        )
+    ),
+
+    # Transcripts
+    Query(
+        "transcripts.path", "transcripts.get_transcript_path",
+        TRANSCRIPT_PATH_SQL,
+        lambda s: (s.ticket_id,)
+    ),
+    Query(
+        "transcripts.index", "transcripts.archive",
+        TRANSCRIPT_INDEX_SQL,
+        lambda s: (" ".join(_TICKET_WORDS), s.ticket_id)
+    ),
+    Query(
+        "transcripts.save", "transcripts.archive",
+        TRANSCRIPT_SAVE_SQL,
+        lambda s: (s.ticket_id, f"{s.ticket_id}.jsonl.gz", 50)
+    ),
+    Query(
+        "transcripts.delete", "transcripts.delete",
+        TRANSCRIPT_DELETE_SQL,
+        lambda s: (s.ticket_id,)
+    ),
+
+    # Birthdays
+    Query(
+        "birthdays.all", "ext.birthday.BirthdayIndex.load",
+        BIRTHDAYS_SQL,
+        allow_scan=True
+    ),
+    Query(
+        "birthdays.on_day", "ext.birthday.get_birthdays_on",
+        birthdays_on_sql(2),
+        lambda s: (f"{s.member_id % 28 + 1:02}/02", "29/02")
+    ),
+    Query(
+        "birthdays.get", "ext.birthday.BirthdayCog.get_birthday",
+        BIRTHDAY_SQL,
+        lambda s: (s.member_id,)
+    ),
+    Query(
+        "birthdays.page", "ext.birthday.BirthdayCog.birthday_page",
+        birthdays_of_sql(BIRTHDAYS_PER_PAGE),
+        lambda s: tuple(
+            s.member_id - i for i in range(BIRTHDAYS_PER_PAGE)
+        )
+    ),
+    Query(
+        "birthdays.timezones", "ext.birthday.BirthdayCog.__init__",
+        TIMEZONES_SQL,
+        allow_scan=True
+    ),
+    Query(
+        "birthdays.set_timezone", "ext.birthday.BirthdayCog.set_timezone",
+        TIMEZONE_SET_SQL,
+        lambda s: (s.guild_id, "Europe/London")
+    ),
+)
+
+
+class Dataset:
+    """Synthetic guilds, members and tickets loaded into the database"""
+
+    def __init__(self, guilds:int, members:int, seed:int=0):
+        self.random = random.Random(seed)
+        self.guild_ids = list(range(1, guilds + 1))
+
+        # Member ids are unique per guild, a member being in many
+        # guilds doesn't change the shape of the tables.
+        self.members = {
+            guild_id: [
+                guild_id * 1_000_000 + i for i in range(members)
+            ]
+            for guild_id in self.guild_ids
+        }
+        self.ticket_ids: list[int] = []
+
+    def load(self):
+        """Fill the database with the synthetic data"""
+
+        start = perf_counter()
+        rng = self.random
+
+        db.multiexec(
+            "INSERT OR IGNORE INTO guilds (guild_id) VALUES (?)",
+            [(guild_id,) for guild_id in self.guild_ids]
+        )
+
+        rows = [
+            (member_id, guild_id)
+            for guild_id, members in self.members.items()
+            for member_id in members
+        ]
+        db.multiexec(
+            "INSERT INTO member_levels (member_id, guild_id, experience) "
+            "VALUES (?, ?, ?)",
+            [(*row, rng.randrange(1, 1_000_000)) for row in rows]
+        )
+        db.multiexec(
+            "INSERT INTO balances (member_id, guild_id, balance) "
+            "VALUES (?, ?, ?)",
+            [(*row, rng.randrange(10_000)) for row in rows]
+        )
+        db.multiexec(
+            "INSERT OR IGNORE INTO user_birthdays (user_id, birthday) "
+            "VALUES (?, ?)",
+            [
+                (member_id, f"{rng.randint(1, 28):02}/{rng.randint(1, 12):02}/2000")
+                for member_id, _ in rows
+            ]
+        )
+
+        purposes = (
+            ChannelPurposes.guildlogs, ChannelPurposes.botlogs,
+            ChannelPurposes.welcome, ChannelPurposes.goodbye,
+            CategoryPurposes.tickets, RolePurposes.mod, RolePurposes.admin
+        )
+        db.multiexec(
+            "INSERT INTO purposed_objects (purpose_id, object_id, guild_id) "
+            "VALUES (?, ?, ?)",
+            [
+                (purpose.value, guild_id * 100 + i, guild_id)
+                for guild_id in self.guild_ids
+                for i, purpose in enumerate(purposes)
+            ]
+        )
+
+        # Roughly one ticket for every ten members, mostly closed
+        db.multiexec(
+            "INSERT INTO tickets "
+            "(guild_id, member_id, description, active, timestamp) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    guild_id, member_id,
+                    " ".join(rng.choices(_TICKET_WORDS, k=8)),
+                    int(rng.random() < 0.1), int(time())
+                )
+                for guild_id, member_id in (
+                    (guild_id, rng.choice(members))
+                    for guild_id, members in self.members.items()
+                    for _ in range(max(len(members) // 10, 1))
+                )
+            ]
+        )
+        self.ticket_ids = db.column("SELECT id FROM tickets")
+
+        db.commit()
+        log.info(
+            "Loaded %s members in %s guilds in %.2f seconds",
+            len(rows), len(self.guild_ids), perf_counter() - start
+        )
+
+    def sample(self) -> Sample:
+        """Get random values for the query parameters"""
+
+        guild_id = self.random.choice(self.guild_ids)
+        return Sample(
+            guild_id=guild_id,
+            member_id=self.random.choice(self.members[guild_id]),
+            ticket_id=self.random.choice(self.ticket_ids)
+        )
+
+
+def query_plan(query:Query, sample:Sample) -> list[str]:
+    """Get the query plan of a query
+
+    Args:
+        query (Query): The query.
+        sample (Sample): Values for the parameters.
+
+    Returns:
+        list[str]: Each step of the plan.
+    """
+
+    return [
+        row[3] for row in
+        db.records(f"EXPLAIN QUERY PLAN {query.sql}", *query.params(sample))
+    ]
+
+def table_scans(plan:list[str], tables:set[str]) -> list[str]:
+    """Find the full table scans in a query plan
+
+    Args:
+        plan (list[str]): The query plan.
+        tables (set[str]): The names of the tables in the database,
+            scans of subqueries don't count.
+
+    Returns:
+        list[str]: The names of the scanned tables.
+    """
+
+    return [
+        match.group(1) for step in plan
+        if (match := _SCAN_PATTERN.match(step))
+        and match.group(1) in tables
+    ]
+
+def run(guilds:int=100, members:int=500, repeat:int=200) -> dict:
+    """Benchmark every query and check their plans
+
+    Args:
+        guilds (int, optional): Synthetic guilds. Defaults to 100.
+        members (int, optional): Members per guild. Defaults to 500.
+        repeat (int, optional): Times to run each query. Defaults to 200.
+
+    Returns:
+        dict: The results, with the queries that scanned a table they
+            shouldn't have under "failures".
+    """
+
+    dataset = Dataset(guilds, members)
+    dataset.load()
+
+    tables = set(db.column("SELECT name FROM sqlite_master WHERE type = 'table'"))
+    results = {"queries": {}, "failures": []}
+
+    for query in QUERIES:
+        plan = query_plan(query, dataset.sample())
+        scans = table_scans(plan, tables)
+
+        stats = LatencyStats(repeat)
+        for _ in range(repeat):
+            params = query.params(dataset.sample())
+            start = perf_counter()
+            db.records(query.sql, *params)
+            stats.record(perf_counter() - start)
+
+        # Don't let writes change the data for the next queries
+        db.conn.rollback()
+
+        results["queries"][query.name] = {
+            "p50_us": round(stats.percentile(50) * 1_000_000, 1),
+            "p99_us": round(stats.percentile(99) * 1_000_000, 1),
+            "plan": plan
+        }
+
+        if scans and not query.allow_scan:
+            log.error(
+                "%s (%s) scans %s: %s",
+                query.name, query.source, ", ".join(scans), query.sql
+            )
+            results["failures"].append(query.name)
+
+    return results
@@ -0,0 +1,240 @@
+"""Entry point for the offline benchmarks, run this file from the
+project root, e.g. `python src/benchmark.py replay --events 10000`"""
+
+import os
+import sys
+import json
+import asyncio
+import logging
+import argparse
+import tempfile
+
+import constants
+
+# Never touch the real database, the processes of the cluster benchmark
+# find the one made here in the environment
+if "ONEBOT_BENCH_DB" not in os.environ:
+    os.environ["ONEBOT_BENCH_DB"] = os.path.join(
+        tempfile.mkdtemp(prefix="onebot-bench-"), "db.sqlite3"
+    )
+constants.DB_PATH = os.environ["ONEBOT_BENCH_DB"]
+
+from tabulate import tabulate
+
+from bench import save_results, previous_results, compare
+
+
+parser = argparse.ArgumentParser(
+    prog="OneBot Benchmarks",
+    description="Offline benchmarks for the OneBot project."
+)
+parser.add_argument(
+    "--log-level",
+    help="Logging level, defaults to WARNING.",
+    default="WARNING"
+)
+parser.add_argument(
+    "--uvloop",
+    help="Run on uvloop's event loop, to compare it with the default.",
+    action="store_true"
+)
+parser.add_argument(
+    "--no-save",
+    help="Don't save the results.",
+    action="store_true"
+)
+parser.add_argument(
+    "--against",
+    help="Commit to compare against, defaults to the last other commit.",
+    default=None
+)
+subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+replay_parser = subparsers.add_parser(
+    "replay",
+    help="Replay gateway events through the cogs."
+)
+replay_parser.add_argument("--guilds", type=int, default=10)
+replay_parser.add_argument("--members", type=int, default=100)
+replay_parser.add_argument("--events", type=int, default=10_000)
+replay_parser.add_argument(
+    "--rate", type=float, default=0,
+    help="Events per second, 0 for as fast as possible."
+)
+replay_parser.add_argument(
+    "--mix", type=json.loads, default=None,
+    help='Event weights as json, e.g. \'{"MESSAGE_CREATE": 1}\'.'
+)
+replay_parser.add_argument(
+    "--cogs", nargs="+", default=None,
+    help="Extensions to load, defaults to levels, economy, guild_logs "
+    "and welcome."
+)
+replay_parser.add_argument(
+    "--stream", default=None,
+    help="Replay a recorded event stream instead of generating one."
+)
+replay_parser.add_argument(
+    "--record", default=None,
+    help="Record the generated event stream to this file and exit."
+)
+replay_parser.add_argument(
+    "--chunked", action="store_true",
+    help="Send every member when connecting, like chunking at startup."
+)
+replay_parser.add_argument("--seed", type=int, default=0)
+
+levelcards_parser = subparsers.add_parser(
+    "levelcards",
+    help="Render the levelcards and scoreboard."
+)
+levelcards_parser.add_argument("--iterations", type=int, default=20)
+levelcards_parser.add_argument("--members", type=int, default=12)
+levelcards_parser.add_argument("--board-size", type=int, default=6)
+levelcards_parser.add_argument("--avatar-size", type=int, default=256)
+levelcards_parser.add_argument("--warmup", type=int, default=2)
+
+queries_parser = subparsers.add_parser(
+    "queries",
+    help="Time the database queries and check their query plans."
+)
+queries_parser.add_argument("--guilds", type=int, default=100)
+queries_parser.add_argument("--members", type=int, default=500)
+queries_parser.add_argument("--repeat", type=int, default=200)
+
+
+cluster_parser = subparsers.add_parser(
+    "cluster",
+    help="Replay gateway events in a cluster of processes."
+)
+cluster_parser.add_argument("--clusters", type=int, default=2)
+cluster_parser.add_argument("--shards", type=int, default=4)
+cluster_parser.add_argument("--guilds", type=int, default=20)
+cluster_parser.add_argument("--members", type=int, default=100)
+cluster_parser.add_argument(
+    "--events", type=int, default=5_000,
+    help="Events replayed by each cluster."
+)
+cluster_parser.add_argument(
+    "--crash", action="store_true",
+    help="Crash the first cluster once, to check that it's restarted."
+)
+cluster_parser.add_argument("--seed", type=int, default=0)
+
+
+def report(name:str, results:dict, against:str=None):
+    """Print the results next to the previous run"""
+
+    print(json.dumps(results, indent=4))
+
+    previous = previous_results(name, against)
+    if previous is None:
+        return
+
+    rows = compare(results, previous["results"])
+    print(f"\nCompared to {previous['commit']}:")
+    print(tabulate(rows, headers=("Metric", "Before", "After", "Change")))
+
+async def run_replay(args):
+    """Run the gateway replay benchmark"""
+
+    from bench.gateway import (
+        PayloadFactory, DEFAULT_COGS,
+        replay, read_events, write_events
+    )
+
+    factory = PayloadFactory(
+        args.guilds, args.members, args.seed, chunked=args.chunked
+    )
+
+    if args.record:
+        write_events(
+            args.record,
+            factory.ready() + list(factory.events(args.events, args.mix))
+        )
+        print(f"Recorded {args.events} events to {args.record}")
+        return None
+
+    if args.stream:
+        # The stream starts with the events that describe the guilds
+        events = read_events(args.stream)
+        factory.load_ready(events)
+    else:
+        events = factory.events(args.events, args.mix)
+
+    return await replay(events, factory, args.cogs or DEFAULT_COGS, args.rate)
+
+async def run_levelcards(args):
+    """Run the levelcard render benchmark"""
+
+    from bench import levelcards
+
+    return await levelcards.run(
+        iterations=args.iterations,
+        members=args.members,
+        board_size=args.board_size,
+        avatar_size=args.avatar_size,
+        warmup=args.warmup
+    )
+
+async def run_cluster(args):
+    """Run the cluster benchmark"""
+
+    from bench import cluster
+
+    return await cluster.run(
+        clusters=args.clusters,
+        shard_count=args.shards,
+        guilds=args.guilds,
+        members=args.members,
+        events=args.events,
+        seed=args.seed,
+        crash=args.crash,
+        use_uvloop=args.uvloop
+    )
+
+def run_queries(args):
+    """Run the database benchmark"""
+
+    from bench import queries
+
+    return queries.run(args.guilds, args.members, args.repeat)
+
+def main():
+    """Main function for running the benchmarks"""
+
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        format="%(levelname)s %(name)s: %(message)s"
+    )
+
+    if args.uvloop:
+        from bot._loop import install_uvloop
+        install_uvloop()
+
+    match args.benchmark:
+        case "replay":
+            results = asyncio.run(run_replay(args))
+        case "levelcards":
+            results = asyncio.run(run_levelcards(args))
+        case "queries":
+            results = run_queries(args)
+        case "cluster":
+            results = asyncio.run(run_cluster(args))
+
+    if results is None:
+        return
+
+    report(args.benchmark, results, args.against)
+    if not args.no_save:
+        save_results(args.benchmark, results)
+
+    # Let CI fail on queries that scan a whole table
+    if results.get("failures"):
+        print(f"\nFailed: {', '.join(results['failures'])}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
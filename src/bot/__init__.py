@@ -12,16 +12,27 @@ from discord.ext import commands, tasks
 
 from db import db
 from db.enums import ChannelPurposes
-from ui import ManageTicketView
+from ui import ManageTicketView, EmbedPageManager
 from ._get import Get
+from ._intents import extension_intents, cog_intents, log_intents
 from ._logs import setup_logs
 from ._ext import CogManager
+from ._monitor import LoopMonitor
+from ._loop import tune_loop
+from ._roles import RoleQueue
+from ._outbox import LogOutbox
+from ._messages import MessageCache
+from ._purposes import PurposeMap
+from ._router import InteractionRouter
+from ._shutdown import ShutdownCoordinator
+from ._cluster import ClusterClient
+from ._tree import CommandTree
 
 
 log = logging.getLogger(__name__)
 
 
-class Bot(commands.Bot):
+class Bot(commands.AutoShardedBot):
     """This class is the root of the bot."""
 
     __slots__ = (
@@ -31,30 +42,107 @@ class Bot(commands.Bot):
         "cog_events",
         "all_cogs_loaded",
         "commands_synced",
-        "debug"
+        "debug",
+        "loop_monitor",
+        "roles",
+        "router",
+        "outbox",
+        "purposes",
+        "messages",
+        "cluster",
+        "shutdown",
+        "_intents"
     )
 
-    def __init__(self, debug:bool=False):
-        """Initialize the bot"""
+    def __init__(
+        self,
+        debug:bool=False,
+        shard_count:int=None,
+        shard_ids:list[int]=None
+    ):
+        """Initialize the bot
+
+        Args:
+            debug (bool, optional): Run in debug mode.
+            shard_count (int, optional): The total number of shards,
+                discord's recommendation if not given.
+            shard_ids (list[int], optional): The shards this bot runs,
+                every shard if not given.
+        """
 
         self.debug = debug
 
         # Roughly the time the bot was started
         self._start_time = time.time()
 
+        self.log_filepath = setup_logs()
+
+        # Only ask for what the cogs need, members are cached as they
+        # join or when a guild is chunked, which is done on demand by
+        # Get.members rather than for every guild before ready.
+        # The guild logs keep their own message cache, see MessageCache
+        # Narrowed down to the loaded cogs before connecting, see
+        # _request_cog_intents
+        self._intents = extension_intents()
+
         super().__init__(
             command_prefix="ob ",
-            intents=discord.Intents.all()
+            intents=self._intents,
+            member_cache_flags=discord.MemberCacheFlags.from_intents(self._intents),
+            chunk_guilds_at_startup=False,
+            max_messages=None,
+            shard_count=shard_count,
+            shard_ids=shard_ids,
+            tree_cls=CommandTree
         )
 
         self.get: Get = Get(self)
-        self.log_filepath = setup_logs()
         self.commands_synced = False
 
         # Event that can be used to await for all cogs to be loaded
         self.all_cogs_loaded = asyncio.Event()
         self.cog_events = {}
 
+        # Watches for blocking code on the event loop
+        self.loop_monitor = LoopMonitor(self)
+
+        # Role changes are batched through this, see RoleQueue
+        self.roles = RoleQueue()
+
+        # Guild logs are batched through this, see LogOutbox
+        self.outbox = LogOutbox()
+
+        # Recent messages of the guilds that log edits and deletes
+        self.messages = MessageCache()
+
+        # Purposed objects of every guild, kept up to date by events
+        self.purposes = PurposeMap()
+        self.purposes.load()
+
+        # Set when running as one of a cluster, see cluster.py
+        self.cluster: ClusterClient | None = None
+
+        # Queued and running work is drained before closing, cogs can
+        # register their own, see ShutdownCoordinator
+        self.shutdown = ShutdownCoordinator()
+        self.shutdown.register(
+            "Role edits", self.roles.join, self.roles.close,
+            lambda: self.roles.depth
+        )
+        self.shutdown.register(
+            "Guild logs", self.outbox.join, self.outbox.close,
+            lambda: self.outbox.depth
+        )
+        self.shutdown.register(
+            "Commands", self.tree.join, self.tree.cancel,
+            lambda: self.tree.running
+        )
+
+        # Components that keep their state in their custom_id
+        self.router = InteractionRouter()
+        self.router.add(EmbedPageManager.PATTERN, EmbedPageManager.on_button)
+        self.router.add(ManageTicketView.PATTERN, ManageTicketView.on_button)
+
     @tasks.loop(minutes=10)
     async def _autosave_db(self):
         """Autosave the database"""
@@ -95,19 +183,38 @@ class Bot(commands.Bot):
         # Syncing requires a ready bot
         await self.wait_until_ready()
 
+        # Commands are global, so only the cluster with the first
+        # shard syncs them
+        if self.shard_ids and 0 not in self.shard_ids:
+            return
+
         if not self.commands_synced:
             await self.tree.sync()
             self.commands_synced = True
             log.info('App Commands Synced')
 
-    async def sync_guilds(self) -> None:
-        """Sync guilds with the database"""
+    def shard_guilds(self, shard_id:int) -> list[discord.Guild]:
+        """Get the guilds of a shard
+
+        Args:
+            shard_id (int): The shard ID.
+
+        Returns:
+            list[discord.Guild]: The guilds.
+        """
 
-        log.info("Syncing guilds with the database")
+        return [guild for guild in self.guilds if guild.shard_id == shard_id]
 
-        await self.wait_until_ready()
+    async def sync_guilds(self, shard_id:int) -> None:
+        """Sync the guilds of a shard with the database
 
-        for guild in self.guilds:
+        Args:
+            shard_id (int): The shard ID.
+        """
+
+        log.info("Syncing guilds of shard %s with the database", shard_id)
+
+        for guild in self.shard_guilds(shard_id):
             try:
                 log.debug("Syncing guild %s", guild.name)
                 db.execute(
@@ -131,10 +238,11 @@ class Bot(commands.Bot):
 
         log.info("Sending logs to all logging channels")
 
-        log_channel_ids = db.column(
-            "SELECT object_id FROM purposed_objects WHERE purpose_id = " 
-            "(SELECT id FROM purposes WHERE name = ?)",
-            ChannelPurposes.botlogs.value
+        # The database is shared by the clusters, each one sends to
+        # the guilds on its own shards
+        log_channel_ids = self.purposes.everywhere(
+            ChannelPurposes.botlogs,
+            {guild.id for guild in self.guilds}
         )
 
         log.debug(
@@ -145,20 +253,24 @@ class Bot(commands.Bot):
         for channel_id in log_channel_ids:
 
             # Get the channel and send the message
-            channel = await self.get.channel(channel_id)
-            await channel.send(msg)
+            try:
+                channel = await self.get.channel(channel_id)
+                await channel.send(msg)
+
+                # Follow up with a new log file if requested
+                if include_file:
+                    filename = os.path.basename(self.log_filepath)
+                    file = discord.File(self.log_filepath, filename=filename)
+                    await channel.send(file=file)
 
-            # Follow up with a new log file if requested
-            if include_file:
-                filename = os.path.basename(self.log_filepath)
-                file = discord.File(self.log_filepath, filename=filename)
-                await channel.send(file=file)
+            except discord.HTTPException as err:
+                log.warning("Can't send logs to %s: %s", channel_id, err)
 
     async def on_guild_join(self, guild:discord.Guild):
         """Sync the guilds when the bot joins a new guild"""
 
         log.info('Joined guild %s', guild.name)
-        await self.sync_guilds()
+        await self.sync_guilds(guild.shard_id)
 
     async def on_guild_remove(self, guild:discord.Guild):
         """Called when the bot leaves a guild"""
@@ -172,15 +284,83 @@ class Bot(commands.Bot):
 
         # log.info("Removed guild %s from the database", guild.name)
 
+    async def on_purpose_add(self, guild_id:int, purpose_id:int, object_id:int):
+        """Keep the purpose map up to date"""
+
+        self.purposes.add(guild_id, purpose_id, object_id)
+
+    async def on_purpose_remove(self, guild_id:int, purpose_id:int, object_id:int):
+        """Keep the purpose map up to date"""
+
+        self.purposes.remove(guild_id, purpose_id, object_id)
+
+    async def on_guild_channel_delete(self, channel:discord.abc.GuildChannel):
+        """Deleted channels no longer have a purpose"""
+
+        self.purposes.discard_object(channel.guild.id, channel.id)
+
+    async def on_guild_role_delete(self, role:discord.Role):
+        """Deleted roles no longer have a purpose"""
+
+        self.purposes.discard_object(role.guild.id, role.id)
+
+    async def on_interaction(self, inter:discord.Interaction):
+        """Route components that aren't handled by a view"""
+
+        await self.router.dispatch(inter)
+
     async def setup_hook(self) -> None:
 
-        active_ticket_ids = db.column(
-            "Select id FROM tickets WHERE active = ?",
-            1
-        )
+        # Catch blocking code as early as possible, asyncio only
+        # reports slow callbacks in debug mode
+        tune_loop(self.loop, self.debug)
+        self.loop_monitor.start()
+
+        # The extensions are loaded by now, and the shards identify
+        # after this
+        self._request_cog_intents()
+
+    def _request_cog_intents(self):
+        """Only ask discord for the intents of the loaded cogs, rather
+        than of every cog the extensions define.
+
+        discord.py identifies with the intents the bot was created
+        with, which are changed in place.
+
+        Raises:
+            RuntimeError: discord.py doesn't use the changed intents.
+        """
+
+        intents = cog_intents(self.cogs.values())
+        self._intents.value = intents.value
 
-        for ticket_id in active_ticket_ids:
-            self.add_view(ManageTicketView(ticket_id))
+        # Fail rather than silently ask for more than the cogs need
+        if self.intents != intents:
+            raise RuntimeError(
+                "discord.py didn't take the intents of the loaded cogs"
+            )
+
+        log_intents(intents)
+
+    async def add_cog(self, cog:commands.Cog, /, **kwargs):
+        """Add a cog, warning if it needs intents that weren't asked
+        for, which can only change when the bot is restarted"""
+
+        await super().add_cog(cog, **kwargs)
+        if not self.is_ready():
+            return
+
+        missing = discord.Intents.none()
+        missing.value = (
+            getattr(cog, "intents", missing).value & ~self.intents.value
+        )
+        if missing.value:
+            log.warning(
+                "%s needs intents that weren't requested, restart the "
+                "bot to use them: %s",
+                cog.qualified_name,
+                ", ".join(name for name, value in missing if value)
+            )
 
     async def on_ready(self) -> None:
         """Handles tasks that require the bot to be ready first.
@@ -197,16 +377,36 @@ class Bot(commands.Bot):
 
         await self.send_logs('**I\'m back online!**')
 
-        # Schedule bot tasks
-        self._autosave_db.start()
+        # Schedule bot tasks, ready fires again when a shard has to
+        # identify again
+        if not self._autosave_db.is_running():
+            self._autosave_db.start()
         self.loop.create_task(self._determine_loaded_cogs())
 
-        # Sync the guilds with the db and the app commands with discord
-        await self.sync_guilds()
+        if self.cluster:
+            self.cluster.ready()
+
+        # Sync the app commands with discord
         await self.sync_app_commands()
 
         log.info("Bot startup tasks complete")
 
+    async def on_shard_ready(self, shard_id:int) -> None:
+        """Handles the tasks for the guilds of a shard once it's ready,
+        without waiting for the other shards.
+
+        Args:
+            shard_id (int): The shard ID.
+        """
+
+        log.info(
+            "Shard %s is ready with %s guilds",
+            shard_id, len(self.shard_guilds(shard_id))
+        )
+
+        # Sync the shard's guilds with the db
+        await self.sync_guilds(shard_id)
+
     async def close(self):
         """Takes care of some final tasks before closing the bot
 
@@ -215,16 +415,23 @@ class Bot(commands.Bot):
 
         log.info("I am now shutting down")
 
+        self.loop_monitor.stop()
+
+        # Finish what's queued or running, it may still write to the db
+        reports = await self.shutdown.run()
+
         # IMPORTANT: without this commit all changes will be lost
         db.commit()
         log.debug("Final database commit complete")
 
         filename = os.path.basename(self.log_filepath)
+        drained = '\n'.join(report.format() for report in reports)
 
         # Send a ready message to all logging channels
         await self.send_logs(
             'I\'m shutting down, here are the logs for this session.' \
-            f'\nStarted: {filename[:-4]}\nUptime: {str(self.uptime)}',
+            f'\nStarted: {filename[:-4]}\nUptime: {str(self.uptime)}' \
+            f'\n```\n{drained}\n```',
             include_file=True
         )
         await super().close()
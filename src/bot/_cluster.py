@@ -0,0 +1,228 @@
+"""
+Talk to the other clusters through the cluster supervisor
+"""
+
+import logging
+import asyncio
+import threading
+from itertools import count
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Coroutine
+
+from constants import CLUSTER_QUERY_TIMEOUT
+
+
+log = logging.getLogger(__name__)
+
+QueryHandler = Callable[..., Coroutine[Any, Any, Any]]
+
+
+@dataclass(frozen=True)
+class ClusterInfo:
+    """Dataclass for what a cluster runs"""
+
+    cluster_id: int
+    clusters: int
+    shard_ids: tuple[int, ...]
+    shard_count: int
+    attempt: int = 0
+
+
+class ClusterClient:
+    """The end of a cluster's pipe to the supervisor.
+
+    Queries are sent to every other cluster, which answer them with
+    the handler added for the query's name, and the answers are
+    returned together. The pipe is read by a thread, which works on
+    every platform, and its messages are handed to the event loop.
+    """
+
+    def __init__(self, bot, info:ClusterInfo, conn:Connection):
+        """Create a new cluster client
+
+        Args:
+            bot (Bot): The bot of this cluster.
+            info (ClusterInfo): What this cluster runs.
+            conn (Connection): The pipe to the supervisor.
+        """
+
+        self.bot = bot
+        self.info = info
+        self.handlers: dict[str, QueryHandler] = {
+            "stats": self._stats,
+            "extension": self._extension,
+        }
+
+        self._conn = conn
+        self._ids = count()
+        self._queries: dict[int, asyncio.Future] = {}
+        self._loop: asyncio.AbstractEventLoop = None
+        self._stopped = False
+
+    @property
+    def cluster_id(self) -> int:
+        """The ID of this cluster"""
+
+        return self.info.cluster_id
+
+    def start(self):
+        """Start reading from the supervisor"""
+
+        self._loop = asyncio.get_running_loop()
+        self._stopped = False
+        threading.Thread(
+            target=self._read, name="cluster-reader", daemon=True
+        ).start()
+
+    def stop(self):
+        """Stop handling the supervisor's messages"""
+
+        self._stopped = True
+        for future in self._queries.values():
+            future.cancel()
+
+    def ready(self):
+        """Let the supervisor know this cluster is ready, so the next
+        one can start identifying"""
+
+        self._send({"op": "ready"})
+
+    def add_handler(self, name:str, handler:QueryHandler):
+        """Answer a query with a handler
+
+        Args:
+            name (str): The query's name.
+            handler (QueryHandler): Called with the query's arguments,
+                returns something that can be pickled.
+        """
+
+        self.handlers[name] = handler
+
+    async def query(
+        self,
+        name:str,
+        timeout:float=CLUSTER_QUERY_TIMEOUT,
+        **args
+    ) -> dict[int, Any]:
+        """Ask every other cluster something
+
+        Args:
+            name (str): The query's name.
+            timeout (float, optional): Seconds to wait for the answers,
+                the clusters that haven't answered by then are left out.
+            **args: Passed to the handlers.
+
+        Returns:
+            dict[int, Any]: The answers by cluster ID.
+        """
+
+        query_id = next(self._ids)
+        future = self._queries[query_id] = \
+            asyncio.get_running_loop().create_future()
+
+        self._send({
+            "op": "query", "id": query_id, "name": name,
+            "args": args, "timeout": timeout
+        })
+
+        try:
+            # The supervisor answers at the timeout with what it has
+            return await asyncio.wait_for(future, timeout + 1)
+        finally:
+            self._queries.pop(query_id, None)
+
+    def _send(self, message:dict):
+        """Send a message to the supervisor"""
+
+        try:
+            self._conn.send(message)
+        except (BrokenPipeError, OSError) as err:
+            log.error("Can't reach the cluster supervisor: %s", err)
+
+    def _read(self):
+        """Reader thread, hands the supervisor's messages to the loop"""
+
+        while True:
+            try:
+                message = self._conn.recv()
+            except (EOFError, OSError):
+                self._loop.call_soon_threadsafe(self._lost)
+                return
+
+            self._loop.call_soon_threadsafe(self._receive, message)
+
+    def _lost(self):
+        """Shut down after losing the supervisor, as there is no one
+        to restart us"""
+
+        if self._stopped:
+            return
+
+        log.critical("Lost the cluster supervisor, shutting down")
+        self.stop()
+        asyncio.create_task(self.bot.close())
+
+    def _receive(self, message:dict):
+        """Handle a message from the supervisor"""
+
+        if self._stopped:
+            return
+
+        match message["op"]:
+
+            case "request":
+                asyncio.create_task(self._answer(message))
+
+            case "reply":
+                future = self._queries.get(message["id"])
+                if future and not future.done():
+                    future.set_result(message["results"])
+
+            case "shutdown":
+                log.info("Cluster supervisor asked us to shut down")
+                asyncio.create_task(self.bot.close())
+
+    async def _answer(self, message:dict):
+        """Answer a query of another cluster"""
+
+        handler = self.handlers.get(message["name"])
+
+        try:
+            if handler is None:
+                raise KeyError(f"No handler for {message['name']}")
+            result = await handler(**message["args"])
+
+        except Exception as err:  # pylint: disable=broad-except
+            log.exception("Failed to answer %s", message["name"])
+            result = {"error": repr(err)}
+
+        self._send({"op": "response", "id": message["id"], "result": result})
+
+    async def _stats(self) -> dict:
+        """Answer the stats query"""
+
+        return {
+            "shards": list(self.info.shard_ids),
+            "guilds": len(self.bot.guilds),
+            "members": sum(
+                guild.member_count or 0 for guild in self.bot.guilds
+            ),
+            "latency": self.bot.latency,
+        }
+
+    async def _extension(self, action:str, name:str) -> str:
+        """Answer the extension query, loading, unloading or reloading
+        an extension"""
+
+        match action:
+            case "load":
+                await self.bot.load_extension(name)
+            case "unload":
+                await self.bot.unload_extension(name)
+            case "reload":
+                await self.bot.reload_extension(name)
+            case _:
+                raise ValueError(f"Unknown extension action {action}")
+
+        return "ok"
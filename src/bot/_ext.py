@@ -85,11 +85,23 @@ class CogManager(BaseCog, name='Cog Manager'):
             )
             return
 
+        msg = f'Cog `{cog.name}` {action} was successful!'
+
+        # Do the same in the other clusters
+        if self.bot.cluster:
+            results = await self.bot.cluster.query(
+                'extension', action=action, name=f'ext.{cog.name[:-3]}'
+            )
+            failed = [
+                str(cluster_id) for cluster_id, result in results.items()
+                if result != 'ok'
+            ]
+            msg += f'\nDone in {len(results) - len(failed)} other clusters'
+            if failed:
+                msg += f', failed in clusters {", ".join(failed)}'
+
         # Send a success message to the user
-        await inter.followup.send(
-            f'Cog `{cog.name}` {action} was successful!',
-            ephemeral=True
-        )
+        await inter.followup.send(msg, ephemeral=True)
 
     @group.command(name='load')
     @app_commands.check(is_bot_owner)
@@ -71,6 +71,62 @@ class Get:
         member_obj = self.bot.get_user(_id)
         return member_obj or await self.bot.fetch_user(_id)
 
+    async def members(self, guild:discord.Guild, /) -> list[discord.Member]:
+        """Get every member of a guild, chunking it if it hasn't been.
+
+        Guilds aren't chunked at startup, so this should be used over
+        guild.members when all of them are needed.
+
+        Args:
+            guild (discord.Guild): The guild.
+        Returns:
+            list[discord.Member]: The members.
+        """
+
+        if not guild.chunked:
+            log.debug('Chunking guild %s', guild.name)
+            await guild.chunk()
+
+        return guild.members
+
+    async def members_by_id(
+        self,
+        guild:discord.Guild,
+        user_ids:list[int],
+        /
+    ) -> list[discord.Member]:
+        """Get the members of a guild with the given IDs, asking
+        discord for the ones that aren't cached rather than chunking
+        the whole guild.
+
+        Args:
+            guild (discord.Guild): The guild.
+            user_ids (list[int]): The user IDs.
+        Returns:
+            list[discord.Member]: The members, users that aren't in the
+                guild are left out.
+        """
+
+        members = []
+        missing = []
+        for user_id in user_ids:
+            if member := guild.get_member(user_id):
+                members.append(member)
+            else:
+                missing.append(user_id)
+
+        if guild.chunked:
+            return members
+
+        # Discord takes up to 100 user IDs per request
+        for i in range(0, len(missing), 100):
+            log.debug('Querying %s members of %s', len(missing[i:i + 100]), guild.name)
+            members.extend(await guild.query_members(
+                user_ids=missing[i:i + 100], cache=True
+            ))
+
+        return members
+
     async def member(self, member_id, guild_id, /) -> discord.Member:
         """Get a discord Member from a Guild"""
 
@@ -0,0 +1,83 @@
+"""
+Work out the gateway intents the extensions need
+"""
+
+import os
+import logging
+import importlib
+from typing import Iterable
+
+import discord
+from discord.ext import commands
+
+from ext import BaseCog
+
+
+log = logging.getLogger(__name__)
+
+# Needed for the guilds, channels and roles that everything relies on
+BASE_INTENTS = discord.Intents(guilds=True)
+
+
+def extension_intents(path:str="./src/ext") -> discord.Intents:
+    """Get the intents that any cog of the extensions may need, which
+    the bot is created with before its extensions are loaded. See
+    cog_intents for what it asks discord for.
+
+    Cogs list the intents they need in their `intents` attribute,
+    the bot only asks for those so that discord doesn't send, and
+    discord.py doesn't cache, events no cog listens to.
+
+    Args:
+        path (str, optional): The extensions directory.
+
+    Returns:
+        discord.Intents: The intents.
+    """
+
+    intents = discord.Intents.none() | BASE_INTENTS
+
+    for filename in os.listdir(path):
+        if not filename.endswith(".py") or filename.startswith("_"):
+            continue
+
+        module = importlib.import_module(f"ext.{filename[:-3]}")
+        for obj in vars(module).values():
+            if isinstance(obj, type) and issubclass(obj, BaseCog) \
+                and obj.__module__ == module.__name__:
+                intents |= obj.intents
+
+    return intents
+
+def cog_intents(cogs:Iterable[commands.Cog]) -> discord.Intents:
+    """Get the intents that the loaded cogs need
+
+    Extensions may not load every cog they define, e.g. when it's
+    disabled or only used outside of debug mode.
+
+    Args:
+        cogs (Iterable[commands.Cog]): The loaded cogs.
+
+    Returns:
+        discord.Intents: The intents.
+    """
+
+    intents = discord.Intents.none() | BASE_INTENTS
+    for cog in cogs:
+        if isinstance(cog, BaseCog):
+            intents |= cog.intents
+
+    return intents
+
+def log_intents(intents:discord.Intents):
+    """Log the intents that are and aren't requested
+
+    Args:
+        intents (discord.Intents): The intents.
+    """
+
+    enabled = [name for name, value in intents if value]
+    disabled = [name for name, value in intents if not value]
+
+    log.info("Requesting intents: %s", ", ".join(enabled))
+    log.info("Not requesting intents: %s", ", ".join(disabled) or "none")
@@ -0,0 +1,58 @@
+"""
+Event loop setup, shared by the bot and the cluster processes
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import LOOP_EXECUTOR_WORKERS
+
+
+log = logging.getLogger(__name__)
+
+
+def install_uvloop() -> bool:
+    """Make asyncio create uvloop's event loops, if it's installed.
+    Has to be called before the loop is created.
+
+    Returns:
+        bool: Whether uvloop is used.
+    """
+
+    try:
+        import uvloop  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        log.warning("uvloop isn't installed, using the default event loop")
+        return False
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    log.info("Using uvloop %s", uvloop.__version__)
+    return True
+
+def tune_loop(
+    loop:asyncio.AbstractEventLoop,
+    debug:bool=False,
+    workers:int=LOOP_EXECUTOR_WORKERS
+):
+    """Set up a running event loop for the bot
+
+    Args:
+        loop (asyncio.AbstractEventLoop): The loop.
+        debug (bool, optional): Turn on asyncio's debug mode, which
+            reports slow callbacks and coroutines that are never awaited.
+        workers (int, optional): Threads of the default executor, that
+            runs the database and render work handed off by to_thread.
+    """
+
+    loop.set_default_executor(ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="onebot-worker"
+    ))
+
+    if debug:
+        loop.set_debug(True)
+
+    log.info(
+        "Running on %s with %s executor threads%s",
+        type(loop).__name__, workers, ", debug mode" if debug else ""
+    )
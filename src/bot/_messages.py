@@ -0,0 +1,221 @@
+"""
+Bounded cache of recent messages, for logging edits and deletes
+"""
+
+import sys
+import heapq
+import logging
+from collections import OrderedDict
+
+import discord
+
+from constants import MESSAGE_CACHE_PER_GUILD, MESSAGE_CACHE_MAX_BYTES
+
+
+log = logging.getLogger(__name__)
+
+
+class CachedMessage:
+    """What's kept of a message to log its edits and deletion"""
+
+    __slots__ = ("id", "channel_id", "author_id", "author", "content")
+
+    def __init__(self, message:discord.Message):
+        self.id = message.id
+        self.channel_id = message.channel.id
+        self.author_id = message.author.id
+        self.author = str(message.author)
+        self.content = message.content
+
+    @property
+    def size(self) -> int:
+        """Rough number of bytes the record takes up"""
+
+        return sys.getsizeof(self) \
+            + sys.getsizeof(self.author) \
+            + sys.getsizeof(self.content)
+
+
+class MessageCache:
+    """Keeps the content of recent messages in the guilds that log them.
+
+    Discord doesn't send the content of a deleted message, or what an
+    edited message said before, so it has to be remembered. Unlike the
+    message cache of discord.py, each guild has its own cap, so a busy
+    guild can't push out the messages of a quiet one, and the whole
+    cache is kept under a number of bytes by dropping the oldest
+    messages of the largest guild.
+    """
+
+    def __init__(
+        self,
+        per_guild:int=MESSAGE_CACHE_PER_GUILD,
+        max_bytes:int=MESSAGE_CACHE_MAX_BYTES
+    ):
+        """Create a new message cache
+
+        Args:
+            per_guild (int, optional): Messages kept per guild.
+            max_bytes (int, optional): Rough limit of the whole cache.
+        """
+
+        self.per_guild = per_guild
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._guilds: dict[int, OrderedDict[int, CachedMessage]] = {}
+
+        # Max heap of (-messages, guild ID), for finding the largest
+        # guild without going through all of them. An entry is pushed
+        # whenever a guild grows and isn't removed when it shrinks, so
+        # a guild's entries are at least its size, and the top entry
+        # is only right if it matches.
+        self._sizes: list[tuple[int, int]] = []
+
+    def __len__(self) -> int:
+        return sum(len(messages) for messages in self._guilds.values())
+
+    @property
+    def guilds(self) -> int:
+        """The number of guilds with cached messages"""
+
+        return len(self._guilds)
+
+    def add(self, message:discord.Message):
+        """Remember a message
+
+        Args:
+            message (discord.Message): The message, from a guild.
+        """
+
+        messages = self._guilds.setdefault(message.guild.id, OrderedDict())
+        self._discard(messages, message.id)
+
+        record = CachedMessage(message)
+        messages[record.id] = record
+        self.bytes += record.size
+
+        if len(messages) > self.per_guild:
+            self._pop_oldest(messages)
+
+        self._push_size(message.guild.id, messages)
+        self._trim()
+
+    def get(self, guild_id:int, message_id:int) -> CachedMessage | None:
+        """Get a cached message
+
+        Args:
+            guild_id (int): The message's guild ID.
+            message_id (int): The message ID.
+
+        Returns:
+            CachedMessage: The message, None if it isn't cached.
+        """
+
+        record = self._guilds.get(guild_id, {}).get(message_id)
+        if record is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return record
+
+    def update(self, record:CachedMessage, content:str):
+        """Change the content of a cached message, after it's edited
+
+        Args:
+            record (CachedMessage): The cached message.
+            content (str): The new content.
+        """
+
+        self.bytes -= record.size
+        record.content = content
+        self.bytes += record.size
+
+        self._trim()
+
+    def pop(self, guild_id:int, message_id:int) -> CachedMessage | None:
+        """Forget a message and return it, e.g. when it's deleted
+
+        Args:
+            guild_id (int): The message's guild ID.
+            message_id (int): The message ID.
+
+        Returns:
+            CachedMessage: The message, None if it isn't cached.
+        """
+
+        messages = self._guilds.get(guild_id)
+        record = self._discard(messages, message_id) if messages else None
+        if record is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return record
+
+    def forget_guild(self, guild_id:int):
+        """Forget every message of a guild
+
+        Args:
+            guild_id (int): The guild's ID.
+        """
+
+        messages = self._guilds.pop(guild_id, None)
+        if messages:
+            self.bytes -= sum(record.size for record in messages.values())
+            log.debug("Forgot %s messages of guild %s", len(messages), guild_id)
+
+    def _discard(self, messages:OrderedDict, message_id:int) -> CachedMessage | None:
+        """Remove a message from a guild's messages"""
+
+        record = messages.pop(message_id, None)
+        if record is not None:
+            self.bytes -= record.size
+
+        return record
+
+    def _push_size(self, guild_id:int, messages:OrderedDict):
+        """Push the size of a guild to the heap, rebuilding the heap
+        when it's mostly outdated entries"""
+
+        heapq.heappush(self._sizes, (-len(messages), guild_id))
+
+        if len(self._sizes) > 2 * len(self._guilds) + 64:
+            self._sizes = [
+                (-len(messages), guild_id)
+                for guild_id, messages in self._guilds.items()
+                if messages
+            ]
+            heapq.heapify(self._sizes)
+
+    def _largest(self) -> OrderedDict:
+        """Get the messages of the guild with the most messages"""
+
+        while True:
+            size, guild_id = self._sizes[0]
+            messages = self._guilds.get(guild_id)
+            if messages is not None and len(messages) == -size:
+                return messages
+
+            # The guild has shrunk or was forgotten since, so move its
+            # entry down to where it is now.
+            if messages:
+                heapq.heapreplace(self._sizes, (-len(messages), guild_id))
+            else:
+                heapq.heappop(self._sizes)
+
+    def _trim(self):
+        """Drop the oldest messages of the largest guilds until the
+        cache is small enough"""
+
+        while self.bytes > self.max_bytes:
+            self._pop_oldest(self._largest())
+
+    def _pop_oldest(self, messages:OrderedDict):
+        """Remove the oldest message of a guild"""
+
+        _, record = messages.popitem(last=False)
+        self.bytes -= record.size
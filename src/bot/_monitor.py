@@ -0,0 +1,263 @@
+"""
+Watchdog for the event loop, reports lag and slow callbacks
+"""
+
+import sys
+import time
+import logging
+import asyncio
+import threading
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+
+from discord.ext import tasks
+
+from constants import (
+    LOOP_LAG_INTERVAL,
+    LOOP_LAG_THRESHOLD,
+    LOOP_REPORT_COOLDOWN
+)
+
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class LagReport:
+    """Dataclass for a single occurrence of the event loop being blocked"""
+
+    kind: str
+    duration: float
+    detail: str
+    timestamp: float = field(default_factory=time.time)
+
+    def format(self, limit:int=1500) -> str:
+        """Format the report for a discord message
+
+        Args:
+            limit (int, optional): Max length of the detail. Defaults to 1500.
+
+        Returns:
+            str: The formatted report.
+        """
+
+        detail = self.detail
+        if len(detail) > limit:
+            detail = "..." + detail[-limit:]
+
+        return (
+            f"**{self.kind.title()}** of `{self.duration:.3f}s`"
+            f"\n```py\n{detail}```"
+        )
+
+
+def _running_handle() -> asyncio.Handle | None:
+    """Get the handle the event loop has just run.
+
+    asyncio logs slow callbacks from the loop's _run_once with only the
+    handle's repr, but the handle is still a local of that frame.
+
+    Returns:
+        asyncio.Handle: The handle, None if it isn't on the stack,
+            e.g. with an event loop that isn't written in python.
+    """
+
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code.co_name == "_run_once":
+            handle = frame.f_locals.get("handle")
+            return handle if isinstance(handle, asyncio.Handle) else None
+        frame = frame.f_back
+
+    return None
+
+
+class _SlowCallbackHandler(logging.Handler):
+    """Catches the slow callback warnings that asyncio emits in debug
+    mode and hands them over to the monitor."""
+
+    def __init__(self, monitor):
+        super().__init__(level=logging.WARNING)
+        self.monitor = monitor
+
+    def emit(self, record:logging.LogRecord):
+        # asyncio logs: "Executing %s took %.3f seconds"
+        if not str(record.msg).startswith("Executing ") or not record.args:
+            return
+
+        description, duration = record.args
+        detail = str(description)
+
+        # In debug mode handles and tasks remember where they were
+        # created, a task's step is more useful than its handle
+        handle = _running_handle()
+        task = getattr(getattr(handle, "_callback", None), "__self__", None)
+        source = getattr(task, "_source_traceback", None) \
+            if isinstance(task, asyncio.Task) \
+            else getattr(handle, "_source_traceback", None)
+
+        if source:
+            detail += "\n\nCreated at:\n" + "".join(
+                traceback.format_list(source)
+            )
+
+        self.monitor.add_report(
+            LagReport("slow callback", duration, detail)
+        )
+
+
+class LoopMonitor:
+    """Measures how late the event loop is at scheduling work and
+    captures the stack of whatever is blocking it.
+
+    A heartbeat task runs on the loop and a watchdog thread checks that
+    the heartbeat is still beating. If it stops, the watchdog grabs the
+    stack of the loop's thread, which is the code that is blocking.
+    """
+
+    def __init__(
+        self,
+        bot,
+        threshold:float=LOOP_LAG_THRESHOLD,
+        interval:float=LOOP_LAG_INTERVAL
+    ):
+        self.bot = bot
+        self.threshold = threshold
+        self.interval = interval
+
+        # Lag measurements in seconds
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+        # Reports waiting to be sent to the botlogs
+        self._reports: deque[LagReport] = deque(maxlen=50)
+        self._last_sent = 0.0
+
+        self._beat = time.monotonic()
+        self._stall_captured = False
+        self._loop: asyncio.AbstractEventLoop = None
+        self._loop_thread_id: int = None
+        self._heartbeat_task: asyncio.Task = None
+        self._watchdog: threading.Thread = None
+        self._stopping = threading.Event()
+        self._log_handler = _SlowCallbackHandler(self)
+
+    def start(self):
+        """Start monitoring, must be called from within the running loop"""
+
+        log.info("Starting event loop monitor")
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopping.clear()
+
+        # asyncio only reports slow callbacks when in debug mode
+        self._loop.slow_callback_duration = self.threshold
+        logging.getLogger("asyncio").addHandler(self._log_handler)
+
+        self._heartbeat_task = self._loop.create_task(self._heartbeat())
+
+        self._watchdog = threading.Thread(
+            target=self._watch,
+            name="loop-watchdog",
+            daemon=True
+        )
+        self._watchdog.start()
+
+        self.publish_reports.start()
+
+    def stop(self):
+        """Stop monitoring"""
+
+        log.info("Stopping event loop monitor")
+
+        self._stopping.set()
+        logging.getLogger("asyncio").removeHandler(self._log_handler)
+        self.publish_reports.cancel()
+
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+
+    def add_report(self, report:LagReport):
+        """Log a report and queue it for the botlogs.
+        This is thread safe.
+
+        Args:
+            report (LagReport): The report to add.
+        """
+
+        log.warning(
+            "Event loop %s of %.3f seconds\n%s",
+            report.kind, report.duration, report.detail
+        )
+        self._reports.append(report)
+
+    async def _heartbeat(self):
+        """Measure the delay between when we ask to be woken up and
+        when the loop actually wakes us up."""
+
+        while True:
+            before = self._loop.time()
+            await asyncio.sleep(self.interval)
+
+            self.last_lag = max(
+                self._loop.time() - before - self.interval, 0
+            )
+            self.max_lag = max(self.max_lag, self.last_lag)
+
+            # Let the watchdog know that we are still alive
+            self._beat = time.monotonic()
+            self._stall_captured = False
+
+            # The watchdog will have the stack if it was caught
+            # mid-stall, this is just the measurement
+            if self.last_lag > self.threshold:
+                log.debug("Event loop lag of %.3f seconds", self.last_lag)
+
+    def _watch(self):
+        """Watchdog thread, captures the stack of the loop's thread
+        while the loop is blocked."""
+
+        while not self._stopping.wait(self.interval / 2):
+            stalled_for = time.monotonic() - self._beat - self.interval
+
+            if stalled_for < self.threshold or self._stall_captured:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+
+            self._stall_captured = True
+            self.add_report(LagReport(
+                "lag",
+                stalled_for,
+                "".join(traceback.format_stack(frame))
+            ))
+
+    @tasks.loop(seconds=LOOP_LAG_INTERVAL * 10)
+    async def publish_reports(self):
+        """Send any new reports to the botlogs, rate-limited so that a
+        struggling loop isn't made worse by flooding the channels."""
+
+        if not self._reports:
+            return
+
+        if time.monotonic() - self._last_sent < LOOP_REPORT_COOLDOWN:
+            return
+
+        reports = list(self._reports)
+        self._reports.clear()
+        self._last_sent = time.monotonic()
+
+        # Only the worst offender is sent in full
+        worst = max(reports, key=lambda report: report.duration)
+        msg = (
+            f"**The event loop was blocked {len(reports)} time(s)**"
+            f"\n{worst.format()}"
+        )
+
+        await self.bot.wait_until_ready()
+        await self.bot.send_logs(msg)
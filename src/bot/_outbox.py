@@ -0,0 +1,238 @@
+"""
+Outbox for guild log embeds, sent in batches through webhooks
+"""
+
+import logging
+import asyncio
+from collections import Counter, deque
+from time import perf_counter
+
+import discord
+
+from constants import (
+    LOG_OUTBOX_WINDOW,
+    LOG_OUTBOX_LIMIT,
+    LOG_WEBHOOK_NAME
+)
+from ui import LogDroppedEvents
+from ._stats import LatencyStats
+
+
+log = logging.getLogger(__name__)
+
+# Discord's limits for the embeds of a single message
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+
+
+class LogOutbox:
+    """Collects the log embeds of each guild and sends them together.
+
+    Embeds wait for a short window, so that a burst of events becomes
+    a few messages of up to ten embeds, sent through a webhook of the
+    log channel when the bot is allowed to make one. Each guild is
+    sent one message at a time, so a rate limited guild only holds up
+    itself. A guild's outbox has a limit, once full new embeds are
+    dropped and counted, and a summary of them is sent instead.
+    """
+
+    def __init__(
+        self,
+        window:float=LOG_OUTBOX_WINDOW,
+        limit:int=LOG_OUTBOX_LIMIT
+    ):
+        """Create a new outbox
+
+        Args:
+            window (float, optional): Seconds to wait for more embeds
+                before a guild's outbox is sent.
+            limit (int, optional): Embeds kept waiting per guild.
+        """
+
+        self.window = window
+        self.limit = limit
+        self.latency = LatencyStats()
+        self.messages = 0
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+
+        # Embeds with the channel and time they were queued
+        self._pending: dict[int, deque] = {}
+        self._dropped: dict[int, Counter[str]] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+        self._webhooks: dict[int, discord.Webhook | None] = {}
+
+    @property
+    def depth(self) -> int:
+        """The number of embeds waiting to be sent"""
+
+        return sum(len(pending) for pending in self._pending.values())
+
+    def put(self, channel:discord.TextChannel, embed:discord.Embed) -> bool:
+        """Queue an embed to be sent to a log channel
+
+        Args:
+            channel (discord.TextChannel): The log channel.
+            embed (discord.Embed): The embed.
+
+        Returns:
+            bool: False if the guild's outbox is full and it was dropped.
+        """
+
+        guild_id = channel.guild.id
+        pending = self._pending.setdefault(guild_id, deque())
+
+        if len(pending) >= self.limit:
+            self.dropped += 1
+            dropped = self._dropped.setdefault(guild_id, Counter())
+            dropped[embed.title or "Other"] += 1
+            return False
+
+        pending.append((channel, embed, perf_counter()))
+
+        if guild_id not in self._workers:
+            self._workers[guild_id] = asyncio.create_task(
+                self._work(guild_id),
+                name=f"log-outbox-{guild_id}"
+            )
+
+        return True
+
+    def forget_channel(self, channel_id:int):
+        """Forget the webhook of a channel, e.g. when it's deleted
+
+        Args:
+            channel_id (int): The channel's ID.
+        """
+
+        self._webhooks.pop(channel_id, None)
+
+    def _next_batch(self, guild_id:int) -> tuple:
+        """Take the next embeds that can be sent in one message"""
+
+        pending = self._pending[guild_id]
+        channel = pending[0][0]
+        embeds, queued = [], []
+        size = 0
+
+        # Summarise what was dropped first, it happened before
+        # anything still waiting was queued
+        if dropped := self._dropped.pop(guild_id, None):
+            summary = LogDroppedEvents(dropped)
+            embeds.append(summary)
+            size += len(summary)
+
+        while pending and len(embeds) < MAX_EMBEDS:
+            next_channel, embed, queued_at = pending[0]
+            if next_channel.id != channel.id:
+                break
+            if embeds and size + len(embed) > MAX_EMBED_CHARS:
+                break
+
+            pending.popleft()
+            embeds.append(embed)
+            queued.append(queued_at)
+            size += len(embed)
+
+        return channel, embeds, queued
+
+    async def _work(self, guild_id:int):
+        """Send the outbox of a guild until it's empty"""
+
+        try:
+            await asyncio.sleep(self.window)
+
+            while self._pending.get(guild_id):
+                channel, embeds, queued = self._next_batch(guild_id)
+                if await self._send(channel, embeds):
+                    now = perf_counter()
+                    for queued_at in queued:
+                        self.latency.record(now - queued_at)
+
+        finally:
+            # Only left over if the worker was cancelled
+            self._pending.pop(guild_id, None)
+            self._dropped.pop(guild_id, None)
+            self._workers.pop(guild_id, None)
+
+    async def _send(
+        self,
+        channel:discord.TextChannel,
+        embeds:list[discord.Embed]
+    ) -> bool:
+        """Send embeds to a log channel, through its webhook if it has
+        one, otherwise as the bot."""
+
+        try:
+            webhook = await self._webhook(channel)
+            try:
+                if webhook:
+                    me = channel.guild.me
+                    await webhook.send(
+                        embeds=embeds,
+                        username=me.display_name,
+                        avatar_url=me.display_avatar.url
+                    )
+                else:
+                    await channel.send(embeds=embeds)
+
+            except discord.NotFound:
+                if not webhook:
+                    raise
+
+                # The webhook was deleted, send as the bot this time
+                self.forget_channel(channel.id)
+                await channel.send(embeds=embeds)
+
+        except discord.HTTPException as err:
+            self.failed += len(embeds)
+            log.error("Failed to send logs to %s: %s", channel, err)
+            return False
+
+        self.messages += 1
+        self.sent += len(embeds)
+        return True
+
+    async def _webhook(
+        self,
+        channel:discord.TextChannel
+    ) -> discord.Webhook | None:
+        """Get the webhook of a log channel, creating it if needed.
+        None if the bot can't manage the channel's webhooks."""
+
+        if channel.id in self._webhooks:
+            return self._webhooks[channel.id]
+
+        webhook = None
+        if channel.permissions_for(channel.guild.me).manage_webhooks:
+            try:
+                webhook = discord.utils.find(
+                    lambda hook: hook.name == LOG_WEBHOOK_NAME
+                        and hook.token is not None
+                        and hook.user == channel.guild.me,
+                    await channel.webhooks()
+                ) or await channel.create_webhook(
+                    name=LOG_WEBHOOK_NAME,
+                    reason="Sending guild logs"
+                )
+            except discord.HTTPException as err:
+                log.warning("Can't use a webhook in %s: %s", channel, err)
+
+        self._webhooks[channel.id] = webhook
+        return webhook
+
+    async def join(self):
+        """Wait until every queued embed has been sent"""
+
+        while self._workers:
+            await asyncio.gather(
+                *self._workers.values(),
+                return_exceptions=True
+            )
+
+    def close(self):
+        """Stop sending, anything waiting is dropped"""
+
+        for worker in self._workers.values():
+            worker.cancel()
@@ -0,0 +1,184 @@
+"""
+Profile the live bot without restarting it
+"""
+
+import io
+import sys
+import time
+import pstats
+import logging
+import asyncio
+import cProfile
+import threading
+import tracemalloc
+from os.path import basename
+from collections import Counter
+
+from constants import PROFILE_SAMPLE_INTERVAL
+
+
+log = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """Periodically samples the stack of a thread from another thread.
+    The overhead is low enough to run against the live bot.
+
+    The result is in the collapsed stack format, one line per unique
+    stack with the root frame first, followed by the number of samples.
+    This can be fed straight into flamegraph tools.
+    """
+
+    __slots__ = ("thread_id", "interval", "stacks", "_stopping", "_thread")
+
+    def __init__(self, thread_id:int, interval:float=PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread = None
+
+    def start(self):
+        """Start sampling in a background thread"""
+
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._sample,
+            name="sampling-profiler",
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the thread to finish"""
+
+        self._stopping.set()
+        self._thread.join()
+
+    def _sample(self):
+        """Sample the stack until stopped"""
+
+        while not self._stopping.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """Get the samples in the collapsed stack format"""
+
+        return "\n".join(
+            f"{stack} {count}"
+            for stack, count in self.stacks.most_common()
+        )
+
+
+async def sample_profile(seconds:float) -> str:
+    """Sample the event loop's thread for a number of seconds
+
+    Args:
+        seconds (float): How long to sample for.
+
+    Returns:
+        str: The collapsed stacks.
+    """
+
+    log.info("Sampling the event loop for %s seconds", seconds)
+
+    profiler = SamplingProfiler(threading.get_ident())
+    profiler.start()
+
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+
+    log.info("Collected %s samples", sum(profiler.stacks.values()))
+    return profiler.collapsed()
+
+async def cprofile_profile(seconds:float, top:int=50) -> str:
+    """Profile everything the event loop runs for a number of seconds
+
+    Args:
+        seconds (float): How long to profile for.
+        top (int, optional): Number of functions to list. Defaults to 50.
+
+    Returns:
+        str: The stats table sorted by cumulative time.
+    """
+
+    log.info("Profiling the event loop for %s seconds", seconds)
+
+    # The profiler only sees the thread it is enabled in, which is
+    # the event loop's thread, so that is everything the bot runs.
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+    return output.getvalue()
+
+async def tracemalloc_diff(seconds:float, top:int=25) -> str:
+    """Compare memory allocations from before and after a number
+    of seconds.
+
+    Args:
+        seconds (float): Time between the two snapshots.
+        top (int, optional): Number of allocation sites to list.
+            Defaults to 25.
+
+    Returns:
+        str: A table of the allocation sites that grew the most.
+    """
+
+    log.info("Tracing memory allocations for %s seconds", seconds)
+
+    # Tracing is expensive, only keep it on if someone else started it
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start()
+
+    ignore = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    )
+
+    try:
+        before = tracemalloc.take_snapshot().filter_traces(ignore)
+        started = time.monotonic()
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot().filter_traces(ignore)
+    finally:
+        if started_here:
+            tracemalloc.stop()
+
+    stats = after.compare_to(before, "lineno")
+
+    lines = [
+        f"Allocations over {time.monotonic() - started:.1f} seconds, "
+        f"top {top} of {len(stats)} sites",
+        "",
+        f"{'Size Diff':>12} {'Size':>12} {'Count Diff':>11}  Location"
+    ]
+    for stat in stats[:top]:
+        frame = stat.traceback[0]
+        lines.append(
+            f"{stat.size_diff / 1024:>10.1f}KB "
+            f"{stat.size / 1024:>10.1f}KB "
+            f"{stat.count_diff:>11}  {frame.filename}:{frame.lineno}"
+        )
+
+    return "\n".join(lines)
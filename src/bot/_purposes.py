@@ -0,0 +1,138 @@
+"""
+In memory map of the purposed objects of every guild
+"""
+
+import logging
+from enum import Enum
+
+from db import db
+
+
+log = logging.getLogger(__name__)
+
+# Also timed by src/bench/queries.py
+PURPOSES_LOAD_SQL = (
+    "SELECT guild_id, purpose_id, object_id FROM purposed_objects "
+    "ORDER BY id"
+)
+
+
+def _purpose_id(purpose:Enum | int) -> int:
+    """Get the ID of a purpose from its enum member or ID"""
+
+    return purpose.value if isinstance(purpose, Enum) else purpose
+
+
+class PurposeMap:
+    """The purposed categories, channels and roles of every guild.
+
+    It's loaded once, then kept up to date by the purpose events that
+    the purpose cog dispatches and by deleted channels and roles, so
+    cogs can look up a purpose without querying the database.
+    """
+
+    def __init__(self):
+        # Object IDs by purpose ID, by guild ID, in the order they
+        # were given their purpose
+        self._guilds: dict[int, dict[int, list[int]]] = {}
+
+    def load(self):
+        """Load every purposed object from the database"""
+
+        self._guilds.clear()
+        records = db.records(PURPOSES_LOAD_SQL)
+        for guild_id, purpose_id, object_id in records:
+            self.add(guild_id, purpose_id, object_id)
+
+        log.info("Loaded %s purposed objects", len(records))
+
+    def get(self, guild_id:int, purpose:Enum | int) -> list[int]:
+        """Get the objects of a guild with a purpose
+
+        Args:
+            guild_id (int): The guild's ID.
+            purpose (Enum | int): The purpose or its ID.
+
+        Returns:
+            list[int]: The object IDs, empty if there are none.
+        """
+
+        purposes = self._guilds.get(guild_id, {})
+        return list(purposes.get(_purpose_id(purpose), ()))
+
+    def first(self, guild_id:int, purpose:Enum | int) -> int | None:
+        """Get the first object of a guild with a purpose
+
+        Args:
+            guild_id (int): The guild's ID.
+            purpose (Enum | int): The purpose or its ID.
+
+        Returns:
+            int: The object ID, None if there isn't one.
+        """
+
+        objects = self._guilds.get(guild_id, {}).get(_purpose_id(purpose))
+        return objects[0] if objects else None
+
+    def everywhere(
+        self,
+        purpose:Enum | int,
+        guild_ids:set[int]=None
+    ) -> list[int]:
+        """Get the objects with a purpose in every guild
+
+        Args:
+            purpose (Enum | int): The purpose or its ID.
+            guild_ids (set[int], optional): Only look in these guilds.
+
+        Returns:
+            list[int]: The object IDs.
+        """
+
+        purpose_id = _purpose_id(purpose)
+        return [
+            object_id for guild_id, purposes in self._guilds.items()
+            if guild_ids is None or guild_id in guild_ids
+            for object_id in purposes.get(purpose_id, ())
+        ]
+
+    def add(self, guild_id:int, purpose_id:int, object_id:int):
+        """Give an object a purpose
+
+        Args:
+            guild_id (int): The object's guild ID.
+            purpose_id (int): The purpose ID.
+            object_id (int): The object's ID.
+        """
+
+        purposes = self._guilds.setdefault(guild_id, {})
+        objects = purposes.setdefault(purpose_id, [])
+        if object_id not in objects:
+            objects.append(object_id)
+
+    def remove(self, guild_id:int, purpose_id:int, object_id:int):
+        """Take a purpose away from an object
+
+        Args:
+            guild_id (int): The object's guild ID.
+            purpose_id (int): The purpose ID.
+            object_id (int): The object's ID.
+        """
+
+        purposes = self._guilds.get(guild_id, {})
+        objects = purposes.get(purpose_id, [])
+        if object_id in objects:
+            objects.remove(object_id)
+        if not objects:
+            purposes.pop(purpose_id, None)
+
+    def discard_object(self, guild_id:int, object_id:int):
+        """Take every purpose away from an object, e.g. when it's deleted
+
+        Args:
+            guild_id (int): The object's guild ID.
+            object_id (int): The object's ID.
+        """
+
+        for purpose_id in list(self._guilds.get(guild_id, {})):
+            self.remove(guild_id, purpose_id, object_id)
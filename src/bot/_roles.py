@@ -0,0 +1,244 @@
+"""
+Queue for role changes, merged per member and applied role by role
+"""
+
+import logging
+import asyncio
+from time import perf_counter
+
+import discord
+
+from constants import ROLE_QUEUE_CONCURRENCY, ROLE_QUEUE_WINDOW
+from ._stats import LatencyStats
+
+
+log = logging.getLogger(__name__)
+
+
+class RoleChange:
+    """The pending role changes of a single member"""
+
+    __slots__ = ("member", "add", "remove", "reasons", "futures", "queued_at")
+
+    def __init__(self, member:discord.Member):
+        self.member = member
+        self.add: dict[int, discord.abc.Snowflake] = {}
+        self.remove: dict[int, discord.abc.Snowflake] = {}
+        self.reasons: list[str] = []
+        self.futures: list[asyncio.Future] = []
+        self.queued_at = perf_counter()
+
+    def changes(
+        self,
+        member:discord.Member | None
+    ) -> tuple[list[discord.abc.Snowflake], list[discord.abc.Snowflake]]:
+        """Get the roles to add and remove
+
+        Args:
+            member (discord.Member | None): The cached member, kept up
+                to date by member updates, None if it isn't cached.
+
+        Returns:
+            tuple[list, list]: The roles to add and to remove, leaving
+                out the ones the cached member already has or hasn't.
+        """
+
+        if member is None:
+            return list(self.add.values()), list(self.remove.values())
+
+        current = {role.id for role in member.roles}
+        return (
+            [role for role_id, role in self.add.items()
+             if role_id not in current],
+            [role for role_id, role in self.remove.items()
+             if role_id in current]
+        )
+
+
+class RoleQueue:
+    """Applies role changes with as few requests as possible.
+
+    Every change to a member waiting in the queue is merged, so adding
+    a role twice is one request, and adding then removing the same role
+    cancels out. The roles are added and removed one at a time rather
+    than by setting the member's whole role list, so changes made by
+    anyone else at the same time are never overwritten. Each guild is
+    worked through one member at a time, because discord rate limits
+    member edits per guild, and only a few guilds are worked on at once.
+    """
+
+    def __init__(
+        self,
+        concurrency:int=ROLE_QUEUE_CONCURRENCY,
+        window:float=ROLE_QUEUE_WINDOW
+    ):
+        """Create a new role queue
+
+        Args:
+            concurrency (int, optional): Guilds worked on at once.
+            window (float, optional): Seconds to wait for more changes
+                before a guild's queue is worked on.
+        """
+
+        self.window = window
+        self.latency = LatencyStats()
+        self.edits = 0
+        self.merged = 0
+        self.failed = 0
+
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._pending: dict[int, dict[int, RoleChange]] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+
+    @property
+    def depth(self) -> int:
+        """The number of members with changes waiting"""
+
+        return sum(len(changes) for changes in self._pending.values())
+
+    def add(
+        self,
+        member:discord.Member,
+        *roles:discord.abc.Snowflake,
+        reason:str=None
+    ) -> asyncio.Future:
+        """Queue roles to be added to a member
+
+        Args:
+            member (discord.Member): The member.
+            *roles (discord.abc.Snowflake): The roles to add.
+            reason (str, optional): Reason for the audit log.
+
+        Returns:
+            asyncio.Future: Done when the member has been edited.
+        """
+
+        return self._queue(member, roles, (), reason)
+
+    def remove(
+        self,
+        member:discord.Member,
+        *roles:discord.abc.Snowflake,
+        reason:str=None
+    ) -> asyncio.Future:
+        """Queue roles to be removed from a member
+
+        Args:
+            member (discord.Member): The member.
+            *roles (discord.abc.Snowflake): The roles to remove.
+            reason (str, optional): Reason for the audit log.
+
+        Returns:
+            asyncio.Future: Done when the member has been edited.
+        """
+
+        return self._queue(member, (), roles, reason)
+
+    def _queue(self, member, add, remove, reason) -> asyncio.Future:
+        """Merge the roles into the member's pending change"""
+
+        changes = self._pending.setdefault(member.guild.id, {})
+        change = changes.get(member.id)
+
+        if change is None:
+            change = changes[member.id] = RoleChange(member)
+        else:
+            self.merged += 1
+
+        for role in add:
+            change.remove.pop(role.id, None)
+            change.add[role.id] = role
+
+        for role in remove:
+            change.add.pop(role.id, None)
+            change.remove[role.id] = role
+
+        if reason:
+            change.reasons.append(reason)
+
+        future = asyncio.get_running_loop().create_future()
+
+        # Callers don't have to wait for the result, so make sure that
+        # an unretrieved failure isn't reported.
+        future.add_done_callback(
+            lambda fut: fut.cancelled() or fut.exception()
+        )
+        change.futures.append(future)
+
+        if member.guild.id not in self._workers:
+            self._workers[member.guild.id] = asyncio.create_task(
+                self._work(member.guild.id),
+                name=f"role-queue-{member.guild.id}"
+            )
+
+        return future
+
+    async def _work(self, guild_id:int):
+        """Apply the pending changes of a guild until there are none"""
+
+        try:
+            await asyncio.sleep(self.window)
+
+            async with self._semaphore:
+                changes = self._pending.get(guild_id)
+                while changes:
+                    member_id = next(iter(changes))
+                    await self._apply(changes.pop(member_id))
+
+        finally:
+            # Only left over if the worker was cancelled
+            for change in self._pending.pop(guild_id, {}).values():
+                for future in change.futures:
+                    future.cancel()
+
+            self._workers.pop(guild_id, None)
+
+    async def _apply(self, change:RoleChange):
+        """Add and remove a member's roles"""
+
+        # Skip what the latest version of the member already has, the
+        # queued one may be stale or never have been cached
+        member = change.member
+        add, remove = change.changes(member.guild.get_member(member.id))
+        reason = ", ".join(change.reasons) or None
+
+        try:
+            if add:
+                await member.add_roles(*add, reason=reason)
+            if remove:
+                await member.remove_roles(*remove, reason=reason)
+            self.edits += len(add) + len(remove)
+
+        except asyncio.CancelledError:
+            for future in change.futures:
+                future.cancel()
+            raise
+
+        except discord.HTTPException as err:
+            self.failed += 1
+            log.error("Failed to edit the roles of %s: %s", member, err)
+
+            for future in change.futures:
+                if not future.done():
+                    future.set_exception(err)
+            return
+
+        self.latency.record(perf_counter() - change.queued_at)
+        for future in change.futures:
+            if not future.done():
+                future.set_result(None)
+
+    async def join(self):
+        """Wait until every queued change has been applied"""
+
+        while self._workers:
+            await asyncio.gather(
+                *self._workers.values(),
+                return_exceptions=True
+            )
+
+    def close(self):
+        """Stop working on the queue, pending changes are dropped"""
+
+        for worker in self._workers.values():
+            worker.cancel()
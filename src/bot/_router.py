@@ -0,0 +1,81 @@
+"""
+Route component interactions to handlers by their custom_id
+"""
+
+import re
+import logging
+from typing import Callable, Coroutine
+
+import discord
+from discord import Interaction as Inter
+
+
+log = logging.getLogger(__name__)
+
+Handler = Callable[[Inter, re.Match], Coroutine]
+
+
+class InteractionRouter:
+    """Calls a handler for each component interaction whose custom_id
+    matches the handler's pattern.
+
+    Unlike persistent views, which need a view for every custom_id,
+    a single pattern can cover every message of a kind, with the state
+    it needs encoded in the custom_id, so the components keep working
+    after a restart.
+    """
+
+    def __init__(self):
+        self._routes: list[tuple[re.Pattern, Handler]] = []
+
+    def add(self, pattern:str | re.Pattern, handler:Handler):
+        """Route the custom_ids that fully match a pattern to a handler
+
+        Args:
+            pattern (str | re.Pattern): The pattern.
+            handler (Handler): Called with the interaction and the match.
+        """
+
+        self._routes.append((re.compile(pattern), handler))
+
+    def remove(self, handler:Handler):
+        """Stop routing to a handler
+
+        Args:
+            handler (Handler): The handler.
+        """
+
+        self._routes = [
+            (pattern, route) for pattern, route in self._routes
+            if route != handler
+        ]
+
+    async def dispatch(self, inter:Inter) -> bool:
+        """Call the handler of an interaction, if it has one
+
+        Args:
+            inter (Inter): The interaction.
+
+        Returns:
+            bool: Whether the interaction was routed.
+        """
+
+        if inter.type != discord.InteractionType.component:
+            return False
+
+        custom_id = (inter.data or {}).get("custom_id", "")
+
+        for pattern, handler in self._routes:
+            if match := pattern.fullmatch(custom_id):
+                break
+        else:
+            return False
+
+        log.debug("Routing %s to %s", custom_id, handler.__qualname__)
+
+        try:
+            await handler(inter, match)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Failed to handle %s", custom_id)
+
+        return True
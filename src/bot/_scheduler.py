@@ -0,0 +1,180 @@
+"""
+Run something every day at the same local time in many timezones
+"""
+
+import heapq
+import logging
+import asyncio
+from time import time as now
+from datetime import datetime, date, time, timedelta
+from zoneinfo import ZoneInfo
+from typing import Callable, Coroutine, Iterable
+
+
+log = logging.getLogger(__name__)
+
+
+class DailyScheduler:
+    """Calls a coroutine function once a day at a local time, in each
+    of the timezones it's given.
+
+    The next run of every timezone is kept in a heap, so only the
+    earliest one is waited for. Changing the timezones doesn't touch
+    the heap, instead each entry holds the version of its timezone,
+    and entries that are out of date are skipped when they come up.
+    """
+
+    def __init__(
+        self,
+        callback:Callable[[str, date], Coroutine],
+        at:time,
+        name:str="daily-scheduler"
+    ):
+        """Create a new scheduler
+
+        Args:
+            callback (Callable[[str, date], Coroutine]): Called with the
+                timezone name and its local date.
+            at (time): The local time to run at.
+            name (str, optional): Name for the task and logs.
+        """
+
+        self.callback = callback
+        self.at = at
+        self.name = name
+
+        # Entries of (timestamp, timezone, version)
+        self._heap: list[tuple[float, str, int]] = []
+        self._versions: dict[str, int] = {}
+        self._timezones: set[str] = set()
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task = None
+
+    @property
+    def timezones(self) -> set[str]:
+        """The timezones that are currently scheduled"""
+
+        return set(self._timezones)
+
+    def next_run(self, timezone:str, after:datetime=None) -> datetime:
+        """Get the next time the scheduler runs in a timezone
+
+        Args:
+            timezone (str): The timezone name.
+            after (datetime, optional): Defaults to now.
+
+        Returns:
+            datetime: The next run, aware of its timezone.
+        """
+
+        tz = ZoneInfo(timezone)
+        local = (after or datetime.now(tz)).astimezone(tz)
+
+        run = datetime.combine(local.date(), self.at, tzinfo=tz)
+        if run <= local:
+            run = datetime.combine(
+                local.date() + timedelta(days=1), self.at, tzinfo=tz
+            )
+
+        return run
+
+    def add(self, timezone:str):
+        """Start running in a timezone, does nothing if it already is
+
+        Args:
+            timezone (str): The timezone name.
+        """
+
+        if timezone in self._timezones:
+            return
+
+        self._timezones.add(timezone)
+        self._versions[timezone] = self._versions.get(timezone, 0) + 1
+        self._push(timezone, self.next_run(timezone))
+
+    def discard(self, timezone:str):
+        """Stop running in a timezone
+
+        Args:
+            timezone (str): The timezone name.
+        """
+
+        # The entry is left in the heap and skipped when it comes up
+        if timezone in self._timezones:
+            self._timezones.discard(timezone)
+            self._versions[timezone] += 1
+
+    def set_timezones(self, timezones:Iterable[str]):
+        """Run in exactly these timezones
+
+        Args:
+            timezones (Iterable[str]): The timezone names.
+        """
+
+        timezones = set(timezones)
+        for timezone in self.timezones - timezones:
+            self.discard(timezone)
+        for timezone in timezones:
+            self.add(timezone)
+
+    def _push(self, timezone:str, run:datetime):
+        """Add the next run of a timezone to the heap"""
+
+        timestamp = run.timestamp()
+        entry = (timestamp, timezone, self._versions[timezone])
+
+        # Wake the runner if this comes before what it's waiting for
+        if not self._heap or timestamp < self._heap[0][0]:
+            self._wake.set()
+
+        heapq.heappush(self._heap, entry)
+        log.debug("%s scheduled %s for %s", self.name, timezone, run)
+
+    def start(self):
+        """Start running the callbacks"""
+
+        self._task = asyncio.create_task(self._run(), name=self.name)
+
+    def stop(self):
+        """Stop running the callbacks"""
+
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        """Wait for the next run and call the callback, forever"""
+
+        while True:
+            self._wake.clear()
+
+            if not self._heap:
+                await self._wake.wait()
+                continue
+
+            timestamp, timezone, version = self._heap[0]
+
+            # Lazily drop the runs of timezones that were changed
+            if self._versions.get(timezone) != version:
+                heapq.heappop(self._heap)
+                continue
+
+            delay = timestamp - now()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+                # Something earlier may have been added, start again
+                continue
+
+            heapq.heappop(self._heap)
+            run = datetime.fromtimestamp(timestamp, ZoneInfo(timezone))
+            self._push(timezone, self.next_run(timezone, run))
+
+            log.info("%s running for %s", self.name, timezone)
+            try:
+                await self.callback(timezone, run.date())
+            except Exception:  # pylint: disable=broad-except
+                log.exception("%s failed for %s", self.name, timezone)
@@ -0,0 +1,163 @@
+"""
+Drains the bot's queues and running work when it shuts down
+"""
+
+import logging
+import asyncio
+from time import perf_counter
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from constants import SHUTDOWN_TIMEOUT, SHUTDOWN_HOOK_DEADLINE
+
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class DrainHook:
+    """Dataclass for how a subsystem is drained"""
+
+    name: str
+    drain: Callable[[], Awaitable[Any]]
+    drop: Callable[[], Any] | None
+    depth: Callable[[], int] | None
+    deadline: float
+
+
+@dataclass
+class DrainReport:
+    """Dataclass for how draining a subsystem went"""
+
+    name: str
+    status: str
+    waiting: int
+    dropped: int
+    seconds: float
+
+    @property
+    def flushed(self) -> int:
+        """The amount of work finished while draining"""
+
+        return self.waiting - self.dropped
+
+    def format(self) -> str:
+        """Format the report as a single line"""
+
+        return (
+            f"{self.name}: {self.status}, {self.flushed} flushed, "
+            f"{self.dropped} dropped in {self.seconds:.2f}s"
+        )
+
+
+class ShutdownCoordinator:
+    """Lets the work that's queued or running finish before the bot
+    closes, rather than losing it.
+
+    Subsystems register a hook that waits for their work, how much is
+    waiting and how to drop it. The hooks are drained at the same time,
+    each for at most its own deadline and all of them for at most the
+    total timeout, after which whatever is left is dropped.
+    """
+
+    def __init__(self, timeout:float=SHUTDOWN_TIMEOUT):
+        """Create a new shutdown coordinator
+
+        Args:
+            timeout (float, optional): Seconds to drain everything in.
+        """
+
+        self.timeout = timeout
+        self.reports: list[DrainReport] = None
+        self._hooks: dict[str, DrainHook] = {}
+
+    def register(
+        self,
+        name:str,
+        drain:Callable[[], Awaitable[Any]],
+        drop:Callable[[], Any]=None,
+        depth:Callable[[], int]=None,
+        deadline:float=SHUTDOWN_HOOK_DEADLINE
+    ):
+        """Drain a subsystem on shutdown
+
+        Args:
+            name (str): The subsystem's name, shown in the report.
+            drain (Callable): Waits until the subsystem's work is done.
+            drop (Callable, optional): Drops the work that's left when
+                the deadline is missed.
+            depth (Callable, optional): The amount of work waiting.
+            deadline (float, optional): Seconds to drain it in.
+        """
+
+        self._hooks[name] = DrainHook(name, drain, drop, depth, deadline)
+
+    def unregister(self, name:str):
+        """Stop draining a subsystem, e.g. when its cog is unloaded
+
+        Args:
+            name (str): The subsystem's name.
+        """
+
+        self._hooks.pop(name, None)
+
+    async def run(self) -> list[DrainReport]:
+        """Drain every subsystem, only the first call does anything
+
+        Returns:
+            list[DrainReport]: How each subsystem was drained.
+        """
+
+        if self.reports is not None:
+            return self.reports
+
+        # Set now so that closing again while draining doesn't wait
+        self.reports = []
+        log.info("Draining %s subsystems", len(self._hooks))
+
+        self.reports = list(await asyncio.gather(
+            *(self._drain(hook) for hook in self._hooks.values())
+        ))
+
+        for report in self.reports:
+            if report.status == "flushed":
+                log.info(report.format())
+            else:
+                log.warning(report.format())
+
+        return self.reports
+
+    async def _drain(self, hook:DrainHook) -> DrainReport:
+        """Drain a subsystem, dropping what's left at its deadline"""
+
+        start = perf_counter()
+        waiting = hook.depth() if hook.depth else 0
+
+        task = asyncio.create_task(hook.drain(), name=f"drain-{hook.name}")
+        done, _ = await asyncio.wait(
+            {task}, timeout=min(hook.deadline, self.timeout)
+        )
+
+        dropped = 0
+        if task in done and task.exception() is None:
+            status = "flushed"
+        else:
+            if task in done:
+                status = "failed"
+                log.error(
+                    "Failed to drain %s", hook.name,
+                    exc_info=task.exception()
+                )
+            else:
+                status = "timed out"
+
+            # Count what's left before it's dropped
+            dropped = hook.depth() if hook.depth else 0
+            task.cancel()
+            if hook.drop:
+                hook.drop()
+
+        return DrainReport(
+            hook.name, status, max(waiting, dropped), dropped,
+            perf_counter() - start
+        )
@@ -0,0 +1,82 @@
+"""
+Latency statistics, used to measure how long things take
+"""
+
+import logging
+from bisect import bisect_left
+from collections import deque
+
+from constants import LATENCY_SAMPLE_SIZE, LATENCY_BUCKETS_MS
+
+
+log = logging.getLogger(__name__)
+
+
+class LatencyStats:
+    """Rolling samples of a latency for percentiles, and a histogram
+    of every sample ever recorded."""
+
+    __slots__ = ("samples", "buckets", "count")
+
+    def __init__(self, size:int=LATENCY_SAMPLE_SIZE):
+        self.samples: deque[float] = deque(maxlen=size)
+
+        # One extra bucket for anything over the last bound
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+
+    def record(self, seconds:float):
+        """Record a new sample
+
+        Args:
+            seconds (float): The latency in seconds.
+        """
+
+        self.samples.append(seconds)
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+        self.count += 1
+
+    def percentile(self, percent:float) -> float | None:
+        """Get a percentile of the recent samples
+
+        Args:
+            percent (float): The percentile, between 0 and 100.
+
+        Returns:
+            float: The latency in seconds.
+            None: If there are no samples.
+        """
+
+        if not self.samples:
+            return None
+
+        ordered = sorted(self.samples)
+        index = round(percent / 100 * (len(ordered) - 1))
+        return ordered[index]
+
+    def histogram(self) -> list[tuple[str, int]]:
+        """Get the histogram of all samples
+
+        Returns:
+            list[tuple[str, int]]: Pairs of bucket label and count.
+        """
+
+        labels = [f"<= {bound}ms" for bound in LATENCY_BUCKETS_MS]
+        labels.append(f"> {LATENCY_BUCKETS_MS[-1]}ms")
+        return list(zip(labels, self.buckets))
+
+
+def format_ms(seconds:float | None) -> str:
+    """Format a latency in seconds as milliseconds
+
+    Args:
+        seconds (float | None): The latency, None if there is no data.
+
+    Returns:
+        str: The formatted latency.
+    """
+
+    if seconds is None:
+        return "-"
+
+    return f"{seconds * 1000:.0f}ms"
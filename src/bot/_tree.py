@@ -0,0 +1,238 @@
+"""
+Command tree that measures the latency of every app command
+"""
+
+import logging
+import asyncio
+from time import perf_counter
+
+import discord
+from discord import (
+    app_commands,
+    utils,
+    Interaction as Inter,
+    InteractionResponse,
+    Webhook
+)
+
+from ._stats import LatencyStats
+
+
+log = logging.getLogger(__name__)
+
+# The timing swaps in its own response and interaction class, and wraps
+# the method that invokes commands, none of which discord.py makes
+# public. It is only known to work with the version pinned in
+# requirements.txt.
+DISCORD_VERSION = (2, 1, 0)
+
+
+def check_discord_internals():
+    """Check the discord.py internals the command timing relies on
+
+    Raises:
+        RuntimeError: If discord.py isn't the pinned version, or the
+            internals have changed.
+    """
+
+    version = tuple(discord.version_info[:3])
+    if version != DISCORD_VERSION:
+        raise RuntimeError(
+            f"The command timing needs discord.py "
+            f"{'.'.join(map(str, DISCORD_VERSION))}, but "
+            f"{discord.__version__} is installed"
+        )
+
+    missing = {"_cs_response", "_cs_followup"} - set(Inter.__slots__)
+    if missing:
+        raise RuntimeError(f"discord.Interaction has no {', '.join(missing)}")
+
+    if not callable(getattr(app_commands.CommandTree, "_call", None)):
+        raise RuntimeError("discord.app_commands.CommandTree has no _call")
+
+
+class CommandMetrics:
+    """Latency metrics for a single app command or context menu"""
+
+    __slots__ = ("defer", "response", "content", "total")
+
+    def __init__(self):
+        self.defer = LatencyStats()
+        self.response = LatencyStats()
+        self.content = LatencyStats()
+        self.total = LatencyStats()
+
+
+class TimedInteractionResponse(InteractionResponse):
+    """Interaction response that remembers when it was first used, and
+    when the user first saw more than a "thinking" message"""
+
+    __slots__ = ("started", "deferred_at", "responded_at", "content_at")
+
+    def __init__(self, parent:Inter):
+        super().__init__(parent)
+        self.started = perf_counter()
+        self.deferred_at: float = None
+        self.responded_at: float = None
+        self.content_at: float = None
+
+    def _stamp(self, deferred:bool=False):
+        """Stamp the time of the first response, and of the first
+        content unless it was deferred"""
+
+        if not deferred:
+            self._stamp_content()
+
+        if self.responded_at is not None:
+            return
+
+        self.responded_at = perf_counter()
+        if deferred:
+            self.deferred_at = self.responded_at
+
+    def _stamp_content(self):
+        """Stamp the time of the first content"""
+
+        if self.content_at is None:
+            self.content_at = perf_counter()
+
+    async def defer(self, **kwargs):
+        await super().defer(**kwargs)
+        self._stamp(deferred=True)
+
+    async def send_message(self, *args, **kwargs):
+        await super().send_message(*args, **kwargs)
+        self._stamp()
+
+    async def edit_message(self, **kwargs):
+        await super().edit_message(**kwargs)
+        self._stamp()
+
+    async def send_modal(self, modal):
+        await super().send_modal(modal)
+        self._stamp()
+
+
+class TimedFollowup(Webhook):
+    """Followup webhook that stamps the first content sent after an
+    interaction was deferred"""
+
+    __slots__ = ("timed_response",)
+
+    async def send(self, *args, **kwargs):
+        message = await super().send(*args, **kwargs)
+        self.timed_response._stamp_content()
+        return message
+
+
+class TimedInteraction(Inter):
+    """Interaction whose followups and edits of the original response
+    are stamped, swapped in for the interactions of commands"""
+
+    # Same layout as the interaction, so its class can be swapped
+    __slots__ = ()
+
+    @utils.cached_slot_property("_cs_followup")
+    def followup(self) -> TimedFollowup:
+        webhook = TimedFollowup.from_state(
+            data={"id": self.application_id, "type": 3, "token": self.token},
+            state=self._state
+        )
+        webhook.timed_response = self.response
+        return webhook
+
+    async def edit_original_response(self, **kwargs):
+        message = await super().edit_original_response(**kwargs)
+        self.response._stamp_content()
+        return message
+
+
+class CommandTree(app_commands.CommandTree):
+    """Command tree that records the time-to-defer, time-to-first-response
+    and total handler time of every app command and context menu."""
+
+    def __init__(self, client, **kwargs):
+        check_discord_internals()
+        super().__init__(client, **kwargs)
+
+        # Metrics for each command by its qualified name
+        self.metrics: dict[str, CommandMetrics] = {}
+
+        # The tasks of the commands being run
+        self._running: set[asyncio.Task] = set()
+
+    @property
+    def running(self) -> int:
+        """The number of commands being run"""
+
+        return len(self._running)
+
+    async def join(self):
+        """Wait until the commands being run are done, other than the
+        one calling this"""
+
+        while tasks := self._running - {asyncio.current_task()}:
+            await asyncio.wait(tasks)
+
+    def cancel(self):
+        """Cancel the commands being run, other than the one calling
+        this"""
+
+        for task in self._running - {asyncio.current_task()}:
+            task.cancel()
+
+    async def _call(self, interaction:Inter):
+        # discord.py has no public hook that wraps the whole invocation
+        # of a command, so we wrap the method that does it.
+
+        # Autocomplete goes through here too, we don't want that
+        if interaction.type is not discord.InteractionType.application_command:
+            await super()._call(interaction)
+            return
+
+        # Swap in a response that stamps when it is first used, and
+        # followups and edits that stamp the first content
+        response = TimedInteractionResponse(interaction)
+        interaction._cs_response = response
+        interaction.__class__ = TimedInteraction
+
+        task = asyncio.current_task()
+        self._running.add(task)
+
+        try:
+            await super()._call(interaction)
+        finally:
+            self._running.discard(task)
+            self._record(interaction, response, perf_counter())
+
+    def _record(
+        self,
+        inter:Inter,
+        response:TimedInteractionResponse,
+        end:float
+    ):
+        """Record the timings of a finished interaction"""
+
+        command = inter.command
+        name = command.qualified_name if command \
+            else inter.data.get("name", "unknown")
+
+        metrics = self.metrics.get(name)
+        if metrics is None:
+            metrics = self.metrics[name] = CommandMetrics()
+
+        metrics.total.record(end - response.started)
+
+        if response.responded_at is not None:
+            metrics.response.record(response.responded_at - response.started)
+
+        if response.deferred_at is not None:
+            metrics.defer.record(response.deferred_at - response.started)
+
+        if response.content_at is not None:
+            metrics.content.record(response.content_at - response.started)
+
+        log.debug(
+            "Command %s took %.3f seconds",
+            name, end - response.started
+        )
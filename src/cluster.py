@@ -0,0 +1,512 @@
+"""Run the bot as a cluster of processes, each running a range of the
+shards, watched over by a supervisor that restarts them if they crash.
+Started by main.py with `--clusters`."""
+
+import signal
+import asyncio
+import logging
+import threading
+import multiprocessing
+from itertools import count
+from time import perf_counter
+from typing import Any, Callable
+from multiprocessing.connection import Connection
+
+import discord
+
+from db import db
+from bot import Bot
+from bot._cluster import ClusterInfo, ClusterClient
+from bot._loop import install_uvloop
+from bot._logs import setup_logs
+from constants import (
+    CLUSTER_IDENTIFY_INTERVAL,
+    CLUSTER_RESTART_DELAY,
+    CLUSTER_RESTART_MAX_DELAY,
+    CLUSTER_STABLE_AFTER,
+    CLUSTER_QUERY_TIMEOUT,
+    CLUSTER_SHUTDOWN_TIMEOUT
+)
+
+
+log = logging.getLogger(__name__)
+
+# Called in a new process with the cluster's info and pipe, followed
+# by the supervisor's args
+WorkerTarget = Callable[..., None]
+
+
+def split_shards(shard_count:int, clusters:int) -> list[tuple[int, ...]]:
+    """Split the shards into consecutive ranges, one for each cluster
+
+    Args:
+        shard_count (int): The total number of shards.
+        clusters (int): The number of clusters.
+
+    Returns:
+        list[tuple[int, ...]]: The shard IDs of each cluster.
+    """
+
+    if not 0 < clusters <= shard_count:
+        raise ValueError(
+            f"Can't split {shard_count} shards into {clusters} clusters"
+        )
+
+    size, extra = divmod(shard_count, clusters)
+    ranges, start = [], 0
+    for cluster_id in range(clusters):
+        end = start + size + (cluster_id < extra)
+        ranges.append(tuple(range(start, end)))
+        start = end
+
+    return ranges
+
+async def recommended_shards(token:str) -> int:
+    """Get the number of shards discord recommends for the bot
+
+    Args:
+        token (str): The bot's token.
+
+    Returns:
+        int: The shard count.
+    """
+
+    http = discord.http.HTTPClient(asyncio.get_running_loop())
+    try:
+        await http.static_login(token)
+        shard_count, _ = await http.get_bot_gateway()
+    finally:
+        await http.close()
+
+    return shard_count
+
+
+class _Worker:
+    """A cluster's process, as seen by the supervisor"""
+
+    def __init__(self, info:ClusterInfo):
+        self.info = info
+        self.process: multiprocessing.Process = None
+        self.conn: Connection = None
+        self.reader: threading.Thread = None
+        self.started_at = 0
+        self.restarts = 0
+        self.crashes = 0
+        self.ready = asyncio.Event()
+
+    @property
+    def cluster_id(self) -> int:
+        return self.info.cluster_id
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+
+class _Query:
+    """A query waiting for the answers of the clusters"""
+
+    def __init__(self, origin:_Worker | None, origin_id:int, waiting:set[int]):
+        self.origin = origin
+        self.origin_id = origin_id
+        self.waiting = waiting
+        self.results: dict[int, Any] = {}
+        self.future = asyncio.get_running_loop().create_future()
+        self.timer: asyncio.TimerHandle = None
+
+
+class ClusterSupervisor:
+    """Starts a process for each cluster, passes queries between them
+    and restarts the ones that crash.
+
+    Clusters are started one after another, waiting for each to be
+    ready, or long enough for its shards to identify, so that together
+    they stay within discord's identify rate limit.
+    """
+
+    def __init__(
+        self,
+        target:WorkerTarget,
+        clusters:int,
+        shard_count:int,
+        args:tuple=(),
+        identify_interval:float=CLUSTER_IDENTIFY_INTERVAL,
+        restart_delay:float=CLUSTER_RESTART_DELAY
+    ):
+        """Create a new supervisor
+
+        Args:
+            target (WorkerTarget): The function each process runs.
+            clusters (int): The number of clusters.
+            shard_count (int): The total number of shards.
+            args (tuple, optional): More args for the target.
+            identify_interval (float, optional): Seconds each shard
+                needs to identify before the next cluster starts.
+            restart_delay (float, optional): Seconds before a crashed
+                cluster is restarted, doubled for each quick crash.
+        """
+
+        self.target = target
+        self.args = args
+        self.identify_interval = identify_interval
+        self.restart_delay = restart_delay
+
+        self.workers = [
+            _Worker(ClusterInfo(cluster_id, clusters, shards, shard_count))
+            for cluster_id, shards
+            in enumerate(split_shards(shard_count, clusters))
+        ]
+
+        self._context = multiprocessing.get_context("spawn")
+        self._ids = count()
+        self._queries: dict[int, _Query] = {}
+        self._stopping = False
+        self._stopped = asyncio.Event()
+
+    async def run(self):
+        """Start the clusters and supervise them until stopped"""
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except NotImplementedError:
+                # Windows event loops can't, the handler runs between
+                # bytecodes of the main thread instead
+                signal.signal(
+                    sig, lambda *_: loop.call_soon_threadsafe(self.stop)
+                )
+
+        for worker in self.workers:
+            if self._stopping:
+                break
+
+            self._start(worker)
+            try:
+                await asyncio.wait_for(
+                    worker.ready.wait(),
+                    self.identify_interval * len(worker.info.shard_ids)
+                )
+            except asyncio.TimeoutError:
+                pass
+
+        await self._stopped.wait()
+        await self._shutdown()
+
+    def stop(self):
+        """Stop supervising and shut the clusters down"""
+
+        if not self._stopping:
+            log.info("Stopping the clusters")
+            self._stopping = True
+            self._stopped.set()
+
+    async def query(
+        self,
+        name:str,
+        timeout:float=CLUSTER_QUERY_TIMEOUT,
+        **args
+    ) -> dict[int, Any]:
+        """Ask every cluster something
+
+        Args:
+            name (str): The query's name.
+            timeout (float, optional): Seconds to wait for the answers.
+            **args: Passed to the handlers.
+
+        Returns:
+            dict[int, Any]: The answers by cluster ID.
+        """
+
+        return await self._broadcast(None, 0, name, args, timeout).future
+
+    def _start(self, worker:_Worker):
+        """Start the process of a cluster"""
+
+        conn, child_conn = self._context.Pipe()
+        info = ClusterInfo(
+            worker.info.cluster_id,
+            worker.info.clusters,
+            worker.info.shard_ids,
+            worker.info.shard_count,
+            attempt=worker.restarts
+        )
+
+        worker.conn = conn
+        worker.ready.clear()
+        worker.process = self._context.Process(
+            target=self.target,
+            args=(info, child_conn, *self.args),
+            name=f"cluster-{worker.cluster_id}",
+            daemon=False
+        )
+        worker.process.start()
+        worker.started_at = perf_counter()
+        child_conn.close()
+
+        log.info(
+            "Started cluster %s with shards %s (pid %s)",
+            worker.cluster_id, list(info.shard_ids), worker.process.pid
+        )
+
+        # Pipes can't be added to every event loop, e.g. on Windows,
+        # so each one is read by a thread
+        worker.reader = threading.Thread(
+            target=self._read,
+            args=(asyncio.get_running_loop(), worker, conn, worker.process),
+            name=f"cluster-{worker.cluster_id}-reader",
+            daemon=True
+        )
+        worker.reader.start()
+
+    def _read(
+        self,
+        loop:asyncio.AbstractEventLoop,
+        worker:_Worker,
+        conn:Connection,
+        process:multiprocessing.Process
+    ):
+        """Reader thread, hands a cluster's messages to the loop until
+        its process exits"""
+
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            loop.call_soon_threadsafe(self._receive, worker, message)
+
+        # The pipe closes when the process exits, wait for the rest
+        process.join()
+        loop.call_soon_threadsafe(self._exited, worker)
+
+    def _exited(self, worker:_Worker):
+        """Handle a cluster's process exiting"""
+
+        loop = asyncio.get_running_loop()
+        worker.conn.close()
+
+        # It can't answer anything anymore
+        for query_id, query in list(self._queries.items()):
+            query.waiting.discard(worker.cluster_id)
+            self._maybe_finish(query_id)
+
+        exitcode = worker.process.exitcode
+        if self._stopping:
+            log.info("Cluster %s exited with %s", worker.cluster_id, exitcode)
+            return
+
+        # Back off from clusters that keep crashing
+        if perf_counter() - worker.started_at < CLUSTER_STABLE_AFTER:
+            worker.crashes += 1
+        else:
+            worker.crashes = 0
+        delay = min(
+            self.restart_delay * 2 ** max(worker.crashes - 1, 0),
+            CLUSTER_RESTART_MAX_DELAY
+        )
+
+        log.error(
+            "Cluster %s exited with %s, restarting in %ss",
+            worker.cluster_id, exitcode, delay
+        )
+        worker.restarts += 1
+        loop.call_later(delay, self._restart, worker)
+
+    def _restart(self, worker:_Worker):
+        """Start a crashed cluster again"""
+
+        if not self._stopping and not worker.alive:
+            self._start(worker)
+
+    def _receive(self, worker:_Worker, message:dict):
+        """Handle a message from a cluster"""
+
+        match message["op"]:
+
+            case "ready":
+                log.info("Cluster %s is ready", worker.cluster_id)
+                worker.ready.set()
+
+            case "query":
+                self._broadcast(
+                    worker, message["id"], message["name"],
+                    message["args"], message["timeout"]
+                )
+
+            case "response":
+                query = self._queries.get(message["id"])
+                if query and worker.cluster_id in query.waiting:
+                    query.waiting.discard(worker.cluster_id)
+                    query.results[worker.cluster_id] = message["result"]
+                    self._maybe_finish(message["id"])
+
+    def _broadcast(
+        self,
+        origin:_Worker | None,
+        origin_id:int,
+        name:str,
+        args:dict,
+        timeout:float
+    ) -> _Query:
+        """Send a query to every running cluster but its origin"""
+
+        query_id = next(self._ids)
+        targets = [
+            worker for worker in self.workers
+            if worker.alive and worker is not origin
+        ]
+        query = self._queries[query_id] = _Query(
+            origin, origin_id, {worker.cluster_id for worker in targets}
+        )
+        query.timer = asyncio.get_running_loop().call_later(
+            timeout, self._finish, query_id
+        )
+
+        for worker in targets:
+            try:
+                worker.conn.send({
+                    "op": "request", "id": query_id,
+                    "name": name, "args": args
+                })
+            except (BrokenPipeError, OSError):
+                query.waiting.discard(worker.cluster_id)
+
+        self._maybe_finish(query_id)
+        return query
+
+    def _maybe_finish(self, query_id:int):
+        """Finish a query once every cluster has answered"""
+
+        query = self._queries.get(query_id)
+        if query and not query.waiting:
+            self._finish(query_id)
+
+    def _finish(self, query_id:int):
+        """Send the answers of a query to where it came from, the
+        clusters that haven't answered yet are left out"""
+
+        query = self._queries.pop(query_id, None)
+        if query is None:
+            return
+
+        query.timer.cancel()
+        if query.waiting:
+            log.warning(
+                "Clusters %s didn't answer in time", sorted(query.waiting)
+            )
+
+        if not query.future.done():
+            query.future.set_result(query.results)
+
+        if query.origin and query.origin.alive:
+            try:
+                query.origin.conn.send({
+                    "op": "reply", "id": query.origin_id,
+                    "results": query.results
+                })
+            except (BrokenPipeError, OSError):
+                pass
+
+    async def _shutdown(self):
+        """Ask every cluster to shut down, and make them if they don't"""
+
+        for worker in self.workers:
+            if worker.alive:
+                try:
+                    worker.conn.send({"op": "shutdown"})
+                except (BrokenPipeError, OSError):
+                    pass
+
+        deadline = perf_counter() + CLUSTER_SHUTDOWN_TIMEOUT
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+
+            remaining = max(deadline - perf_counter(), 0)
+            await asyncio.to_thread(worker.process.join, remaining)
+            if worker.process.is_alive():
+                log.warning("Cluster %s didn't shut down, killing it", worker.cluster_id)
+                worker.process.kill()
+                worker.process.join()
+
+            # Let it hand over the exit before the loop closes
+            await asyncio.to_thread(worker.reader.join)
+
+
+def run_cluster(
+    info:ClusterInfo,
+    conn:Connection,
+    token:str,
+    debug:bool,
+    use_uvloop:bool
+):
+    """Run the bot for the shards of a cluster, in its own process
+
+    Args:
+        info (ClusterInfo): What this cluster runs.
+        conn (Connection): The pipe to the supervisor.
+        token (str): The bot's token.
+        debug (bool): Run in debug mode.
+        use_uvloop (bool): Run on uvloop, if it's installed.
+    """
+
+    # The supervisor handles interrupts, and tells us when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Every cluster writes to the same database
+    db.share()
+
+    if use_uvloop:
+        install_uvloop()
+
+    asyncio.run(_run_bot(info, conn, token, debug), debug=debug)
+
+async def _run_bot(info:ClusterInfo, conn:Connection, token:str, debug:bool):
+    """Start the bot of a cluster"""
+
+    async with Bot(
+        debug=debug,
+        shard_count=info.shard_count,
+        shard_ids=list(info.shard_ids)
+    ) as bot:
+        bot.cluster = ClusterClient(bot, info, conn)
+        bot.cluster.start()
+
+        await bot.load_extensions()
+        await bot.start(token, reconnect=True)
+
+async def supervise(
+    token:str,
+    clusters:int,
+    shard_count:int=None,
+    debug:bool=False,
+    use_uvloop:bool=False
+):
+    """Run the bot as a cluster of processes until interrupted
+
+    Args:
+        token (str): The bot's token.
+        clusters (int): The number of clusters.
+        shard_count (int, optional): The total number of shards,
+            discord's recommendation if not given.
+        debug (bool, optional): Run the clusters in debug mode.
+        use_uvloop (bool, optional): Run the clusters on uvloop.
+    """
+
+    setup_logs()
+
+    if shard_count is None:
+        shard_count = await recommended_shards(token)
+
+    # Each cluster needs at least one shard
+    shard_count = max(shard_count, clusters)
+
+    log.info(
+        "Running %s shards in %s clusters", shard_count, clusters
+    )
+
+    supervisor = ClusterSupervisor(
+        run_cluster, clusters, shard_count, args=(token, debug, use_uvloop)
+    )
+    await supervisor.run()
@@ -8,6 +8,12 @@ ACTIVITY_MSG = 'I am up and running!'
 DATE_FORMAT = '%d/%m/%Y'
 DATETIME_FORMAT = "%d/%m/%Y %H:%M:%S"
 
+# Gateway constants
+# Show member statuses on levelcards, this needs the presences intent
+# which makes discord send and the bot cache every presence update.
+# Turn it off to leave the status icon out and not request presences.
+SHOW_MEMBER_STATUS = True
+
 # Database constants
 DB_PATH = './data/db/db.sqlite3'
 BUILD_PATH = './data/db/build.sql'
@@ -23,6 +29,11 @@ PRONOUNDB_SET_URL = "https://pronoundb.org/me"
 # Command constants
 BDAY_HELP_MSG = 'Use `/birthday help` for more info'
 
+# Birthday constants
+BIRTHDAY_CHECK_HOUR = 7  # local hour of each guild's timezone
+DEFAULT_TIMEZONE = 'UTC'  # for guilds that haven't set a timezone
+BIRTHDAYS_PER_PAGE = 10
+
 # MSGS
 BAD_TOKEN = 'You have passed an improper or invalid token! Shutting down...'
 NO_TOKEN = 'TOKEN file not found in project root! Shutting down...'
@@ -33,6 +44,66 @@ LOGS = 'logs/'
 LOG_FILENAME_FORMAT_PREFIX = '%Y-%m-%d %H-%M-%S'
 MAX_LOGFILE_AGE_DAYS = 7
 
+# Event loop monitor constants
+LOOP_LAG_INTERVAL = 1  # seconds between each lag measurement
+LOOP_LAG_THRESHOLD = 0.25  # seconds of delay before it's reported
+LOOP_REPORT_COOLDOWN = 300  # seconds between reports to the botlogs
+LOOP_EXECUTOR_WORKERS = 8  # threads for offloaded database and render work
+
+# Latency stats constants
+LATENCY_SAMPLE_SIZE = 1000  # samples kept per metric for percentiles
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Profiler constants
+PROFILE_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+PROFILE_MAX_SECONDS = 300
+
+# Role queue constants
+ROLE_QUEUE_CONCURRENCY = 4  # guilds that have their roles edited at once
+ROLE_QUEUE_WINDOW = 0.5  # seconds to wait for more changes to merge
+
+# Ticket cleanup constants
+TICKET_CLEANUP_CONCURRENCY = 3  # channels deleted at once
+TICKET_CLEANUP_PACE = 0.5  # seconds each worker waits between deletes
+TICKET_CLEANUP_REPORT_INTERVAL = 2  # seconds between progress edits
+
+# Ticket search constants
+TICKET_SEARCH_PER_PAGE = 5
+TICKET_SEARCH_MAX_LENGTH = 50  # characters, the query is kept in a custom_id
+TICKET_SEARCH_MAX_KEY = 72  # encoded length that fits in the custom_id
+
+# Ticket transcript constants
+TRANSCRIPTS_PATH = './data/transcripts/'
+TRANSCRIPT_BATCH_SIZE = 100  # messages written at once, one history page
+
+# Guild log outbox constants
+LOG_OUTBOX_WINDOW = 1  # seconds to wait for more embeds to send together
+LOG_OUTBOX_LIMIT = 200  # embeds waiting per guild before they're dropped
+LOG_WEBHOOK_NAME = 'OneBot Logs'
+
+# Guild log message cache constants
+MESSAGE_CACHE_PER_GUILD = 2000  # recent messages kept per logging guild
+MESSAGE_CACHE_MAX_BYTES = 32 * 1024 * 1024  # rough limit of the whole cache
+
+# Cluster constants
+CLUSTER_IDENTIFY_INTERVAL = 5.5  # seconds each shard takes to identify
+CLUSTER_RESTART_DELAY = 5  # seconds before restarting a crashed cluster
+CLUSTER_RESTART_MAX_DELAY = 300  # longest wait after repeated crashes
+CLUSTER_STABLE_AFTER = 60  # seconds up before a crash isn't a repeat
+CLUSTER_QUERY_TIMEOUT = 5  # seconds to wait for the other clusters
+CLUSTER_SHUTDOWN_TIMEOUT = 30  # seconds for the clusters to shut down
+
+# Shutdown constants
+SHUTDOWN_TIMEOUT = 20  # seconds to drain everything, less than the clusters get
+SHUTDOWN_HOOK_DEADLINE = 10  # default seconds to drain each subsystem
+
+# Embed page constants
+PAGE_CACHE_SIZE = 8  # rendered pages kept per paginated message
+PAGE_MANAGER_LIMIT = 256  # paginated messages kept in memory
+
+# Benchmark constants
+BENCH_PATH = './data/bench/'
+
 # Levelcard constants
 BLACK = "#0F0F0F"
 WHITE = "#F9F9F9"
@@ -43,6 +43,17 @@ def commit():
     log.debug("Committing changes")
     conn.commit()
 
+def share():
+    """Let other processes write to the database too. Every statement
+    is committed as it's made rather than by the autosave, so the write
+    lock is never held for long, and readers don't block writers."""
+
+    log.debug("Sharing the database connection")
+    conn.commit()
+    conn.isolation_level = None
+    cur.execute("PRAGMA journal_mode = WAL;")
+    cur.execute("PRAGMA synchronous = NORMAL;")
+
 def close():
     """Close the database connection"""
 
@@ -13,6 +13,27 @@ from . import db
 
 log = logging.getLogger(__name__)
 
+# Queries of the member levels, also timed by src/bench/queries.py
+LEVEL_XP_SQL = (
+    "SELECT experience FROM member_levels "
+    "WHERE member_id = ? AND guild_id = ?"
+)
+LEVEL_UPDATE_SQL = (
+    "UPDATE member_levels SET experience = ? "
+    "WHERE member_id=? AND guild_id=?"
+)
+LEVEL_DELETE_SQL = "DELETE FROM member_levels WHERE member_id=? AND guild_id=?"
+LEVEL_RANK_SQL = """SELECT rank FROM (
+     SELECT member_id, RANK() OVER ( ORDER BY experience DESC )
+     AS rank
+     FROM member_levels WHERE guild_id = ?
+    ) WHERE member_id = ?
+    """
+LEVEL_TOP_SQL = (
+    "SELECT member_id, experience FROM member_levels "
+    "WHERE guild_id=? ORDER BY experience DESC LIMIT ?"
+)
+
 
 @dataclass(frozen=True)
 class GuildChannels:
@@ -132,15 +153,7 @@ class MemberLevelModel:
         """Get the member rank"""
 
         log.debug("Getting member rank")
-        rank = db.field(
-            """SELECT rank FROM (
-             SELECT member_id, RANK() OVER ( ORDER BY experience DESC )
-             AS rank
-             FROM member_levels WHERE guild_id = ?
-            ) WHERE member_id = ?
-            """,
-            self.guild_id, self.member_id
-        )
+        rank = db.field(LEVEL_RANK_SQL, self.guild_id, self.member_id)
         if rank is None:
             return "?"
 
@@ -174,9 +187,7 @@ class MemberLevelModel:
 
         log.debug("Saving MemberLevelModel")
         db.execute(
-            "UPDATE member_levels SET experience = ? "
-            "WHERE member_id=? AND guild_id=?",
-            self.xp_raw, self.member_id, self.guild_id
+            LEVEL_UPDATE_SQL, self.xp_raw, self.member_id, self.guild_id
         )
         if commit:
             db.commit()
@@ -185,10 +196,7 @@ class MemberLevelModel:
         """Delete this model from the database"""
 
         log.debug("Deleting MemberLevelModel")
-        db.execute(
-            "DELETE FROM member_levels WHERE member_id=? AND guild_id=?",
-            self.member_id, self.guild_id
-        )
+        db.execute(LEVEL_DELETE_SQL, self.member_id, self.guild_id)
         if commit:
             db.commit()
 
@@ -197,11 +205,7 @@ class MemberLevelModel:
         """Create the object from database data"""
 
         log.debug("Creating MemberLevelModel from database")
-        xp = db.field(
-            "SELECT experience FROM member_levels " \
-            "WHERE member_id = ? AND guild_id = ?",
-            member_id, guild_id
-        )
+        xp = db.field(LEVEL_XP_SQL, member_id, guild_id)
         if not xp:
             raise EmptyQueryResult(
                 "There is no data for member with id "
@@ -3,6 +3,7 @@
 import logging
 import asyncio
 
+import discord
 from discord.ext import commands
 
 
@@ -12,10 +13,28 @@ log = logging.getLogger(__name__)
 class BaseCog(commands.Cog):
     """A cog class that all cogs should inherit from."""
 
+    # The gateway intents the cog needs, on top of the guilds intent
+    intents = discord.Intents.none()
+
     def __init__(self, bot):
         super().__init__()
         self.bot: commands.Bot = bot
 
+    def command_metrics(self) -> dict:
+        """Get the latency metrics recorded by the command tree for
+        this cog's app commands.
+
+        Returns:
+            dict: CommandMetrics objects by command name.
+        """
+
+        metrics = self.bot.tree.metrics
+        return {
+            command.qualified_name: metrics[command.qualified_name]
+            for command in self.walk_app_commands()
+            if command.qualified_name in metrics
+        }
+
     @commands.Cog.listener(name="on_ready")
     async def _on_ready(self):
         """
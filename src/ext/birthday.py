@@ -1,34 +1,488 @@
 """Cog for the automated birthday celebration system."""
 
 import logging
-from datetime import datetime, time
-from discord.ext import tasks
+import asyncio
+from bisect import bisect_left
+from calendar import isleap
+from functools import cache, partial
+from datetime import datetime, date, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+from typing import Awaitable, Callable, Iterable
 from discord import app_commands, Interaction as Inter
+from discord.ext import commands
 import discord
 
-from constants import DATE_FORMAT
+from constants import (
+    DATE_FORMAT,
+    DEFAULT_TIMEZONE,
+    BIRTHDAY_CHECK_HOUR,
+    BIRTHDAYS_PER_PAGE,
+    INVALID_PAGE_NUMBER
+)
 from ui import (
     BirthdayModal,
     NextBirthdayEmbed,
+    UpcomingBirthdaysEmbed,
     BirthdayHelpEmbed,
-    CelebrateBirthdayEmbed
+    BirthdayListEmbed,
+    CelebrateBirthdayEmbed,
+    EmbedPageManager,
+    PageProducer
 )
 from db import db
 from db.enums import ChannelPurposes, RolePurposes
+from bot._scheduler import DailyScheduler
 from . import BaseCog
 
 
 log = logging.getLogger(__name__)
 
+# Birthdays are saved as DD/MM/YYYY, so the first five characters
+# are the day and month, which is what the index is on.
+_DAY_KEY = "substr(birthday, 1, 5)"
+
+# Queries of the birthdays, also timed by src/bench/queries.py
+BIRTHDAYS_SQL = "SELECT user_id, birthday FROM user_birthdays"
+BIRTHDAY_SQL = "SELECT birthday FROM user_birthdays WHERE user_id = ?"
+TIMEZONES_SQL = "SELECT guild_id, timezone FROM guild_timezones"
+TIMEZONE_SET_SQL = (
+    "INSERT OR REPLACE INTO guild_timezones (guild_id, timezone) "
+    "VALUES (?, ?)"
+)
+
+
+def birthday_keys(day:date) -> list[str]:
+    """Get the day and month of the birthdays celebrated on a date.
+    Outside of leap years, the 29th of February is celebrated on the
+    28th.
+
+    Args:
+        day (date): The date.
+
+    Returns:
+        list[str]: The birthday keys, formatted as DD/MM.
+    """
+
+    keys = [day.strftime("%d/%m")]
+    if keys[0] == "28/02" and not isleap(day.year):
+        keys.append("29/02")
+
+    return keys
+
+def birthdays_on_sql(keys:int) -> str:
+    """Get the query for the birthdays celebrated on some days
+
+    Args:
+        keys (int): The number of birthday keys it takes.
+
+    Returns:
+        str: The query.
+    """
+
+    return f"{BIRTHDAYS_SQL} WHERE {_DAY_KEY} IN ({', '.join('?' * keys)})"
+
+def birthdays_of_sql(users:int) -> str:
+    """Get the query for the birthdays of some users
+
+    Args:
+        users (int): The number of user ids it takes.
+
+    Returns:
+        str: The query.
+    """
+
+    return f"{BIRTHDAYS_SQL} WHERE user_id IN ({', '.join('?' * users)})"
+
+def get_birthdays_on(day:date) -> list[tuple[int, str]]:
+    """Get the birthdays celebrated on a date
+
+    Args:
+        day (date): The date.
+
+    Returns:
+        list[tuple[int, str]]: The user ids and birthdays.
+    """
+
+    keys = birthday_keys(day)
+    return db.records(birthdays_on_sql(len(keys)), *keys)
+
+async def _send(inter:Inter, **kwargs):
+    """Respond to an interaction, which may have been deferred"""
+
+    if inter.response.is_done():
+        await inter.followup.send(**kwargs)
+    else:
+        await inter.response.send_message(**kwargs)
+
+@cache
+def _all_timezones() -> list[str]:
+    """Get the names of every timezone, sorted"""
+
+    return sorted(available_timezones())
+
+def normalize_birthdays():
+    """Zero pad birthdays saved without padding, e.g. 1/2/2000,
+    otherwise they can't be found by their day and month."""
+
+    data = db.records(
+        "SELECT user_id, birthday FROM user_birthdays WHERE birthday "
+        "NOT GLOB '[0-3][0-9]/[01][0-9]/[0-9][0-9][0-9][0-9]'"
+    )
+
+    for user_id, bday_str in data:
+        try:
+            bday = datetime.strptime(bday_str, DATE_FORMAT)
+        except ValueError:
+            log.warning("Invalid birthday %s for user %s", bday_str, user_id)
+            continue
+
+        db.execute(
+            "UPDATE user_birthdays SET birthday = ? WHERE user_id = ?",
+            bday.strftime(DATE_FORMAT), user_id
+        )
+
+    if data:
+        log.info("Normalized %s birthdays", len(data))
+        db.commit()
+
+def next_birthday(month:int, day:int, after:date) -> date:
+    """Get the first date after another that a birthday is celebrated
+
+    Args:
+        month (int): The month of the birthday.
+        day (int): The day of the birthday.
+        after (date): The date to look after.
+
+    Returns:
+        date: The date of the next celebration.
+    """
+
+    for year in (after.year, after.year + 1):
+        if (month, day) == (2, 29) and not isleap(year):
+            celebrated = date(year, 2, 28)
+        else:
+            celebrated = date(year, month, day)
+
+        if celebrated > after:
+            break
+
+    return celebrated
+
+
+class BirthdayIndex:
+    """The birthdays of the members of each guild, sorted by the day
+    of the year, so the next birthdays can be found with a bisect.
+
+    Entries are (month, day, user_id) tuples. A guild's entries are
+    only built the first time they are needed, by asking discord which
+    of the users with a birthday are its members, as guilds aren't
+    chunked. After that they are kept up to date as birthdays and
+    members change.
+    """
+
+    def __init__(
+        self,
+        resolve:Callable[
+            [discord.Guild, list[int]], Awaitable[list[discord.Member]]
+        ]
+    ):
+        """Create a new birthday index
+
+        Args:
+            resolve (Callable): Gets the members of a guild with the
+                given user IDs, leaving out the users not in it.
+        """
+
+        self._resolve = resolve
+        self._days: dict[int, tuple[int, int]] = {}
+        self._guilds: dict[int, list[tuple[int, int, int]]] = {}
+
+        # Guilds being built, so they are only built once at a time
+        self._building: dict[int, asyncio.Task] = {}
+
+        # Users whose birthday was saved after a guild was built, that
+        # may be its members, by guild ID
+        self._unresolved: dict[int, set[int]] = {}
+
+    def load(self):
+        """Load every birthday from the database"""
+
+        self._days.clear()
+        self._guilds.clear()
+
+        for user_id, bday_str in db.records(BIRTHDAYS_SQL):
+            try:
+                bday = datetime.strptime(bday_str, DATE_FORMAT)
+            except ValueError:
+                continue
+            self._days[user_id] = (bday.month, bday.day)
+
+        log.debug("Loaded %s birthdays into the index", len(self._days))
+
+    def built(self, guild:discord.Guild) -> bool:
+        """Whether a guild's entries are built
+
+        Args:
+            guild (discord.Guild): The guild.
+
+        Returns:
+            bool: False if getting them has to ask discord first.
+        """
+
+        return guild.id in self._guilds and guild.id not in self._unresolved
+
+    async def build(self, guild:discord.Guild) -> list[tuple[int, int, int]]:
+        """Get the entries of a guild, building them if needed
+
+        Args:
+            guild (discord.Guild): The guild.
+
+        Returns:
+            list[tuple[int, int, int]]: The sorted entries.
+        """
+
+        if guild.id in self._guilds:
+            if user_ids := self._unresolved.pop(guild.id, None):
+                for member in await self._resolve(guild, list(user_ids)):
+                    self.add_member(guild.id, member.id)
+
+            return self._guilds[guild.id]
+
+        task = self._building.get(guild.id)
+        if task is None:
+            task = self._building[guild.id] = asyncio.create_task(
+                self._build(guild), name=f"birthday-index-{guild.id}"
+            )
+            task.add_done_callback(
+                lambda _: self._building.pop(guild.id, None)
+            )
+
+        # Shielded, so one caller being cancelled doesn't cancel the
+        # build for the others
+        return await asyncio.shield(task)
+
+    async def _build(self, guild:discord.Guild) -> list[tuple[int, int, int]]:
+        """Build the entries of a guild from its members"""
+
+        log.debug("Building the birthday index of %s", guild.name)
+
+        members = await self._resolve(guild, list(self._days))
+        entries = self._guilds[guild.id] = sorted(
+            (*self._days[member.id], member.id) for member in members
+            if member.id in self._days
+        )
+        return entries
+
+    async def find(
+        self,
+        guild:discord.Guild,
+        user_ids:Iterable[int]
+    ) -> list[int]:
+        """Find which users are members of a guild with a birthday
+
+        Args:
+            guild (discord.Guild): The guild.
+            user_ids (Iterable[int]): The user IDs.
+
+        Returns:
+            list[int]: The IDs of the users in the guild.
+        """
+
+        entries = await self.build(guild)
+        found = []
+        for user_id in user_ids:
+            if (key := self._days.get(user_id)) is None:
+                continue
+
+            entry = (*key, user_id)
+            i = bisect_left(entries, entry)
+            if i < len(entries) and entries[i] == entry:
+                found.append(user_id)
+
+        return found
+
+    def set(self, user_id:int, birthday:date, guild_ids:Iterable[int]):
+        """Add or change a user's birthday
+
+        Args:
+            user_id (int): The user's ID.
+            birthday (date): The birthday.
+            guild_ids (Iterable[int]): The guilds the user is known
+                to be in, the other guilds are asked the next time
+                they are used.
+        """
+
+        self.discard(user_id)
+        self._days[user_id] = (birthday.month, birthday.day)
+
+        guild_ids = set(guild_ids)
+        for guild_id in guild_ids:
+            self.add_member(guild_id, user_id)
+
+        for guild_id in self._guilds.keys() | self._building.keys():
+            if guild_id not in guild_ids:
+                self._unresolved.setdefault(guild_id, set()).add(user_id)
+
+    def discard(self, user_id:int):
+        """Remove a user's birthday from every guild
+
+        Args:
+            user_id (int): The user's ID.
+        """
+
+        key = self._days.pop(user_id, None)
+        if key is None:
+            return
+
+        for entries in self._guilds.values():
+            self._remove(entries, (*key, user_id))
+
+    def add_member(self, guild_id:int, user_id:int):
+        """Add a member of a guild, if they have a birthday
+
+        Args:
+            guild_id (int): The guild's ID.
+            user_id (int): The user's ID.
+        """
+
+        entries = self._guilds.get(guild_id)
+        key = self._days.get(user_id)
+        if entries is None or key is None:
+            return
+
+        entry = (*key, user_id)
+        i = bisect_left(entries, entry)
+        if i == len(entries) or entries[i] != entry:
+            entries.insert(i, entry)
+
+    def remove_member(self, guild_id:int, user_id:int):
+        """Remove a member of a guild
+
+        Args:
+            guild_id (int): The guild's ID.
+            user_id (int): The user's ID.
+        """
+
+        entries = self._guilds.get(guild_id)
+        key = self._days.get(user_id)
+        if entries is not None and key is not None:
+            self._remove(entries, (*key, user_id))
+
+    def forget_guild(self, guild_id:int):
+        """Drop the entries of a guild
+
+        Args:
+            guild_id (int): The guild's ID.
+        """
+
+        self._guilds.pop(guild_id, None)
+        self._unresolved.pop(guild_id, None)
+
+    @staticmethod
+    def _remove(entries:list, entry:tuple):
+        """Remove an entry from sorted entries, if it's there"""
+
+        i = bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+
+    async def upcoming(
+        self,
+        guild:discord.Guild,
+        after:date,
+        limit:int,
+        offset:int=0
+    ) -> list[tuple[int, date]]:
+        """Get the next birthdays of a guild's members
+
+        Args:
+            guild (discord.Guild): The guild.
+            after (date): Only birthdays after this date.
+            limit (int): The most birthdays to get.
+            offset (int, optional): Birthdays to skip.
+
+        Returns:
+            list[tuple[int, date]]: The user ids and the dates of
+                their next birthdays, soonest first.
+        """
+
+        entries = await self.build(guild)
+        total = len(entries)
+
+        # Birthdays wrap around to next year, so start at the first
+        # one after the date and go round the list.
+        # The 29th of February was already celebrated on the 28th.
+        key = (after.month, after.day + 1)
+        if key == (2, 29) and not isleap(after.year):
+            key = (3, 1)
+
+        start = bisect_left(entries, key)
+        return [
+            (user_id, next_birthday(month, day, after))
+            for month, day, user_id in (
+                entries[(start + i) % total]
+                for i in range(offset, min(offset + limit, total))
+            )
+        ]
+
+    async def page(
+        self,
+        guild:discord.Guild,
+        offset:int=0,
+        limit:int=BIRTHDAYS_PER_PAGE
+    ) -> list[tuple[int, int, int]]:
+        """Get a slice of the entries of a guild
+
+        Args:
+            guild (discord.Guild): The guild.
+            offset (int, optional): The entries to skip.
+            limit (int, optional): The most entries to get.
+
+        Returns:
+            list[tuple[int, int, int]]: The entries.
+        """
+
+        return (await self.build(guild))[offset:offset + limit]
+
+    async def count(self, guild:discord.Guild) -> int:
+        """Get the number of birthdays in a guild
+
+        Args:
+            guild (discord.Guild): The guild.
+
+        Returns:
+            int: The number of birthdays.
+        """
+
+        return len(await self.build(guild))
+
 
 class BirthdayCog(BaseCog, name='Birthdays'):
     """Cog for info commands."""
 
+    intents = discord.Intents(members=True)
+
     def __init__(self, bot):
         super().__init__(bot=bot)
 
-        # Start the task to check for birthdays
-        self.check_birthdays.start() 
+        # Birthdays saved before they were zero padded can't be found
+        # by the daily check, this only changes anything once
+        normalize_birthdays()
+
+        # Sorted birthdays of each guild, for finding the next ones
+        self.index = BirthdayIndex(self.bot.get.members_by_id)
+        self.index.load()
+
+        # The timezone of each guild that has set one
+        self.timezones: dict[int, str] = dict(db.records(TIMEZONES_SQL))
+
+        # Birthdays are checked in the morning of each guild's timezone
+        self.scheduler = DailyScheduler(
+            self.check_birthdays,
+            at=time(hour=BIRTHDAY_CHECK_HOUR),
+            name="birthday-scheduler"
+        )
+        self.scheduler.set_timezones(self._used_timezones())
 
         # Context menu version of see cmd
         see_menu = app_commands.ContextMenu(
@@ -37,42 +491,127 @@ class BirthdayCog(BaseCog, name='Birthdays'):
         )
         self.bot.tree.add_command(see_menu)
 
-    @tasks.loop(time=time(hour=7))
-    async def check_birthdays(self):
-        """Check if it's anyone's birthday, if so send a message.
-        Also, check if anyone's birthday is over and remove the role."""
+    async def cog_load(self):
+        self.scheduler.start()
+        EmbedPageManager.register("birthdays", self.birthday_pages)
 
-        log.debug('Doing daily birthday check')
+    async def cog_unload(self):
+        self.scheduler.stop()
+        EmbedPageManager.unregister("birthdays")
 
-        # Get all of the birthdays including the user id
-        data = db.records("SELECT * FROM user_birthdays")
+    @commands.Cog.listener()
+    async def on_member_join(self, member:discord.Member):
+        """Add the new member's birthday to their guild's index"""
 
-        # If there are no birthdays, we can stop here
-        if not data:
-            log.debug('I don\'t know anyone\'s birthday')
-            return
+        self.index.add_member(member.guild.id, member.id)
+
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload:discord.RawMemberRemoveEvent):
+        """Remove the member's birthday from their guild's index, the
+        member doesn't have to be cached"""
+
+        self.index.remove_member(payload.guild_id, payload.user.id)
 
-        now = datetime.now()
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild:discord.Guild):
+        """Forget the index of a guild the bot has left"""
 
-        # Loop through all users and check to celebrate birthday
-        for user_id, bday_str in data:
+        self.index.forget_guild(guild.id)
 
-            # Convert the string to a datetime object
-            bday = datetime.strptime(bday_str, '%d/%m/%Y')
+    def _used_timezones(self) -> set[str]:
+        """Get the timezones used by at least one guild"""
 
-            # If today is not the user's birthday, skip them
-            if not (bday.month == now.month and bday.day == now.day):
-                await self.wrap_up_birthday(user_id)
+        return set(self.timezones.values()) | {DEFAULT_TIMEZONE}
+
+    def _guilds_in(self, timezone:str) -> list[discord.Guild]:
+        """Get the guilds that use a timezone"""
+
+        return [
+            guild for guild in self.bot.guilds
+            if self.timezones.get(guild.id, DEFAULT_TIMEZONE) == timezone
+        ]
+
+    def _celebrates(self, guild:discord.Guild) -> bool:
+        """Whether a guild has somewhere to celebrate birthdays"""
+
+        return bool(
+            self.bot.purposes.get(guild.id, ChannelPurposes.announcements)
+            or self.bot.purposes.get(guild.id, RolePurposes.birthday)
+        )
+
+    async def check_birthdays(self, timezone:str, today:date):
+        """Check if it's anyone's birthday in the guilds of a timezone,
+        if so send a message. Also, check if anyone's birthday is over
+        and remove the role.
+
+        Args:
+            timezone (str): The timezone name.
+            today (date): The date in that timezone.
+        """
+
+        log.debug('Doing daily birthday check for %s', timezone)
+
+        guilds = [
+            guild for guild in self._guilds_in(timezone)
+            if self._celebrates(guild)
+        ]
+        if not guilds:
+            return
+
+        # Only yesterday's birthdays can still be celebrated
+        yesterday = [
+            user_id for user_id, _
+            in get_birthdays_on(today - timedelta(days=1))
+        ]
+        ages = {
+            user_id: today.year - datetime.strptime(bday_str, DATE_FORMAT).year
+            for user_id, bday_str in get_birthdays_on(today)
+        }
+        if not yesterday and not ages:
+            return
+
+        for guild in guilds:
+
+            # The index knows which guilds they are in, only the members
+            # with a birthday are fetched, rather than chunking
+            user_ids = await self.index.find(guild, {*yesterday, *ages})
+            if not user_ids:
                 continue
 
-            # Calculate the user's age
-            age = now.year - bday.year
+            members = await self.bot.get.members_by_id(guild, user_ids)
+
+            for member in members:
+                if member.id in yesterday:
+                    await self.wrap_up_member(member)
+
+            # It's their birthday, celebrate!
+            for member in members:
+                if member.id in ages:
+                    await self.celebrate_member(member, ages[member.id])
 
-            # It's there birthday, celebrate!
-            await self.celebrate_birthday(user_id, age)
+    async def _get_members(self, user_id:int) -> list[discord.Member]:
+        """Get the user as a member of every guild they share with
+        the bot that celebrates birthdays.
+
+        Args:
+            user_id (int): The user's ID.
+
+        Returns:
+            list[discord.Member]: The members.
+        """
+
+        # Asks discord for the member in each guild that isn't cached
+        members = []
+        for guild in self.bot.guilds:
+            if self._celebrates(guild):
+                members.extend(
+                    await self.bot.get.members_by_id(guild, [user_id])
+                )
+
+        return members
 
     async def celebrate_birthday(self, user_id, age):
-        """Celebrate a user's birthday.
+        """Celebrate a user's birthday in every guild they are in.
 
         Args:
             user_id (int): The user's ID.
@@ -81,72 +620,54 @@ class BirthdayCog(BaseCog, name='Birthdays'):
 
         log.debug('Attempting to celebrate birthday')
 
-        channel_data = db.records(
-            "SELECT * FROM guild_channels WHERE purpose_id = ?",
-            ChannelPurposes.announcements.value
-        )
-        role_data = db.records(
-            "SELECT * FROM guild_roles WHERE purpose_id = ?",
-            RolePurposes.birthday.value
-        )
-        reactions = ('🎂', '🎉')
+        for member in await self._get_members(user_id):
+            await self.celebrate_member(member, age)
 
-        for guild in self.bot.guilds:
-
-            log.debug("Attempting to celebrate birthday in %s", guild.name)
-
-            # get the member for this guild
-            member = await self.bot.get.member(user_id, guild.id)
-            if not member:
-                log.debug("Member not found in guild, skipping")
-                continue
+        log.debug("Finished celebrating birthday")
 
-            log.debug("Found member %s", member.name)
+    async def celebrate_member(self, member:discord.Member, age:int):
+        """Celebrate a member's birthday in their guild.
 
-            # get the channel and send a message
-            channel_id = 0
-            for channel_id, guild_id, channel_purpose in channel_data:
-                if guild_id == guild.id and \
-                    channel_purpose == ChannelPurposes.announcements.value:
-                    break
-            else:
-                log.debug("Channel not found, skipping")
-                continue
+        Args:
+            member (discord.Member): The member.
+            age (int): The member's age.
+        """
 
-            channel = await self.bot.get.channel(channel_id)
-            log.debug("Found channel %s", channel)
-
-            if channel:
-                msg = await channel.send(embed=CelebrateBirthdayEmbed(
-                    member=member,
-                    age=age,
-                    member_count=guild.member_count,
-                    reactions=reactions
-                ))
-                for reaction in reactions:
-                    await msg.add_reaction(reaction)
-                log.debug("Sent message")
-
-            # get the birthday role and remove it from the member
-            role_id = 0
-            for role_id, guild_id, role_purpose in role_data:
-                if guild_id == guild.id and \
-                    role_purpose == RolePurposes.birthday.value:
-                    break
-            else:
-                log.debug("Role not found, skipping")
-                continue
+        guild = member.guild
+        reactions = ('🎂', '🎉')
 
-            role = guild.get_role(role_id)
-            log.debug("Found role %s", role)
+        log.debug("Celebrating birthday of %s in %s", member.name, guild.name)
 
-            await member.add_roles(role)
-            log.debug("Added role")
+        # get the channel and send a message
+        channel = guild.get_channel(
+            self.bot.purposes.first(guild.id, ChannelPurposes.announcements) or 0
+        )
+        log.debug("Found channel %s", channel)
+
+        if channel:
+            msg = await channel.send(embed=CelebrateBirthdayEmbed(
+                member=member,
+                age=age,
+                member_count=guild.member_count,
+                reactions=reactions
+            ))
+            for reaction in reactions:
+                await msg.add_reaction(reaction)
+            log.debug("Sent message")
+
+        # get the birthday role and give it to the member
+        role = guild.get_role(
+            self.bot.purposes.first(guild.id, RolePurposes.birthday) or 0
+        )
+        if not role:
+            log.debug("Role not found, skipping")
+            return
 
-        log.debug("Finished celebrating birthday")
+        self.bot.roles.add(member, role, reason="Birthday")
+        log.debug("Queued role")
 
     async def wrap_up_birthday(self, user_id:int):
-        """Stop celebrating a user birthday
+        """Stop celebrating a user birthday in every guild they are in.
 
         Args:
             user_id (int): The user's ID.
@@ -154,35 +675,35 @@ class BirthdayCog(BaseCog, name='Birthdays'):
 
         log.debug('Attempting to wrap up birthdays')
 
+        for member in await self._get_members(user_id):
+            await self.wrap_up_member(member)
 
-        for guild in self.bot.guilds:
-            log.debug("Attempting to wrap up birthday in %s", guild.name)
+        log.debug("Finished wrapping up birthdays")
 
-            member: discord.Member = await self.bot.get.member(user_id, guild.id)
-            if not member:
-                log.debug("Member not found in guild, skipping")
-                continue
+    async def wrap_up_member(self, member:discord.Member):
+        """Stop celebrating a member's birthday in their guild.
 
-            log.debug("Found member %s", member.name)
+        Args:
+            member (discord.Member): The member.
+        """
 
-            role_id = db.field(
-                "SELECT role_id FROM guild_roles " \
-                "WHERE guild_id = ? AND purpose_id = ?",
-                guild.id, RolePurposes.birthday.value
-            )
-            role = guild.get_role(role_id)
-            if not role:
-                log.debug("Role not found, skipping")
-                continue
+        guild = member.guild
 
-            if role not in member.roles:
-                log.debug("member does not have role, skipping")
-                continue
+        log.debug("Wrapping up birthday of %s in %s", member.name, guild.name)
 
-            await member.remove_roles(role)
-            log.debug("Removed role")
+        role = guild.get_role(
+            self.bot.purposes.first(guild.id, RolePurposes.birthday) or 0
+        )
+        if not role:
+            log.debug("Role not found, skipping")
+            return
 
-        log.debug("Finished wrapping up birthdays")
+        if role not in member.roles:
+            log.debug("member does not have role, skipping")
+            return
+
+        self.bot.roles.remove(member, role, reason="Birthday is over")
+        log.debug("Queued role removal")
 
     # All birthday commands are in this group
     group = app_commands.Group(
@@ -200,35 +721,117 @@ class BirthdayCog(BaseCog, name='Birthdays'):
         )
         await inter.response.send_message(embed=embed, ephemeral=True)
 
+    def _today(self, guild:discord.Guild) -> date:
+        """Get the date in a guild's timezone"""
+
+        timezone = self.timezones.get(guild.id, DEFAULT_TIMEZONE)
+        return datetime.now(ZoneInfo(timezone)).date()
+
+    def _local_datetime(self, guild:discord.Guild, day:date) -> datetime:
+        """Get the start of a day in a guild's timezone"""
+
+        timezone = self.timezones.get(guild.id, DEFAULT_TIMEZONE)
+        return datetime.combine(day, time(), tzinfo=ZoneInfo(timezone))
+
+    async def _defer_for_index(self, inter:Inter, ephemeral:bool=False):
+        """Defer the interaction if the guild's birthday index has to
+        ask discord for its members first"""
+
+        if not self.index.built(inter.guild):
+            await inter.response.defer(ephemeral=ephemeral)
+
+    async def _members(
+        self,
+        guild:discord.Guild,
+        user_ids:list[int]
+    ) -> dict[int, discord.Member]:
+        """Get the members of a guild by their IDs"""
+
+        return {
+            member.id: member for member
+            in await self.bot.get.members_by_id(guild, user_ids)
+        }
+
     @group.command(name='next')
     async def see_next_birthday(self, inter:Inter):
         """See who's birthday is next."""
 
-        # Get all birthdays from the database
-        birthdays = db.records("SELECT * FROM user_birthdays")
+        await self._defer_for_index(inter, ephemeral=True)
+        upcoming = await self.index.upcoming(
+            inter.guild, self._today(inter.guild), limit=1
+        )
+        members = await self._members(
+            inter.guild, [user_id for user_id, _ in upcoming]
+        )
 
         # If there are no birthdays, we can't do anything
-        if not birthdays:
-            await inter.response.send_message(
-                "There are no birthdays in my database.",
+        if not members:
+            await _send(
+                inter,
+                content="I don't know the birthday of anyone in this server.",
                 ephemeral=True
             )
             return  # important! we can't continue with no birthdays
 
-        # Convert the birthdays to datetime objects
-        birthdays = [
-            (member_id, datetime.strptime(bday, DATE_FORMAT))
-            for member_id, bday in birthdays
-        ]
-
-        # Sort the birthdays by the day and month
-        birthdays.sort(key=lambda i:i[1].day and i[1].month)
+        user_id, birthday = upcoming[0]
 
         # Get the embed for displaying the next birthday
-        embed = NextBirthdayEmbed(inter, birthdays)
+        embed = NextBirthdayEmbed(
+            members[user_id],
+            self._local_datetime(inter.guild, birthday)
+        )
 
         # Send the embed to the user, ending the interaction
-        await inter.response.send_message(embed=embed, ephemeral=True)
+        await _send(inter, embed=embed, ephemeral=True)
+
+    @group.command(name='upcoming')
+    @app_commands.describe(page="The page of birthdays to see")
+    async def see_upcoming_birthdays(self, inter:Inter, page:int=1):
+        """See the upcoming birthdays in this server."""
+
+        await self._defer_for_index(inter, ephemeral=True)
+        total = await self.index.count(inter.guild)
+        if not total:
+            await _send(
+                inter,
+                content="I don't know the birthday of anyone in this server.",
+                ephemeral=True
+            )
+            return
+
+        total_pages = -(-total // BIRTHDAYS_PER_PAGE)
+        if not 1 <= page <= total_pages:
+            await _send(
+                inter,
+                content=INVALID_PAGE_NUMBER.format(total_pages),
+                ephemeral=True
+            )
+            return
+
+        upcoming = await self.index.upcoming(
+            inter.guild,
+            self._today(inter.guild),
+            limit=BIRTHDAYS_PER_PAGE,
+            offset=(page - 1) * BIRTHDAYS_PER_PAGE
+        )
+        members = await self._members(
+            inter.guild, [user_id for user_id, _ in upcoming]
+        )
+
+        # Members may have left since the index was read
+        embed = UpcomingBirthdaysEmbed(
+            [
+                (
+                    members[user_id],
+                    self._local_datetime(inter.guild, birthday)
+                )
+                for user_id, birthday in upcoming
+                if user_id in members
+            ],
+            current_page=page,
+            total_pages=total_pages
+        )
+        await _send(inter, embed=embed, ephemeral=True)
 
     @group.command(name='save')
     async def add_birthday(self, inter:Inter):
@@ -253,6 +856,7 @@ class BirthdayCog(BaseCog, name='Birthdays'):
                 "INSERT INTO user_birthdays VALUES (?, ?)",
                 inter.user.id, birthday
             )
+            self._index_birthday(inter.user, birthday, inter.guild)
 
         modal = BirthdayModal(save_func=save_bday)
         await inter.response.send_modal(modal)
@@ -266,6 +870,7 @@ class BirthdayCog(BaseCog, name='Birthdays'):
             "DELETE FROM user_birthdays WHERE user_id = ?",
             inter.user.id
         )
+        self.index.discard(inter.user.id)
 
         log.info('Birthday removed for %s', inter.user.display_name)
 
@@ -275,13 +880,25 @@ class BirthdayCog(BaseCog, name='Birthdays'):
             ephemeral=True
         )
 
+    def _index_birthday(
+        self,
+        user:discord.abc.User,
+        birthday:str,
+        guild:discord.Guild
+    ):
+        """Add a newly saved birthday to the index, the user is in the
+        guild it was saved in"""
+
+        self.index.set(
+            user.id,
+            datetime.strptime(birthday, DATE_FORMAT).date(),
+            {guild.id, *(mutual.id for mutual in user.mutual_guilds)}
+        )
+
     async def get_birthday(self, inter:Inter, member:discord.Member):
 
         # Get the birthday from the database that matches the member id
-        data = db.record(
-            "SELECT birthday FROM user_birthdays WHERE user_id = ?",
-            member.id
-        )
+        data = db.record(BIRTHDAY_SQL, member.id)
 
         # If the user doesn't have a birthday saved
         if not data:
@@ -340,36 +957,83 @@ class BirthdayCog(BaseCog, name='Birthdays'):
                 "INSERT INTO user_birthdays VALUES (?, ?)",
                 member.id, birthday
             )
+            self._index_birthday(member, birthday, inter.guild)
 
         modal = BirthdayModal(save_func=save_bday)
         await inter.response.send_modal(modal)
 
+    async def birthday_page(
+        self,
+        guild:discord.Guild,
+        index:int
+    ) -> BirthdayListEmbed | None:
+        """Render a page of the saved birthdays of a guild's members,
+        only reading that page's birthdays from the database.
+
+        Args:
+            guild (discord.Guild): The guild.
+            index (int): The index of the page.
+
+        Returns:
+            BirthdayListEmbed: The page, None if there is no such page.
+        """
+
+        entries = await self.index.page(guild, index * BIRTHDAYS_PER_PAGE)
+        if not entries:
+            return None
+
+        user_ids = [user_id for _, _, user_id in entries]
+        birthdays = dict(db.records(
+            birthdays_of_sql(len(user_ids)), *user_ids
+        ))
+
+        members = await self._members(guild, user_ids)
+
+        # Members may have left since the index was read
+        return BirthdayListEmbed([
+            (members[user_id], birthdays[user_id])
+            for user_id in user_ids
+            if user_id in birthdays and user_id in members
+        ])
+
+    def birthday_pages(self, inter:Inter, key:str) -> PageProducer | None:
+        """Make the producer of the birthday list pages of a guild
+
+        Args:
+            inter (Inter): The interaction that wants the pages.
+            key (str): The guild's ID.
+
+        Returns:
+            PageProducer: The producer, None if the guild isn't found
+                or isn't the one the pages are turned in.
+        """
+
+        guild = inter.client.get_guild(int(key))
+        if guild is None or guild.id != inter.guild_id:
+            return None
+
+        return partial(self.birthday_page, guild)
+
     @admin_group.command(name='list')
     async def list_birthdays(self, inter:Inter):
         """Returns list of members and their birthdays."""
 
-        # Get all birthdays from the database with the user's id
-        data = db.records("SELECT * FROM user_birthdays")
+        await self._defer_for_index(inter)
 
         # Return if no birthdays are set
-        if not data:
-            inter.response.send_message(
-                'There are no birthdays in the database.',
+        if not await self.index.count(inter.guild):
+            await _send(
+                inter,
+                content='There are no birthdays in the database.',
                 ephemeral=True
             )
             return
 
-        # Get generator of members and their birthdays
-        bday_gen = (
-            f'{inter.guild.get_member(uid).mention}: {bday}'
-            for uid, bday in data
-        )
-
-        # Put the list into a string and send it
-        await inter.response.send_message(
-            '\n'.join(bday_gen),
-            ephemeral=True
+        # Pages are only rendered when they are turned to
+        manager = EmbedPageManager.create(
+            inter, "birthdays", str(inter.guild.id)
         )
+        await manager.send(inter)
 
     @admin_group.command(name='celebrate')
     async def force_celebrate_birthday(
@@ -400,28 +1064,73 @@ class BirthdayCog(BaseCog, name='Birthdays'):
     ):
         """Stop celebrating a birthday."""
 
+        # This can take a while, defer the interaction
+        await inter.response.defer(ephemeral=True)
+
         # Just call the normal wrap up function
         await self.wrap_up_birthday(member.id)
 
         # Respond to the interaction to avoid an error
-        await inter.response.send_message(
-            'Birthday wrapped up!',
-            ephemeral=True
-        )
+        await inter.followup.send('Birthday wrapped up!', ephemeral=True)
 
     @admin_group.command(name='check')
     async def force_check_birthdays(self, inter:Inter):
         """Force check for birthdays, skipping the daily auto check."""
 
-        # Just call the normal check task function
-        await self.check_birthdays()
+        # This can take a while, defer the interaction
+        await inter.response.defer(ephemeral=True)
+
+        # Check the guild's timezone as if it was the morning there
+        timezone = self.timezones.get(inter.guild.id, DEFAULT_TIMEZONE)
+        await self.check_birthdays(
+            timezone,
+            datetime.now(ZoneInfo(timezone)).date()
+        )
 
         # Respond to the interaction to avoid an error
+        await inter.followup.send('Checked birthdays!')
+
+    @admin_group.command(name='timezone')
+    @app_commands.describe(timezone="The timezone, e.g. Europe/London")
+    async def set_timezone(self, inter:Inter, timezone:str):
+        """Set the timezone that birthdays are celebrated in."""
+
+        try:
+            ZoneInfo(timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            await inter.response.send_message(
+                f"I don't know the timezone `{timezone}`, "
+                "please pick one from the list.",
+                ephemeral=True
+            )
+            return
+
+        db.execute(TIMEZONE_SET_SQL, inter.guild.id, timezone)
+        self.timezones[inter.guild.id] = timezone
+        self.scheduler.set_timezones(self._used_timezones())
+
+        next_run = self.scheduler.next_run(timezone)
         await inter.response.send_message(
-            'Checked birthdays!',
+            f"Birthdays will be celebrated in `{timezone}`, "
+            f"the next check is <t:{int(next_run.timestamp())}:R>.",
             ephemeral=True
         )
 
+    @set_timezone.autocomplete("timezone")
+    async def set_timezone_autocomplete(
+        self,
+        inter:Inter,
+        current:str
+    ) -> list[app_commands.Choice[str]]:
+        """Autocomplete for the timezone names"""
+
+        current = current.lower().replace(" ", "_")
+        return [
+            app_commands.Choice(name=timezone, value=timezone)
+            for timezone in _all_timezones()
+            if current in timezone.lower()
+        ][:25]
+
 async def setup(bot):
     """Extension setup function"""
 
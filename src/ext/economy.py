@@ -15,35 +15,51 @@ from . import BaseCog
 
 log = logging.getLogger(__name__)
 
+# Queries of the balances, also timed by src/bench/queries.py
+BALANCE_ENSURE_SQL = (
+    "INSERT INTO balances (member_id, guild_id) "
+    "SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM balances "
+    "WHERE member_id = ? AND guild_id = ?)"
+)
+BALANCE_EXISTS_SQL = (
+    "SELECT EXISTS(SELECT 1 FROM balances "
+    "WHERE member_id = ? AND guild_id = ?)"
+)
+BALANCE_SQL = (
+    "SELECT balance FROM balances "
+    "WHERE member_id = ? AND guild_id = ?"
+)
+BALANCE_ACTIVE_SQL = (
+    "UPDATE balances SET active = ? "
+    "WHERE member_id = ? AND guild_id = ?"
+)
+BALANCE_ADD_SQL = (
+    "UPDATE balances SET balance = balance + ? "
+    "WHERE member_id = ? AND guild_id = ?"
+)
+
 
 class EconomyCog(BaseCog, name="Guild Economy"):
     """Economy cog for the bot."""
 
-    @Cog.listener()
-    async def on_ready(self):
-        """When the cog is ready"""
+    intents = discord.Intents(members=True, guild_messages=True)
 
-        log.info("Verifying economy tables...")
+    @staticmethod
+    def ensure_balance(member_id:int, guild_id:int):
+        """Create a member's balance if they don't have one yet.
 
-        data = db.records(
-            "SELECT member_id, guild_id FROM balances",
-        )
+        Members get a balance when they join, the ones that were
+        already in the guild get it the first time they're seen, so
+        guilds don't have to be chunked to give everyone a balance.
 
-        # Ensure all members have a balance
-        for guild in self.bot.guilds:
-            for member in guild.members:
-                if (member.id, guild.id) in data or member.bot:
-                    continue
-
-                log.debug(
-                    "Creating balance for %s in %s",
-                    member, guild
-                )
-                db.execute(
-                    "INSERT INTO balances "
-                    "(member_id, guild_id) VALUES (?, ?)",
-                    member.id, guild.id,
-                )
+        Args:
+            member_id (int): The member's ID.
+            guild_id (int): The guild's ID.
+        """
+
+        db.execute(
+            BALANCE_ENSURE_SQL, member_id, guild_id, member_id, guild_id
+        )
 
     @Cog.listener()
     async def on_member_join(self, member:discord.Member):
@@ -57,18 +73,10 @@ class EconomyCog(BaseCog, name="Guild Economy"):
             member, member.guild
         )
 
-        exists = db.field(
-            "SELECT EXISTS(SELECT 1 FROM balances "
-            "WHERE member_id = ? AND guild_id = ?)",
-            member.id, member.guild.id,
-        )
+        exists = db.field(BALANCE_EXISTS_SQL, member.id, member.guild.id)
 
         if exists:
-            db.execute(
-                "UPDATE balances SET active = 1 "
-                "WHERE member_id = ? AND guild_id = ?",
-                member.id, member.guild.id,
-            )
+            db.execute(BALANCE_ACTIVE_SQL, 1, member.id, member.guild.id)
             return
 
         db.execute(
@@ -78,22 +86,18 @@ class EconomyCog(BaseCog, name="Guild Economy"):
         )
 
     @Cog.listener()
-    async def on_member_remove(self, member:discord.Member):
-        """When a member leaves a guild"""
+    async def on_raw_member_remove(self, payload:discord.RawMemberRemoveEvent):
+        """When a member leaves a guild, cached or not"""
 
-        if member.bot:
+        if payload.user.bot:
             return
 
         log.debug(
             "Deactivating balance for %s in %s",
-            member, member.guild
+            payload.user, payload.guild_id
         )
 
-        db.execute(
-            "UPDATE balances SET active = 0 "
-            "WHERE member_id = ? AND guild_id = ?",
-            member.id, member.guild.id,
-        )
+        db.execute(BALANCE_ACTIVE_SQL, 0, payload.user.id, payload.guild_id)
 
     @Cog.listener()
     async def on_message(self, message:discord.Message):
@@ -104,11 +108,8 @@ class EconomyCog(BaseCog, name="Guild Economy"):
 
         log.debug("Adding 1 to %s's balance", message.author)
 
-        db.execute(
-            "UPDATE balances SET balance = balance + 1 "
-            "WHERE member_id = ? AND guild_id = ?",
-            message.author.id, message.guild.id,
-        )
+        self.ensure_balance(message.author.id, message.guild.id)
+        db.execute(BALANCE_ADD_SQL, 1, message.author.id, message.guild.id)
 
     group = app_commands.Group(
         name="money",
@@ -120,11 +121,8 @@ class EconomyCog(BaseCog, name="Guild Economy"):
     async def balance_cmd(self, inter:Inter):
         """Get your current balance"""
 
-        balance = db.field(
-            "SELECT balance FROM balances "
-            "WHERE member_id = ? AND guild_id = ?",
-            inter.user.id, inter.guild.id
-        )
+        self.ensure_balance(inter.user.id, inter.guild.id)
+        balance = db.field(BALANCE_SQL, inter.user.id, inter.guild.id)
 
         await inter.response.send_message(
             f"Your current balance is £{balance}",
@@ -167,11 +165,9 @@ class EconomyCog(BaseCog, name="Guild Economy"):
             return
 
         # Retrieve the current balance of the user
-        balance = db.field(
-            "SELECT balance FROM balances "
-            "WHERE member_id = ? AND guild_id = ?",
-            inter.user.id, inter.guild.id
-        )
+        self.ensure_balance(inter.user.id, inter.guild.id)
+        self.ensure_balance(member.id, inter.guild.id)
+        balance = db.field(BALANCE_SQL, inter.user.id, inter.guild.id)
 
         # Check if the user has enough money
         if amount > balance:
@@ -184,18 +180,10 @@ class EconomyCog(BaseCog, name="Guild Economy"):
         log.debug("%s is giving %s £%s", inter.user, member, amount)
 
         # Update the balance for the user
-        db.execute(
-            "UPDATE balances SET balance = balance - ? "
-            "WHERE member_id = ? AND guild_id = ?",
-            amount, inter.user.id, inter.guild.id
-        )
+        db.execute(BALANCE_ADD_SQL, -amount, inter.user.id, inter.guild.id)
 
         # Update the balance for the target user
-        db.execute(
-            "UPDATE balances SET balance = balance + ? "
-            "WHERE member_id = ? AND guild_id = ?",
-            amount, member.id, inter.guild.id
-        )
+        db.execute(BALANCE_ADD_SQL, amount, member.id, inter.guild.id)
 
         await inter.response.send_message(
             f"You gave £{amount} to {member.mention}",
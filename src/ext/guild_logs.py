@@ -2,9 +2,9 @@
 
 import logging
 
-from discord.ext import commands, tasks
+import discord
+from discord.ext import commands
 
-from db import db
 from db.enums import ChannelPurposes
 from ui import (
     LogEditedMessage,
@@ -21,34 +21,30 @@ log = logging.getLogger(__name__)
 class GuildLogs(BaseCog, name="Guild Logs"):
     """Cog for the guild logs"""
 
-    def __init__(self, bot):
-        super().__init__(bot)
-        self.guild_log_channels = {}
+    intents = discord.Intents(
+        members=True,
+        guild_messages=True,
+        message_content=True,
+        webhooks=True
+    )
 
-    @commands.Cog.listener()
-    async def on_ready(self):
-        """When the cog is ready, start the update task"""
-
-        self.update_guild_log_channels.start()
+    def _log_channel(self, guild:discord.Guild) -> discord.TextChannel | None:
+        """Get the log channel of a guild, None if it doesn't have one"""
 
-    @tasks.loop(minutes=5)
-    async def update_guild_log_channels(self):
-        """loads the guild log channels"""
+        channel_id = self.bot.purposes.first(guild.id, ChannelPurposes.guildlogs)
+        return guild.get_channel(channel_id) if channel_id else None
 
-        log.debug("updating guild log channels")
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        """Forget the webhook of a deleted log channel"""
 
-        guild_log_channels = db.records(
-            "SELECT guild_id, object_id FROM purposed_objects "
-            "WHERE purpose_id = ?",
-            ChannelPurposes.guildlogs.value
-        )
+        self.bot.outbox.forget_channel(channel.id)
 
-        self.guild_log_channels = {
-            guild_id: object_id
-            for guild_id, object_id in guild_log_channels
-        }
+    @commands.Cog.listener()
+    async def on_webhooks_update(self, channel):
+        """Forget the webhook of a log channel, it may have been deleted"""
 
-        log.debug("finished updating guild log channels")
+        self.bot.outbox.forget_channel(channel.id)
 
     @commands.Cog.listener()
     async def on_member_join(self, member):
@@ -56,29 +52,19 @@ class GuildLogs(BaseCog, name="Guild Logs"):
 
         log.debug("member joined event")
 
-        if member.guild.id not in self.guild_log_channels:
-            return
-
-        log_channel = member.guild.get_channel(
-            self.guild_log_channels[member.guild.id]
-        )
-
-        await log_channel.send(embed=LogNewMember(member))
+        if log_channel := self._log_channel(member.guild):
+            self.bot.outbox.put(log_channel, LogNewMember(member))
 
     @commands.Cog.listener()
-    async def on_member_remove(self, member):
-        """When a member leaves the guild, sends a message to the guild log channel"""
+    async def on_raw_member_remove(self, payload:discord.RawMemberRemoveEvent):
+        """When a member leaves the guild, sends a message to the guild
+        log channel. Raw so that members that aren't cached are logged"""
 
         log.debug("member remove event")
 
-        if member.guild.id not in self.guild_log_channels:
-            return
-
-        log_channel = member.guild.get_channel(
-            self.guild_log_channels[member.guild.id]
-        )
-
-        await log_channel.send(embed=LogMemberLeave(member))
+        guild = self.bot.get_guild(payload.guild_id)
+        if guild and (log_channel := self._log_channel(guild)):
+            self.bot.outbox.put(log_channel, LogMemberLeave(payload.user))
 
     # @commands.Cog.listener()
     # async def on_message(self, message):
@@ -86,59 +72,110 @@ class GuildLogs(BaseCog, name="Guild Logs"):
 
     #     log.debug("message sent")
 
-    #     if (
-    #         message.guild.id not in self.guild_log_channels
-    #         or message.author.bot
-    #     ):
+    #     if message.author.bot:
     #         return
 
-    #     log_channel = message.guild.get_channel(
-    #         self.guild_log_channels[message.guild.id]
-    #     )
+    #     log_channel = self._log_channel(message.guild)
+    #     if not log_channel:
+    #         return
 
     #     await log_channel.send(embed=LogNewMessage(message))
 
+    @commands.Cog.listener("on_message")
+    async def cache_message(self, message:discord.Message):
+        """Remember the content of messages in guilds with a log channel,
+        discord doesn't send it when they are edited or deleted"""
+
+        if (
+            message.guild is None or message.author.bot
+            or not self.bot.purposes.first(
+                message.guild.id, ChannelPurposes.guildlogs
+            )
+        ):
+            return
+
+        self.bot.messages.add(message)
+
     @commands.Cog.listener()
-    async def on_message_delete(self, message):
+    async def on_raw_message_delete(self, payload:discord.RawMessageDeleteEvent):
         """When a message is deleted, sends a message to the guild log channel"""
 
         log.debug("message deleted")
 
-        if (
-            message.guild.id not in self.guild_log_channels
-            or message.author.bot
-        ):
+        if payload.guild_id is None:
             return
 
-        log_channel = message.guild.get_channel(
-            self.guild_log_channels[message.guild.id]
-        )
+        message = self.bot.messages.pop(payload.guild_id, payload.message_id)
+        guild = self.bot.get_guild(payload.guild_id)
+        if not message or not guild:
+            return
 
-        await log_channel.send(embed=LogDeletedMessage(message))
+        channel = guild.get_channel_or_thread(payload.channel_id)
+        log_channel = self._log_channel(guild)
+        if channel and log_channel:
+            self.bot.outbox.put(log_channel, LogDeletedMessage(
+                message.author, channel, message.content
+            ))
 
     @commands.Cog.listener()
-    async def on_message_edit(self, before, after):
+    async def on_raw_bulk_message_delete(
+        self,
+        payload:discord.RawBulkMessageDeleteEvent
+    ):
+        """Forget messages that were purged, they aren't logged"""
+
+        if payload.guild_id is None:
+            return
+
+        for message_id in payload.message_ids:
+            self.bot.messages.pop(payload.guild_id, message_id)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload:discord.RawMessageUpdateEvent):
         """When a message is edited, sends a message to the guild log channel"""
 
         log.debug("message edited")
 
-        # We ignore messages with this content because if falsely triggers this method
-        bad_content = [
-            'https://tenor.com/view/',
-            'https://discordapp.com/emojis/'
-        ]
+        # Embeds being added to a message also trigger this, without
+        # any content, so only changed content is logged
+        content = payload.data.get("content")
+        if payload.guild_id is None or content is None:
+            return
+
+        message = self.bot.messages.get(payload.guild_id, payload.message_id)
+        guild = self.bot.get_guild(payload.guild_id)
+        if not message or not guild or message.content == content:
+            return
+
+        before = message.content
+        self.bot.messages.update(message, content)
+
+        channel = guild.get_channel_or_thread(payload.channel_id)
+        log_channel = self._log_channel(guild)
+        if channel and log_channel:
+            self.bot.outbox.put(log_channel, LogEditedMessage(
+                message.author,
+                channel,
+                before,
+                content,
+                channel.get_partial_message(message.id).jump_url
+            ))
+
+    @commands.Cog.listener()
+    async def on_purpose_remove(self, guild_id:int, purpose_id:int, _):
+        """Forget the messages of a guild that stopped logging"""
 
         if (
-            before.guild.id not in self.guild_log_channels or before.author.bot
-            or any(content in before.content for content in bad_content)
+            purpose_id == ChannelPurposes.guildlogs.value
+            and not self.bot.purposes.first(guild_id, ChannelPurposes.guildlogs)
         ):
-            return
+            self.bot.messages.forget_guild(guild_id)
 
-        log_channel = before.guild.get_channel(
-            self.guild_log_channels[before.guild.id]
-        )
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild:discord.Guild):
+        """Forget the messages of a guild the bot has left"""
 
-        await log_channel.send(embed=LogEditedMessage(before, after))
+        self.bot.messages.forget_guild(guild.id)
 
 async def setup(bot):
     """Setup function for the guild logs cog"""
@@ -1,11 +1,18 @@
 """Cog for info commands."""
 
+import io
 import time
+import asyncio
 import logging
 import platform
 import discord
 from discord import app_commands, Interaction as Inter
+from tabulate import tabulate
 
+from bot._stats import format_ms
+from bot._profiler import sample_profile, cprofile_profile, tracemalloc_diff
+from utils import is_bot_owner
+from constants import PROFILE_MAX_SECONDS
 from . import BaseCog
 
 
@@ -15,6 +22,12 @@ log = logging.getLogger(__name__)
 class HostCog(BaseCog, name='Host Interactions'):
     """Cog for info commands."""
 
+    def __init__(self, bot):
+        super().__init__(bot)
+
+        # Only one profiler can run at a time
+        self._profiler_lock = asyncio.Lock()
+
     @app_commands.command(name="echo")
     async def echo_cmd(self, inter:Inter, *, message:str):
         """Echo a message back to the chat"""
@@ -48,6 +61,53 @@ class HostCog(BaseCog, name='Host Interactions'):
             },
             'Network': {
                 'Latency': f'{round(self.bot.latency*1000, 2)}ms',
+            },
+            'Shards': {
+                f'Shard {shard_id}':
+                    f'{round(latency*1000, 2)}ms, '
+                    f'{len(self.bot.shard_guilds(shard_id))} guilds'
+                for shard_id, latency in self.bot.latencies
+            },
+            'Gateway': {
+                'Intents': ', '.join(
+                    name for name, value in self.bot.intents if value
+                ),
+                'Members Cached': '{} of {}'.format(
+                    sum(len(guild.members) for guild in self.bot.guilds),
+                    sum(guild.member_count or 0 for guild in self.bot.guilds)
+                ),
+                'Guilds Chunked': '{} of {}'.format(
+                    sum(guild.chunked for guild in self.bot.guilds),
+                    len(self.bot.guilds)
+                ),
+            },
+            'Event Loop': {
+                'Lag': f'{round(self.bot.loop_monitor.last_lag*1000, 2)}ms',
+                'Max Lag': f'{round(self.bot.loop_monitor.max_lag*1000, 2)}ms',
+            },
+            'Role Queue': {
+                'Depth': self.bot.roles.depth,
+                'Edits': self.bot.roles.edits,
+                'Merged': self.bot.roles.merged,
+                'Failed': self.bot.roles.failed,
+                'Latency p50': format_ms(self.bot.roles.latency.percentile(50)),
+                'Latency p99': format_ms(self.bot.roles.latency.percentile(99)),
+            },
+            'Log Outbox': {
+                'Depth': self.bot.outbox.depth,
+                'Messages': self.bot.outbox.messages,
+                'Embeds': self.bot.outbox.sent,
+                'Dropped': self.bot.outbox.dropped,
+                'Failed': self.bot.outbox.failed,
+                'Latency p50': format_ms(self.bot.outbox.latency.percentile(50)),
+                'Latency p99': format_ms(self.bot.outbox.latency.percentile(99)),
+            },
+            'Message Cache': {
+                'Messages': len(self.bot.messages),
+                'Guilds': self.bot.messages.guilds,
+                'Memory': f'{self.bot.messages.bytes / 1024 / 1024:.2f} MB',
+                'Hits': self.bot.messages.hits,
+                'Misses': self.bot.messages.misses,
             }
         }
 
@@ -65,6 +125,11 @@ class HostCog(BaseCog, name='Host Interactions'):
         # Get the info/data
         data = self._get_data()      
 
+        # Asking the other clusters can take longer than discord waits
+        if self.bot.cluster:
+            await inter.response.defer()
+            data['Cluster'] = await self._cluster_data()
+
         # Embed description
         desc = ''
 
@@ -85,7 +150,250 @@ class HostCog(BaseCog, name='Host Interactions'):
             text=f'Requested by {inter.user.name}',
             icon_url=inter.user.display_avatar.url
         )
-        await inter.response.send_message(embed=embed)
+
+        if inter.response.is_done():
+            await inter.followup.send(embed=embed)
+        else:
+            await inter.response.send_message(embed=embed)
+
+    async def _cluster_data(self) -> dict:
+        """The totals of every cluster, asked for through the supervisor"""
+
+        cluster = self.bot.cluster
+        stats = await cluster.query('stats')
+        stats[cluster.cluster_id] = await cluster.handlers['stats']()
+
+        return {
+            'Cluster': f'{cluster.cluster_id} ({cluster.info.clusters} total)',
+            'Responding': f'{len(stats)} of {cluster.info.clusters}',
+            'Total Guilds': sum(
+                stat.get('guilds', 0) for stat in stats.values()
+            ),
+            'Total Members': sum(
+                stat.get('members', 0) for stat in stats.values()
+            ),
+        }
+
+    def _latency_table(self, cog:str=None) -> str:
+        """Table of latency percentiles for every measured command"""
+
+        if cog:
+            metrics = self.bot.get_cog(cog).command_metrics()
+        else:
+            metrics = self.bot.tree.metrics
+
+        # Most used commands first, discord limits the message length
+        ordered = sorted(
+            metrics.items(),
+            key=lambda item: item[1].total.count,
+            reverse=True
+        )[:15]
+
+        return tabulate(
+            [
+                (
+                    name,
+                    metric.total.count,
+                    format_ms(metric.defer.percentile(50)),
+                    format_ms(metric.content.percentile(50)),
+                    format_ms(metric.total.percentile(50)),
+                    format_ms(metric.total.percentile(90)),
+                    format_ms(metric.total.percentile(99)),
+                )
+                for name, metric in ordered
+            ],
+            headers=(
+                "Command", "Calls", "Defer", "Content", "p50", "p90", "p99"
+            )
+        )
+
+    def _latency_histogram(self, command:str) -> str:
+        """Percentiles and a histogram for a single command"""
+
+        metric = self.bot.tree.metrics[command]
+
+        percentiles = tabulate(
+            [
+                (
+                    name,
+                    stats.count,
+                    format_ms(stats.percentile(50)),
+                    format_ms(stats.percentile(90)),
+                    format_ms(stats.percentile(99)),
+                )
+                for name, stats in (
+                    ("Defer", metric.defer),
+                    ("First Response", metric.response),
+                    ("First Content", metric.content),
+                    ("Total", metric.total)
+                )
+            ],
+            headers=("Metric", "Count", "p50", "p90", "p99")
+        )
+
+        # Scale the bars to the biggest bucket
+        histogram = metric.total.histogram()
+        biggest = max(count for _, count in histogram) or 1
+        bars = "\n".join(
+            f"{label:>10} | {'#' * round(count / biggest * 20):<20} {count}"
+            for label, count in histogram
+        )
+
+        return f"{percentiles}\n\nTotal handler time\n{bars}"
+
+    @group.command(name='latency')
+    @app_commands.check(is_bot_owner)
+    async def command_latency(
+        self,
+        inter:Inter,
+        command:str=None,
+        cog:str=None
+    ):
+        """See how long commands are taking to respond.
+
+        Args:
+            command (str, optional): Show the histogram for this command.
+            cog (str, optional): Only show commands from this cog.
+        """
+
+        if command and command not in self.bot.tree.metrics:
+            await inter.response.send_message(
+                f"I haven't measured `{command}` yet",
+                ephemeral=True
+            )
+            return
+
+        if cog and not isinstance(self.bot.get_cog(cog), BaseCog):
+            await inter.response.send_message(
+                f"I couldn't find the cog `{cog}`",
+                ephemeral=True
+            )
+            return
+
+        if command:
+            output = self._latency_histogram(command)
+        else:
+            output = self._latency_table(cog)
+
+        await inter.response.send_message(
+            f"```{output}```",
+            ephemeral=True
+        )
+
+    @command_latency.autocomplete('command')
+    async def command_latency_autocomplete(self, inter:Inter, current:str):
+        """Autocomplete the measured commands"""
+
+        return [
+            app_commands.Choice(name=name, value=name)
+            for name in self.bot.tree.metrics
+            if current.lower() in name.lower()
+        ][:25]
+
+    @command_latency.autocomplete('cog')
+    async def cog_latency_autocomplete(self, inter:Inter, current:str):
+        """Autocomplete the loaded cogs"""
+
+        return [
+            app_commands.Choice(name=name, value=name)
+            for name, cog in self.bot.cogs.items()
+            if isinstance(cog, BaseCog) and current.lower() in name.lower()
+        ][:25]
+
+    async def _run_profiler(
+        self,
+        inter:Inter,
+        description:str,
+        filename:str,
+        profile_coro
+    ):
+        """Run a profiler and respond with the results as a file
+
+        Args:
+            inter (Inter): The interaction to respond to.
+            description (str): What is being profiled.
+            filename (str): The filename for the results.
+            profile_coro (Coroutine): Runs the profiler, returns the results.
+        """
+
+        if self._profiler_lock.locked():
+            await inter.response.send_message(
+                "A profiler is already running, try again when it's done",
+                ephemeral=True
+            )
+            profile_coro.close()
+            return
+
+        log.info("%s started %s", inter.user, description)
+        await inter.response.defer(ephemeral=True, thinking=True)
+
+        async with self._profiler_lock:
+            result = await profile_coro
+
+        file = discord.File(
+            io.BytesIO(result.encode("utf-8")),
+            filename=filename
+        )
+        await inter.followup.send(
+            f"Here are the results of {description}",
+            file=file,
+            ephemeral=True
+        )
+
+    @group.command(name='profile')
+    @app_commands.check(is_bot_owner)
+    @app_commands.choices(mode=[
+        app_commands.Choice(name="Sampling (collapsed stacks)", value="sample"),
+        app_commands.Choice(name="cProfile (cumulative stats)", value="cprofile")
+    ])
+    async def profile_cmd(
+        self,
+        inter:Inter,
+        mode:app_commands.Choice[str],
+        seconds:app_commands.Range[int, 1, PROFILE_MAX_SECONDS]=30
+    ):
+        """Profile the bot for a number of seconds.
+
+        Args:
+            mode (str): The type of profiler to run.
+            seconds (int, optional): How long to profile for.
+        """
+
+        if mode.value == "sample":
+            coro = sample_profile(seconds)
+            filename = "profile.collapsed.txt"
+        else:
+            coro = cprofile_profile(seconds)
+            filename = "profile.cprofile.txt"
+
+        await self._run_profiler(
+            inter,
+            f"a {seconds} second {mode.name} profile",
+            filename,
+            coro
+        )
+
+    @group.command(name='memory')
+    @app_commands.check(is_bot_owner)
+    async def memory_cmd(
+        self,
+        inter:Inter,
+        seconds:app_commands.Range[int, 1, PROFILE_MAX_SECONDS]=30,
+        top:app_commands.Range[int, 1, 100]=25
+    ):
+        """Compare memory allocations over a number of seconds.
+
+        Args:
+            seconds (int, optional): Time between the memory snapshots.
+            top (int, optional): Number of allocation sites to list.
+        """
+
+        await self._run_profiler(
+            inter,
+            f"a {seconds} second memory allocation diff",
+            "tracemalloc.txt",
+            tracemalloc_diff(seconds, top)
+        )
 
 
 async def setup(bot):
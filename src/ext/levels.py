@@ -2,7 +2,6 @@
 
 import logging
 from datetime import datetime, timedelta
-from time import perf_counter
 
 import discord
 from discord import app_commands
@@ -14,6 +13,7 @@ from db.enums import SettingsOptions
 from ui import LevelCard, ScoreBoard, LevelObjectEmbed
 from utils import is_bot_owner
 from exceptions import EmptyQueryResult
+from constants import SHOW_MEMBER_STATUS
 from . import BaseCog
 
 
@@ -23,6 +23,12 @@ log = logging.getLogger(__name__)
 class LevelCog(BaseCog, name='Level Progression'):
     """Level progression cog"""
 
+    intents = discord.Intents(
+        members=True,
+        guild_messages=True,
+        presences=SHOW_MEMBER_STATUS
+    )
+
     def __init__(self, bot):
         super().__init__(bot=bot)
 
@@ -33,27 +39,24 @@ class LevelCog(BaseCog, name='Level Progression'):
         )
         self.bot.tree.add_command(rank_menu)
 
-    @commands.Cog.listener()
-    async def on_ready(self):
-        """Event to validate the database when cog is ready"""
-
-        await self.bot.wait_until_ready()
-        await self.validate_members()
-
     @commands.Cog.listener(name="on_member_join")
     async def register_new_member(self, member:discord.Member):
         """Event to add new members to the rank database"""
 
         self.register_member(member)
 
-    @commands.Cog.listener(name="on_member_remove")
-    async def remove_member(self, member:discord.Member):
-        """Event to remove members from the rank database"""
+    @commands.Cog.listener(name="on_raw_member_remove")
+    async def remove_member(self, payload:discord.RawMemberRemoveEvent):
+        """Event to remove members from the rank database, members
+        that aren't cached leave too"""
 
-        log.debug("Removing member %s", member)
-        MemberLevelModel.from_database(
-            member.id, member.guild.id
-        ).delete()
+        log.debug("Removing member %s", payload.user)
+        try:
+            MemberLevelModel.from_database(
+                payload.user.id, payload.guild_id
+            ).delete()
+        except EmptyQueryResult:
+            log.debug("Member was never registered, skipping")
 
     def gain_exp(self, member:discord.Member, amount:int) -> None | tuple:
         """Gives the given member the given amount of exp
@@ -76,9 +79,15 @@ class LevelCog(BaseCog, name='Level Progression'):
             log.debug("Member is a bot, cannot add xp")
             return
 
-        lvl_obj = MemberLevelModel.from_database(
-            member.id, member.guild.id
-        )
+        # Members that were in the guild before the bot are registered
+        # the first time they gain xp, rather than by chunking the guild
+        try:
+            lvl_obj = MemberLevelModel.from_database(
+                member.id, member.guild.id
+            )
+        except EmptyQueryResult:
+            self.register_member(member)
+            lvl_obj = MemberLevelModel(member.id, member.guild.id, 1)
 
         # Update the xp and check for a level up
         level_before = lvl_obj.level
@@ -100,7 +109,9 @@ class LevelCog(BaseCog, name='Level Progression'):
             return
 
         log.debug("Message event triggered by %s", message.author)
-        member = await self.bot.get.member(message.author.id, message.guild.id)
+
+        # Guild messages come with the member, which may not be cached
+        member = message.author
         levels = self.gain_exp(member, 35)
 
         if not levels:
@@ -163,7 +174,7 @@ class LevelCog(BaseCog, name='Level Progression'):
 
         i = 0
         for guild in guilds:
-            for i, member in enumerate(guild.members):
+            for i, member in enumerate(await self.bot.get.members(guild)):
                 self.register_member(member)
 
             log.debug("Validated %s members for %s", i, guild.name)
@@ -293,8 +304,6 @@ class LevelCog(BaseCog, name='Level Progression'):
     ) -> None:
         """Responds to the given interaction with the levelboard"""
 
-        start = perf_counter()
-
         # The interaction member does not have a status
         # which is needed for the level card, so we need
         # to get the member from the guild again.
@@ -339,6 +348,9 @@ class LevelCog(BaseCog, name='Level Progression'):
                 ephemeral=ephemeral
             )
 
+        if SHOW_MEMBER_STATUS:
+            member = await self._with_status(member)
+
         # Create the level card
         levelcard = LevelCard(member, level_object)
         await levelcard.draw()
@@ -349,8 +361,28 @@ class LevelCog(BaseCog, name='Level Progression'):
             ephemeral=ephemeral
         )
 
-        end = perf_counter()
-        log.debug("Levelboard sent in %s seconds", end-start)
+    @staticmethod
+    async def _with_status(member:discord.Member) -> discord.Member:
+        """Get a member with their status for their levelcard
+
+        Guilds aren't chunked, so members that aren't cached have no
+        presence, and it's asked for. They are cached afterwards, so
+        their presence updates keep it current.
+
+        Args:
+            member (discord.Member): The member.
+
+        Returns:
+            discord.Member: The member with their status.
+        """
+
+        if cached := member.guild.get_member(member.id):
+            return cached
+
+        members = await member.guild.query_members(
+            user_ids=[member.id], presences=True
+        )
+        return members[0] if members else member
 
     @app_commands.command(name='rank')
     async def get_levelcard_cmd(
@@ -390,9 +422,11 @@ class LevelCog(BaseCog, name='Level Progression'):
     async def force_validate_members(self, inter:Inter):
         """Force validate all members in the guild"""
 
-        await self.validate_members()
+        # Chunking the guild can take longer than discord waits
+        await inter.response.defer(ephemeral=True)
+        await self.validate_members(inter.guild)
 
-        await inter.response.send_message(
+        await inter.followup.send(
             "Validation Complete!",
             ephemeral=True
         )
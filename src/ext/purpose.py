@@ -20,6 +20,16 @@ from . import BaseCog
 
 log = logging.getLogger(__name__)
 
+# Queries of the purposed objects, also timed by src/bench/queries.py
+PURPOSE_REMOVE_SQL = (
+    "DELETE FROM purposed_objects WHERE purpose_id = ? AND object_id = ?"
+)
+PURPOSE_GUILD_SQL = (
+    "SELECT purpose_id, object_id FROM purposed_objects "
+    "WHERE guild_id = ?"
+)
+PURPOSE_DESCRIPTIONS_SQL = "SELECT id, description FROM purposes"
+
 _category_purposes_as_choices = [
         app_commands.Choice(name=desc, value=purpose_id)
         for desc, purpose_id in db.records(
@@ -85,27 +95,35 @@ class PurposeCog(BaseCog, name="Purposes"):
             purpose_id, object_id, guild_id
         )
 
-    def _remove_object_purpose(self, purpose_id:int, object_id:int):
+        # Let anything caching purposes know that they have changed
+        self.bot.dispatch("purpose_add", guild_id, purpose_id, object_id)
+
+    def _remove_object_purpose(
+        self,
+        purpose_id:int,
+        object_id:int,
+        guild_id:int
+    ):
         """Remove the purpose of a discord object
         The discord object can be a category, textchannel or role
 
         Args:
             purpose_id (int): The purpose id
             object_id (int): The object id
+            guild_id (int): The guild id for the object
         Raises:
             EmptyQueryResult: There is no object with the given purpose
         """
 
-        cur = db.execute(
-            "DELETE FROM purposed_objects WHERE purpose_id = ? AND object_id = ?",
-            purpose_id, object_id
-        )
+        cur = db.execute(PURPOSE_REMOVE_SQL, purpose_id, object_id)
         if not cur.rowcount:
             raise EmptyQueryResult(
                 "Cannot remove a purposed object that does not exist "
                 "in the database"
             )
 
+        self.bot.dispatch("purpose_remove", guild_id, purpose_id, object_id)
+
     @add_group.command(name="list")
     async def list_purposes_cmd(self, inter:Inter):
         """List all of the purposed objects in the server"""
@@ -113,16 +131,12 @@ class PurposeCog(BaseCog, name="Purposes"):
         log.debug("Listing purposes for guild %s", inter.guild.id)
 
         # Get all puposed objects for this guild
-        objects = db.records(
-            "SELECT purpose_id, object_id FROM purposed_objects "
-            "WHERE guild_id = ?",
-            inter.guild.id
-        )
+        objects = db.records(PURPOSE_GUILD_SQL, inter.guild.id)
 
         # Get the purpose descriptions
         purposes = {
             purpose_id: desc for purpose_id, desc in
-            db.records("SELECT id, description FROM purposes")
+            db.records(PURPOSE_DESCRIPTIONS_SQL)
         }
 
         # Create an output of tuples of (purpose, object name, object type)
@@ -181,7 +195,8 @@ class PurposeCog(BaseCog, name="Purposes"):
 
         self._remove_object_purpose(
             object_id=category.id,
-            purpose_id=purpose.value
+            purpose_id=purpose.value,
+            guild_id=inter.guild.id
         )
 
         await inter.response.send_message(
@@ -224,7 +239,8 @@ class PurposeCog(BaseCog, name="Purposes"):
 
         self._remove_object_purpose(
             object_id=channel.id,
-            purpose_id=purpose.value
+            purpose_id=purpose.value,
+            guild_id=inter.guild.id
         )
 
         await inter.response.send_message(
@@ -269,7 +285,8 @@ class PurposeCog(BaseCog, name="Purposes"):
 
         self._remove_object_purpose(
             object_id=role.id,
-            purpose_id=purpose.value
+            purpose_id=purpose.value,
+            guild_id=inter.guild.id
         )
 
         await inter.response.send_message(
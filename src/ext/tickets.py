@@ -1,6 +1,9 @@
 """Extension for the ticket system"""
 
 import logging
+import asyncio
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import deque
 from datetime import datetime
 
 import discord
@@ -16,42 +19,405 @@ from tabulate import tabulate
 
 from db import db
 from db.enums import CategoryPurposes, RolePurposes
-from ui import TicketModal, ManageTicketEmbed, ManageTicketView
+import transcripts
+from ui import (
+    TicketModal,
+    ManageTicketEmbed,
+    ManageTicketView,
+    TicketTranscriptEmbed,
+    TicketSearchEmbed,
+    EmbedPageManager,
+    PageProducer
+)
 from exceptions import EmptyQueryResult
-from constants import NO_TICKETS_ERR
+from constants import (
+    NO_TICKETS_ERR,
+    TICKET_CLEANUP_CONCURRENCY,
+    TICKET_CLEANUP_PACE,
+    TICKET_CLEANUP_REPORT_INTERVAL,
+    TICKET_SEARCH_PER_PAGE,
+    TICKET_SEARCH_MAX_LENGTH,
+    TICKET_SEARCH_MAX_KEY
+)
 from . import BaseCog
 
 
 log = logging.getLogger(__name__)
 
-def _check_guild_has_tickets(inter:Inter):
-    """Check if the guild has tickets enabled
+# Queries of the tickets, also timed by src/bench/queries.py
+TICKET_SQL = (
+    "SELECT id, member_id, description, active, timestamp "
+    " FROM tickets WHERE id = ? AND guild_id = ?"
+)
+TICKET_STATES_SQL = "SELECT id, active FROM tickets WHERE guild_id = ?"
+TICKET_INSERT_SQL = (
+    "INSERT INTO tickets "
+    "(guild_id, member_id, description, timestamp) "
+    "VALUES (?, ?, ?, ?)"
+)
+TICKET_REOPEN_SQL = "UPDATE tickets SET active = 1 WHERE id = ?"
+TICKET_SEARCH_SQL = (
+    "SELECT t.id, t.member_id, t.active, CASE "
+    "WHEN instr(snippet(tickets_fts, 1, '**', '**', '...', 12), '**') "
+    "THEN snippet(tickets_fts, 1, '**', '**', '...', 12) "
+    "ELSE snippet(tickets_fts, 2, '**', '**', '...', 12) END "
+    "FROM tickets_fts JOIN tickets t ON t.id = tickets_fts.rowid "
+    "WHERE tickets_fts MATCH ? ORDER BY rank LIMIT ? OFFSET ?"
+)
+
+
+def tickets_sql(active:bool=None) -> str:
+    """Get the query that lists a guild's tickets
+
+    Args:
+        active (bool, optional): Only list the active or inactive
+            tickets, None lists every ticket.
 
     Returns:
-        bool: True if the guild has tickets enabled
+        str: The query, it takes the guild's ID.
     """
 
-    data = db.column(
-        "SELECT object_id FROM purposed_objects WHERE purpose_id = ?",
-        CategoryPurposes.tickets.value
+    query = "SELECT id, member_id, active  FROM tickets WHERE guild_id = ?"
+    if active is not None:
+        query += f" AND active = {int(active)}"
+
+    return query
+
+def _match_expression(guild_id:int, query:str) -> str:
+    """Make an FTS5 expression that matches every word of a query in a
+    guild's tickets, the last word also matches as a prefix.
+
+    Args:
+        guild_id (int): The guild's ID.
+        query (str): The search query.
+
+    Returns:
+        str: The expression.
+    """
+
+    # Quote each word so any characters in it are taken literally
+    words = [
+        '"' + word.replace('"', '""') + '"'
+        for word in query.split()
+    ]
+    words[-1] += "*"
+
+    return (
+        f"guild_id:{guild_id} AND "
+        f"{{description transcript}}:({' '.join(words)})"
     )
-    if not data: 
-        raise app_commands.CheckFailure(NO_TICKETS_ERR)
 
-    exists = any(
-        channel for channel in inter.guild.channels
-        if channel.id in data
+def search_tickets(
+    guild_id:int,
+    query:str,
+    limit:int=TICKET_SEARCH_PER_PAGE,
+    offset:int=0
+) -> list[tuple[int, int, int, str]]:
+    """Search a guild's tickets by their descriptions and transcripts
+
+    Args:
+        guild_id (int): The guild's ID.
+        query (str): The search query.
+        limit (int, optional): The most tickets to get.
+        offset (int, optional): The tickets to skip.
+
+    Returns:
+        list[tuple[int, int, int, str]]: The ticket id, member id,
+            active state and a snippet of where it matched, for each
+            ticket, best match first.
+    """
+
+    if not query.split():
+        return []
+
+    return db.records(
+        TICKET_SEARCH_SQL, _match_expression(guild_id, query), limit, offset
     )
 
-    if not exists:
+def _check_guild_has_tickets(inter:Inter):
+    """Check if the guild has tickets enabled
+
+    Returns:
+        bool: True if the guild has tickets enabled
+    """
+
+    cog: TicketsCog = inter.command.binding
+    if not cog.get_category(inter.guild):
         raise app_commands.CheckFailure(NO_TICKETS_ERR)
 
     return True
 
 
+class TicketCleanup:
+    """Deletes stale ticket channels of a guild in the background.
+
+    A few channels are deleted at once, each worker waiting between
+    deletes so that the channel rate limits aren't hit constantly, and
+    backing off when they are. The channels of closed tickets are
+    archived before they're deleted, so that they can be reopened with
+    their history. The interactions following the cleanup have their
+    responses edited with its progress.
+    """
+
+    def __init__(
+        self,
+        guild:discord.Guild,
+        channels:list[discord.abc.GuildChannel],
+        tickets:dict[int, int]=None,
+        concurrency:int=TICKET_CLEANUP_CONCURRENCY,
+        pace:float=TICKET_CLEANUP_PACE
+    ):
+        """Create a new cleanup
+
+        Args:
+            guild (discord.Guild): The guild.
+            channels (list[discord.abc.GuildChannel]): The channels to
+                delete.
+            tickets (dict[int, int], optional): The ticket ID of each
+                channel ID to archive before it's deleted.
+            concurrency (int, optional): Channels deleted at once.
+            pace (float, optional): Seconds each worker waits between
+                deletes.
+        """
+
+        self.guild = guild
+        self.concurrency = concurrency
+        self.pace = pace
+
+        self.total = len(channels)
+        self.deleted = 0
+        self.failed = 0
+        self.archived = 0
+
+        # Popped once archived, so a retried delete isn't archived twice
+        self._tickets = dict(tickets or {})
+        self._pending = deque(channels)
+        self._followers: list[Inter] = []
+        self._task: asyncio.Task = None
+        self._finished = False
+
+    @property
+    def done(self) -> bool:
+        """Whether there is nothing left to delete"""
+
+        return self._finished
+
+    @property
+    def progress(self) -> str:
+        """The progress of the cleanup, formatted for a message"""
+
+        handled = self.deleted + self.failed
+        status = "Finished cleaning" if self.done else "Cleaning"
+        msg = (
+            f"{status} up ticket channels: **{handled}/{self.total}**"
+            f"\nDeleted **{self.deleted}** inactive or ticketless channels"
+        )
+        if self.archived:
+            msg += f"\nArchived the transcripts of **{self.archived}** tickets"
+        if self.failed:
+            msg += f"\nFailed to delete **{self.failed}** channels"
+
+        return msg
+
+    def follow(self, inter:Inter):
+        """Keep the response of an interaction updated with the progress
+
+        Args:
+            inter (Inter): The deferred interaction.
+        """
+
+        self._followers.append(inter)
+
+    def start(self):
+        """Start deleting, or carry on from where it was stopped"""
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(
+                self._run(),
+                name=f"ticket-cleanup-{self.guild.id}"
+            )
+
+    def stop(self):
+        """Stop deleting, the remaining channels are kept for a resume"""
+
+        if self._task:
+            self._task.cancel()
+
+    async def report(self, inter:Inter) -> bool:
+        """Edit an interaction's response with the progress
+
+        Args:
+            inter (Inter): The interaction.
+
+        Returns:
+            bool: False if the response can't be edited anymore.
+        """
+
+        try:
+            await inter.edit_original_response(content=self.progress)
+        except discord.HTTPException as err:
+            # Interaction tokens expire after 15 minutes
+            log.debug("Can't report cleanup progress: %s", err)
+            return False
+
+        return True
+
+    async def _report_all(self):
+        """Report the progress to every follower"""
+
+        results = await asyncio.gather(
+            *(self.report(inter) for inter in self._followers)
+        )
+        self._followers = [
+            inter for inter, ok in zip(self._followers, results) if ok
+        ]
+
+    async def _run(self):
+        """Delete the channels and report the progress"""
+
+        log.info(
+            "Cleaning up %s ticket channels in %s",
+            len(self._pending), self.guild.name
+        )
+
+        workers = [
+            asyncio.create_task(
+                self._work(), name=f"ticket-cleanup-{self.guild.id}-{i}"
+            )
+            for i in range(self.concurrency)
+        ]
+
+        try:
+            running = set(workers)
+            while running:
+                await self._report_all()
+                done, running = await asyncio.wait(
+                    running,
+                    timeout=TICKET_CLEANUP_REPORT_INTERVAL,
+                    return_when=asyncio.FIRST_EXCEPTION
+                )
+
+                # Stop the others rather than let them carry on unseen
+                if any(not task.cancelled() and task.exception()
+                       for task in done):
+                    break
+
+        finally:
+            for task in workers:
+                task.cancel()
+
+            # Let the cancelled workers put their channels back
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        for task in workers:
+            if not task.cancelled() and task.exception():
+                log.error(
+                    "Failed to clean up ticket channels in %s",
+                    self.guild.name, exc_info=task.exception()
+                )
+
+        self._finished = not self._pending
+        await self._report_all()
+        log.info("Finished cleaning up ticket channels in %s", self.guild.name)
+
+    async def _archive(self, channel:discord.abc.GuildChannel):
+        """Archive the channel of a closed ticket, if it has one"""
+
+        ticket_id = self._tickets.get(channel.id)
+        if ticket_id is None:
+            return
+
+        try:
+            await transcripts.archive(ticket_id, channel)
+            self.archived += 1
+        except (discord.HTTPException, OSError) as err:
+            # Same as closing a ticket, the channel is deleted anyway
+            log.error("Failed to archive ticket #%s: %s", ticket_id, err)
+
+        del self._tickets[channel.id]
+
+    async def _work(self):
+        """Archive and delete channels until there are none left"""
+
+        while self._pending:
+            channel = self._pending.popleft()
+
+            try:
+                await self._archive(channel)
+                await channel.delete(reason="Cleaning up ticket channels")
+                self.deleted += 1
+                log.debug("Deleted channel %s", channel.name)
+
+            except asyncio.CancelledError:
+                # Keep it for when the cleanup is resumed
+                self._pending.appendleft(channel)
+                raise
+
+            except discord.NotFound:
+                # Someone else deleted it first
+                self.deleted += 1
+
+            except discord.Forbidden:
+                self.failed += 1
+                log.error(
+                    "I do not have permission to delete channel %s "
+                    "in guild %s",
+                    channel.name, self.guild.id
+                )
+
+            except discord.HTTPException as err:
+                if err.status != 429:
+                    self.failed += 1
+                    log.error(
+                        "Failed to delete channel %s: %s",
+                        channel.name, err
+                    )
+                else:
+                    # Still rate limited after discord.py's retries,
+                    # try again later and slow down
+                    self._pending.append(channel)
+                    await asyncio.sleep(self.pace * 10)
+
+            await asyncio.sleep(self.pace)
+
+
 class TicketsCog(BaseCog, name="Tickets"):
     """Cog for the tickets system"""
 
+    # Transcripts and their search need the content of the messages
+    intents = discord.Intents(message_content=True, guild_messages=True)
+
+    def __init__(self, bot):
+        super().__init__(bot=bot)
+
+        # The last ticket channel cleanup of each guild
+        self.cleanups: dict[int, TicketCleanup] = {}
+
+    async def cog_load(self):
+        EmbedPageManager.register("ticket_search", self.search_pages)
+
+    async def cog_unload(self):
+        EmbedPageManager.unregister("ticket_search")
+        for cleanup in self.cleanups.values():
+            cleanup.stop()
+
+    def get_category(self, guild:discord.Guild) -> CategoryChannel | None:
+        """Get the ticket category of a guild
+
+        Args:
+            guild (discord.Guild): The guild.
+
+        Returns:
+            CategoryChannel: The category, None if there isn't one.
+        """
+
+        category_ids = self.bot.purposes.get(guild.id, CategoryPurposes.tickets)
+        for category_id in category_ids:
+            if category := guild.get_channel(category_id):
+                return category
+
+        return None
+
     @app_commands.command(name="list-tickets")
     @app_commands.check(_check_guild_has_tickets)
     @app_commands.default_permissions(moderate_members=True)
@@ -70,11 +436,7 @@ class TicketsCog(BaseCog, name="Tickets"):
         else:
             not_found = "I could not find any inactive tickets"
 
-        query = "SELECT id, member_id, active  FROM tickets WHERE guild_id = ?"
-        if active is not None:
-            query += f" AND active = {int(active)}"
-
-        tickets_data = db.records(query, inter.guild.id)
+        tickets_data = db.records(tickets_sql(active), inter.guild.id)
         if not tickets_data:
             await inter.response.send_message(
                 not_found,
@@ -89,98 +451,140 @@ class TicketsCog(BaseCog, name="Tickets"):
             ephemeral=True
         )
 
-    @app_commands.command(name="clean-ticket-channels")
+    def search_pages(self, inter:Inter, key:str) -> PageProducer | None:
+        """Make the producer of the pages of a ticket search
+
+        Args:
+            inter (Inter): The interaction that wants the pages.
+            key (str): The search query, base64 encoded.
+
+        Returns:
+            PageProducer: The producer, None if the key is invalid.
+        """
+
+        try:
+            query = urlsafe_b64decode(key + "=" * (-len(key) % 4)).decode()
+        except (ValueError, UnicodeDecodeError):
+            return None
+
+        guild_id = inter.guild.id
+
+        async def producer(index:int) -> TicketSearchEmbed | None:
+            results = search_tickets(
+                guild_id, query,
+                offset=index * TICKET_SEARCH_PER_PAGE
+            )
+            return TicketSearchEmbed(query, results) if results else None
+
+        return producer
+
+    @app_commands.command(name="search-tickets")
     @app_commands.check(_check_guild_has_tickets)
     @app_commands.default_permissions(moderate_members=True)
-    async def clean_ticket_channels_cmd(self, inter:Inter):
-        """Clean up all ticket channels that are not in the database"""
+    async def search_tickets_cmd(
+        self,
+        inter:Inter,
+        query:app_commands.Range[str, 1, TICKET_SEARCH_MAX_LENGTH]
+    ):
+        """Search this server's tickets by their content
 
-        log.debug("Cleaning up ticket channels in %s", inter.guild.name)
-        await inter.response.defer(ephemeral=True)
+        Args:
+            inter (Inter): The interaction
+            query (str): Words to look for in the tickets.
+        """
 
-        tickets_data = db.records(
-            "SELECT id, active FROM tickets WHERE guild_id = ?",
-            inter.guild.id
-        )
-        if not tickets_data:
-            log.debug("No tickets found, cancelling")
-            await inter.followup.send(
-                "I could not find any tickets",
+        # The query is kept in the page buttons, so they still work
+        # after a restart
+        key = urlsafe_b64encode(query.encode()).decode().rstrip("=")
+        if len(key) > TICKET_SEARCH_MAX_KEY:
+            await inter.response.send_message(
+                "That search is too long, please shorten it",
                 ephemeral=True
             )
             return
 
-        log.debug(
-            "Found %s tickets, sorting by active",
-            len(tickets_data)
-        )
-
-        # sort the tickets by their active status
-        active_ticket_ids = []
-        inactive_ticket_ids = []
-        for ticket_id, active in tickets_data:
-            if active:
-                active_ticket_ids.append(ticket_id)
+        manager = EmbedPageManager.create(inter, "ticket_search", key)
 
-            inactive_ticket_ids.append(ticket_id)
-
-        log.debug("Getting tickets category")
-
-        category_id = db.field(
-            "SELECT object_id FROM purposed_objects WHERE purpose_id = ?",
-            CategoryPurposes.tickets.value
-        )
-        category = await self.bot.get.channel(category_id)
-        if not category:
-            log.debug("Could not find tickets category, cancelling")
-            await inter.followup.send(
-                "I could not find the ticket category",
+        if not await manager.page(0):
+            await inter.response.send_message(
+                "I could not find any tickets matching that",
                 ephemeral=True
             )
+            return
 
-        log.debug("Checking channels")
+        await manager.send(inter, ephemeral=True)
 
-        async def try_delete_channel(channel):
-            try:
-                await channel.delete(reason="Cleaning up ticket channels")
-                log.debug("Deleted channel %s", channel.name)
+    @app_commands.command(name="clean-ticket-channels")
+    @app_commands.check(_check_guild_has_tickets)
+    @app_commands.default_permissions(moderate_members=True)
+    async def clean_ticket_channels_cmd(self, inter:Inter):
+        """Clean up all ticket channels that are not in the database"""
 
-            except discord.Forbidden:
-                log.error(
-                    "I do not have permission to delete channel %s "
-                    "in guild %s",
-                    channel.name, inter.guild.id
-                )
+        log.debug("Cleaning up ticket channels in %s", inter.guild.name)
+        await inter.response.defer(ephemeral=True)
 
-        deleted = 0
-        for i, channel in enumerate(category.channels):
+        # Carry on with a cleanup that is running or was stopped
+        cleanup = self.cleanups.get(inter.guild.id)
+        if cleanup and not cleanup.done:
+            cleanup.follow(inter)
+            cleanup.start()
+            await cleanup.report(inter)
+            return
 
-            try:
-                channel_number = int(channel.name.split("-")[-1])
-            except ValueError:
-                log.debug(
-                    "Channel %s is not a ticket channel",
-                    channel.name
-                )
-                continue
+        ticket_ids = dict(db.records(TICKET_STATES_SQL, inter.guild.id))
+        active_ticket_ids = {
+            ticket_id for ticket_id, active in ticket_ids.items() if active
+        }
 
-            if channel_number not in active_ticket_ids:
-                await try_delete_channel(channel)
-                deleted += 1
+        log.debug("Found %s active tickets", len(active_ticket_ids))
 
-            else:
-                log.debug(
-                    "Channel %s is an active ticket channel, skipping",
-                    channel.name
-                )
+        channels = []
+        # The channels of closed tickets, archived before they're deleted
+        tickets = {}
+        total = 0
+        category_ids = self.bot.purposes.get(
+            inter.guild.id, CategoryPurposes.tickets
+        )
+        for category_id in category_ids:
+            category = inter.guild.get_channel(category_id)
+            if not category:
+                continue
 
-        log.debug("Finished cleaning up ticket channels")
+            total += len(category.channels)
+            for channel in category.channels:
+                try:
+                    channel_number = int(channel.name.split("-")[-1])
+                except ValueError:
+                    log.debug(
+                        "Channel %s is not a ticket channel",
+                        channel.name
+                    )
+                    continue
+
+                if channel_number not in active_ticket_ids:
+                    channels.append(channel)
+
+                    if (
+                        channel_number in ticket_ids
+                        and isinstance(channel, discord.TextChannel)
+                    ):
+                        tickets[channel.id] = channel_number
+
+        if not channels:
+            await inter.followup.send(
+                f"Found **{total}** total channels"
+                "\nThere are no inactive or ticketless channels to delete",
+                ephemeral=True
+            )
+            return
 
-        await inter.followup.send(
-            f"Found **{i+1}** total channels"
-            f"\nDeleted **{deleted}** inactive or ticketless channels",
-            ephemeral=True
+        # Deleting can take minutes, so it's done in the background
+        # and this response is edited as it goes
+        cleanup = self.cleanups[inter.guild.id] = TicketCleanup(
+            inter.guild, channels, tickets
         )
+        cleanup.follow(inter)
+        cleanup.start()
 
     @app_commands.command(name="reopen-ticket")
     @app_commands.check(_check_guild_has_tickets)
@@ -192,14 +596,13 @@ class TicketsCog(BaseCog, name="Tickets"):
             ticket_id (int): The ticket ID
         """
 
+        # Summarising the history can take a moment, defer
+        await inter.response.defer(ephemeral=True)
+
         # Check if the ticket exists
-        ticket_data = db.record(
-            "SELECT id, member_id, description, active, timestamp "
-            " FROM tickets WHERE id = ? AND guild_id = ?",
-            ticket_id, inter.guild.id
-        )
+        ticket_data = db.record(TICKET_SQL, ticket_id, inter.guild.id)
         if not ticket_data:
-            await inter.response.send_message(
+            await inter.followup.send(
                 "I could not find a ticket with that ID",
                 ephemeral=True
             )
@@ -210,7 +613,7 @@ class TicketsCog(BaseCog, name="Tickets"):
 
         # Check if the ticket is already active
         if active:
-            await inter.response.send_message(
+            await inter.followup.send(
                 "That ticket is already active",
                 ephemeral=True
             )
@@ -237,13 +640,17 @@ class TicketsCog(BaseCog, name="Tickets"):
             view=ManageTicketView(ticket_id)
         )
 
+        # Re-post a summary of the history from before it was closed
+        summary = await transcripts.summarize(ticket_id)
+        if summary and summary.messages:
+            await channel.send(
+                embed=TicketTranscriptEmbed(ticket_id, summary)
+            )
+
         # Update the ticket
-        db.execute(
-            "UPDATE tickets SET active = 1 WHERE id = ?",
-            ticket_id
-        )
+        db.execute(TICKET_REOPEN_SQL, ticket_id)
 
-        await inter.response.send_message(
+        await inter.followup.send(
             f"Ticket #{ticket_id} has been reopened",
             ephemeral=True
         )
@@ -265,9 +672,7 @@ class TicketsCog(BaseCog, name="Tickets"):
             timestamp = int(now.timestamp())
 
             cur = db.execute(
-                "INSERT INTO tickets "
-                "(guild_id, member_id, description, timestamp)  "
-                "VALUES (?, ?, ?, ?)",
+                TICKET_INSERT_SQL,
                 inter.guild.id,
                 inter.user.id,
                 description,
@@ -315,20 +720,19 @@ class TicketsCog(BaseCog, name="Tickets"):
 
         log.debug("Creating ticket channel for ticket #%s", ticket_id)
 
-        # Get the category to create the channel in
-        category_ids = db.column(
-            "SELECT object_id FROM purposed_objects WHERE "
-            "purpose_id = ?",
-            CategoryPurposes.tickets.value
-        )
+        guild = member.guild
 
-        for category_id in category_ids:
-            category: CategoryChannel = await self.bot.get.channel(category_id)
-            if category.guild.id == member.guild.id:
-                break
-        else:
+        category = self.get_category(guild)
+        if not category:
             raise EmptyQueryResult
 
+        staff_role_ids = self.bot.purposes.get(guild.id, RolePurposes.admin) \
+            + self.bot.purposes.get(guild.id, RolePurposes.mod)
+        staff_roles: list[Role] = [
+            role for role_id in staff_role_ids
+            if (role := guild.get_role(role_id))
+        ]
+
         overwrites = {}
         access_overwrite = PermissionOverwrite(
             read_messages=True,
@@ -341,31 +745,9 @@ class TicketsCog(BaseCog, name="Tickets"):
             external_emojis=True
         )
 
-        # get the admin and moderator roles to add to the channel perms
-        admin_role_ids = db.column(
-            "SELECT object_id FROM purposed_objects WHERE "
-            "purpose_id = ?",
-            RolePurposes.admin.value
-        )
-
-        for admin_role_id in admin_role_ids:
-            admin_role: Role = await self.bot.get.role(admin_role_id, member.guild.id)
-            if admin_role.guild.id == member.guild.id:
-                overwrites[admin_role] = access_overwrite
-                break
-
-        # TODO: make a util function for this repeated code
-        mod_role_ids = db.column(
-            "SELECT object_id FROM purposed_objects WHERE "
-            "purpose_id = ?",
-            RolePurposes.mod.value
-        )
-
-        for mod_role_id in mod_role_ids:
-            mod_role: Role = await self.bot.get.role(mod_role_id, member.guild.id)
-            if mod_role.guild.id == member.guild.id:
-                overwrites[mod_role] = access_overwrite
-                break
+        # Grant access to the admin and moderator roles
+        for role in staff_roles:
+            overwrites[role] = access_overwrite
 
         # Grant access to the ticket opener
         overwrites[member] = access_overwrite
@@ -6,7 +6,6 @@ import discord
 from discord.ext import commands
 
 from exceptions import EmptyQueryResult
-from db import db
 from db.enums import ChannelPurposes
 from ui import WelcomeEmbed, RemoveEmbed
 from . import BaseCog
@@ -18,6 +17,8 @@ log = logging.getLogger(__name__)
 class Welcome(BaseCog):
     """Cog for welcoming new members"""
 
+    intents = discord.Intents(members=True)
+
     def __init__(self, bot):
         super().__init__(bot)
 
@@ -28,11 +29,7 @@ class Welcome(BaseCog):
     ) -> discord.TextChannel | None:
         """Get a channel object"""
 
-        channel_id = db.field(
-            "SELECT object_id FROM purposed_objects " \
-            "WHERE guild_id = ? AND purpose_id = ?",
-            guild_id, purpose.value
-        )
+        channel_id = self.bot.purposes.first(guild_id, purpose)
         if not channel_id:
             raise EmptyQueryResult("No channel with that purpose found")
 
@@ -61,24 +58,26 @@ class Welcome(BaseCog):
         await channel.send(embed=embed)
         
     @commands.Cog.listener()
-    async def on_member_remove(self, member:discord.Member):
-        """Sends a message when a member leaves the server
+    async def on_raw_member_remove(self, payload:discord.RawMemberRemoveEvent):
+        """Sends a message when a member leaves the server, whether or
+        not they were cached
 
         Args:
-            member (discord.Member): The member that left.
+            payload (discord.RawMemberRemoveEvent): The user that left
+                and their guild's ID.
         """
 
-        log.debug("%s has left %s", member, member.guild)
+        log.debug("%s has left %s", payload.user, payload.guild_id)
 
         try:
             channel = await self._get_channel_from_purpose(
-                member.guild.id, ChannelPurposes.goodbye
+                payload.guild_id, ChannelPurposes.goodbye
             )
         except EmptyQueryResult:
             log.debug("No goodbye channel found")
             return
 
-        embed = RemoveEmbed(member)
+        embed = RemoveEmbed(payload.user)
         await channel.send(embed=embed)
 
 
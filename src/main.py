@@ -6,6 +6,8 @@ import argparse
 import multiprocessing
 
 from bot import Bot
+from bot._loop import install_uvloop
+from cluster import supervise
 from dashboard import DashboardApp
 
 # Parse command line arguments
@@ -19,6 +21,24 @@ parser.add_argument(
     required=False,
     action="store_true"
 )
+parser.add_argument(
+    "-s", "--shards",
+    help="Number of shards to run, discord's recommendation by default.",
+    required=False,
+    type=int
+)
+parser.add_argument(
+    "-c", "--clusters",
+    help="Run the shards in this many processes.",
+    required=False,
+    type=int
+)
+parser.add_argument(
+    "-u", "--uvloop",
+    help="Run on uvloop's faster event loop, if it's installed.",
+    required=False,
+    action="store_true"
+)
 parser.add_argument(
     "-w", "--website-only",
     help="Run the dashboard website only.",
@@ -37,8 +57,15 @@ async def main():
 
     token = client_data["token"]
 
+    # Each cluster runs its own bot, see cluster.py
+    if args.clusters:
+        await supervise(
+            token, args.clusters, args.shards, args.debug, args.uvloop
+        )
+        return
+
     # Construct the bot, load the extensions and start it up!
-    async with Bot(debug=args.debug) as bot:
+    async with Bot(debug=args.debug, shard_count=args.shards) as bot:
 
         # webapp = DashboardApp(
         #     token=token,
@@ -67,4 +94,9 @@ async def main():
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    _args = parser.parse_args()
+    if _args.uvloop:
+        install_uvloop()
+
+    # Debug mode from the start, rather than once the bot is set up
+    asyncio.run(main(), debug=_args.debug)
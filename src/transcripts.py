@@ -0,0 +1,208 @@
+"""Archive the history of ticket channels to compressed transcripts"""
+
+import os
+import gzip
+import json
+import logging
+import asyncio
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import IO, Iterator
+
+import discord
+
+from db import db
+from constants import TRANSCRIPTS_PATH, TRANSCRIPT_BATCH_SIZE
+
+
+log = logging.getLogger(__name__)
+
+# Queries of the transcripts, also timed by src/bench/queries.py
+TRANSCRIPT_PATH_SQL = "SELECT path FROM ticket_transcripts WHERE ticket_id = ?"
+TRANSCRIPT_INDEX_SQL = "UPDATE tickets_fts SET transcript = ? WHERE rowid = ?"
+TRANSCRIPT_SAVE_SQL = (
+    "INSERT INTO ticket_transcripts (ticket_id, path, messages) "
+    "VALUES (?, ?, ?) ON CONFLICT (ticket_id) DO UPDATE "
+    "SET messages = messages + excluded.messages"
+)
+TRANSCRIPT_DELETE_SQL = "DELETE FROM ticket_transcripts WHERE ticket_id = ?"
+
+
+@dataclass
+class TranscriptSummary:
+    """Dataclass for the summary of a ticket's transcript"""
+
+    messages: int = 0
+    first: float = None
+    last: float = None
+    authors: Counter = field(default_factory=Counter)
+    recent: deque = field(default_factory=lambda: deque(maxlen=5))
+
+
+def _message_record(message:discord.Message) -> dict:
+    """Get what's kept of a message in the transcript"""
+
+    return {
+        "id": message.id,
+        "author_id": message.author.id,
+        "author": str(message.author),
+        "bot": message.author.bot,
+        "content": message.content,
+        "timestamp": message.created_at.timestamp(),
+        "attachments": [file.url for file in message.attachments],
+        "embeds": len(message.embeds)
+    }
+
+def transcript_path(guild_id:int, ticket_id:int) -> str:
+    """Get where the transcript of a ticket is written
+
+    Args:
+        guild_id (int): The ticket's guild ID.
+        ticket_id (int): The ticket ID.
+
+    Returns:
+        str: The path of the transcript.
+    """
+
+    return os.path.join(
+        TRANSCRIPTS_PATH, str(guild_id), f"{ticket_id}.jsonl.gz"
+    )
+
+def get_transcript_path(ticket_id:int) -> str | None:
+    """Get the path of a ticket's transcript from the database
+
+    Args:
+        ticket_id (int): The ticket ID.
+
+    Returns:
+        str: The path, None if the ticket has no transcript.
+    """
+
+    return db.field(TRANSCRIPT_PATH_SQL, ticket_id)
+
+async def _write_batch(file:IO[str], batch:list[discord.Message]):
+    """Write a batch of messages to a transcript"""
+
+    lines = [json.dumps(_message_record(message)) + "\n" for message in batch]
+    await asyncio.to_thread(file.writelines, lines)
+
+def _transcript_text(path:str) -> str:
+    """Read the text of every message of a transcript, blocking"""
+
+    return "\n".join(
+        message["content"] for message in read_transcript(path)
+        if message["content"]
+    )
+
+async def archive(
+    ticket_id:int,
+    channel:discord.TextChannel,
+    batch_size:int=TRANSCRIPT_BATCH_SIZE
+) -> int:
+    """Stream the history of a ticket channel into its transcript.
+    Only a batch of messages is held at once, and a reopened ticket's
+    history is appended after what was archived before. The ticket's
+    search index is updated once, after the history is written, as
+    every update tokenizes the whole transcript. Its text is read back
+    from the transcript rather than kept while the history streams.
+
+    Args:
+        ticket_id (int): The ticket ID.
+        channel (discord.TextChannel): The ticket channel.
+        batch_size (int, optional): Messages written at once.
+
+    Returns:
+        int: The number of messages archived.
+    """
+
+    path = transcript_path(channel.guild.id, ticket_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    log.debug("Archiving ticket #%s to %s", ticket_id, path)
+
+    # Appending adds a new gzip member, which reads as one stream
+    file = await asyncio.to_thread(gzip.open, path, "at", encoding="utf-8")
+    count = 0
+    try:
+        batch = []
+        async for message in channel.history(limit=None, oldest_first=True):
+            batch.append(message)
+            if len(batch) >= batch_size:
+                await _write_batch(file, batch)
+                count += len(batch)
+                batch = []
+
+        if batch:
+            await _write_batch(file, batch)
+            count += len(batch)
+
+    finally:
+        await asyncio.to_thread(file.close)
+
+    # Read in a thread, but written on the loop as the database
+    # connection isn't shared with other threads
+    text = await asyncio.to_thread(_transcript_text, path)
+    db.execute(TRANSCRIPT_INDEX_SQL, text, ticket_id)
+    db.execute(TRANSCRIPT_SAVE_SQL, ticket_id, path, count)
+
+    log.info("Archived %s messages of ticket #%s", count, ticket_id)
+    return count
+
+def read_transcript(path:str) -> Iterator[dict]:
+    """Read the messages of a transcript, one at a time
+
+    Args:
+        path (str): The path of the transcript.
+
+    Yields:
+        dict: The next message.
+    """
+
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            yield json.loads(line)
+
+def _summarize(path:str) -> TranscriptSummary:
+    """Summarize a transcript, blocking"""
+
+    summary = TranscriptSummary()
+    for message in read_transcript(path):
+        summary.messages += 1
+        summary.first = summary.first or message["timestamp"]
+        summary.last = message["timestamp"]
+        summary.authors[message["author"]] += 1
+
+        if message["content"] and not message["bot"]:
+            summary.recent.append(message)
+
+    return summary
+
+async def summarize(ticket_id:int) -> TranscriptSummary | None:
+    """Summarize the transcript of a ticket
+
+    Args:
+        ticket_id (int): The ticket ID.
+
+    Returns:
+        TranscriptSummary: The summary, None if there is no transcript.
+    """
+
+    path = get_transcript_path(ticket_id)
+    if not path or not os.path.exists(path):
+        return None
+
+    return await asyncio.to_thread(_summarize, path)
+
+def delete(ticket_id:int):
+    """Delete the transcript of a ticket, if it has one
+
+    Args:
+        ticket_id (int): The ticket ID.
+    """
+
+    path = get_transcript_path(ticket_id)
+    if path and os.path.exists(path):
+        os.remove(path)
+        log.debug("Deleted transcript %s", path)
+
+    db.execute(TRANSCRIPT_DELETE_SQL, ticket_id)
@@ -8,15 +8,20 @@ from .modals import (
 )
 from .embeds import (
     NextBirthdayEmbed,
+    UpcomingBirthdaysEmbed,
     BirthdayHelpEmbed,
+    BirthdayListEmbed,
     CelebrateBirthdayEmbed,
     HelpChannelsEmbed,
     EmbedPageManager,
+    PageProducer,
     HelpSetPronounsEmbed,
     HelpGetPronounsEmbed,
     WelcomeEmbed,
     RemoveEmbed,
     ManageTicketEmbed,
+    TicketTranscriptEmbed,
+    TicketSearchEmbed,
     AddedTrackEmbed,
     NowPlayingEmbed,
     MusicQueueEmbed,
@@ -26,6 +31,7 @@ from .embeds import (
     LogDeletedMessage,
     LogNewMember,
     LogMemberLeave,
+    LogDroppedEvents,
 )
 from .views import (
     EmbedPageView,
@@ -1,7 +1,10 @@
 """Embeds for the project"""
 
+import re
 import logging
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from typing import Callable, Coroutine
 
 import discord
 from discord import Interaction as Inter
@@ -10,12 +13,21 @@ from num2words import num2words
 
 from db import db
 from utils import normalized_name
-from constants import (BDAY_HELP_MSG, PRONOUNDB_LOGIN_URL, PRONOUNDB_SET_URL)
+from constants import (
+    BDAY_HELP_MSG,
+    PRONOUNDB_LOGIN_URL,
+    PRONOUNDB_SET_URL,
+    PAGE_CACHE_SIZE,
+    PAGE_MANAGER_LIMIT
+)
 from .views import EmbedPageView
 
 
 log = logging.getLogger(__name__)
 
+# Takes a page index and renders the page, or returns None
+PageProducer = Callable[[int], Coroutine[None, None, discord.Embed | None]]
+
 
 # GUILD LOG EMBEDS ################################################################
 
@@ -37,14 +49,21 @@ class LogNewMessage(discord.Embed):
 class LogEditedMessage(discord.Embed):
     """Embed for logging an edited message"""
 
-    def __init__(self, before:discord.Message, after:discord.Message):
+    def __init__(
+        self,
+        author:str,
+        channel:discord.abc.GuildChannel,
+        before:str,
+        after:str,
+        jump_url:str
+    ):
         super().__init__(
-            title=f"Message Edited by {before.author}",
+            title=f"Message Edited by {author}",
             description=(
-                f"**Channel**\n{before.channel.mention}"
-                f"\n\n**Message Before**\n{before.content}"
-                f"\n\n**Message After**\n{after.content}"
-                f"\n\n**Jump to Message**\n{after.jump_url}"
+                f"**Channel**\n{channel.mention}"
+                f"\n\n**Message Before**\n{before}"
+                f"\n\n**Message After**\n{after}"
+                f"\n\n**Jump to Message**\n{jump_url}"
             ),
             colour=discord.Colour.orange(),
         )
@@ -52,12 +71,12 @@ class LogEditedMessage(discord.Embed):
 class LogDeletedMessage(discord.Embed):
     """Embed for logging a deleted message"""
 
-    def __init__(self, message:discord.Message):
+    def __init__(self, author:str, channel:discord.abc.GuildChannel, content:str):
         super().__init__(
-            title=f"Message Deleted by {message.author}",
+            title=f"Message Deleted by {author}",
             description=(
-                f"**Channel**\n{message.channel.mention}"
-                f"\n\n**Message Content**\n{message.content}"
+                f"**Channel**\n{channel.mention}"
+                f"\n\n**Message Content**\n{content}"
             ),
             colour=discord.Colour.red(),
         )
@@ -82,6 +101,22 @@ class LogMemberLeave(discord.Embed):
             colour=discord.Colour.red(),
         )
 
+class LogDroppedEvents(discord.Embed):
+    """Embed summarising the logs that were dropped during a burst"""
+
+    def __init__(self, dropped:dict[str, int]):
+        super().__init__(
+            title=f"{sum(dropped.values())} Events Not Logged",
+            description="There were too many events to log them all:\n"
+                + "\n".join(
+                    f"**{count}** {title}"
+                    for title, count in sorted(
+                        dropped.items(), key=lambda item: -item[1]
+                    )[:20]
+                ),
+            colour=discord.Colour.orange(),
+        )
+
 ###################################################################################
 
 # MUSIC COMMAND EMBEDS ############################################################
@@ -256,6 +291,55 @@ class ManageTicketEmbed(discord.Embed):
         self.set_thumbnail(url=member.display_avatar.url)
 
 
+class TicketTranscriptEmbed(discord.Embed):
+    """Embed summarising the archived history of a reopened ticket"""
+
+    def __init__(self, ticket_id:int, summary):
+
+        participants = "\n".join(
+            f"{author}: **{count}** messages"
+            for author, count in summary.authors.most_common(5)
+        )
+        recent = "\n".join(
+            f"**{message['author']}:** {message['content'][:200]}"
+            for message in summary.recent
+        )
+
+        super().__init__(
+            title="Ticket History",
+            colour=discord.Colour.blurple(),
+            description=f"Ticket number **{ticket_id}** had "
+                        f"**{summary.messages}** messages before it was "
+                        f"closed, from <t:{int(summary.first)}:F> to "
+                        f"<t:{int(summary.last)}:F>"
+        )
+        self.add_field(name="Participants", value=participants, inline=False)
+        if recent:
+            self.add_field(
+                name="Last Messages",
+                value=recent[:1024],
+                inline=False
+            )
+
+
+class TicketSearchEmbed(discord.Embed):
+    """Embed for a page of ticket search results"""
+
+    def __init__(self, query:str, results:list[tuple[int, int, int, str]]):
+
+        desc = "\n\n".join(
+            f"**#{ticket_id}** by <@{member_id}> "
+            f"({'active' if active else 'closed'})\n{snippet}"
+            for ticket_id, member_id, active, snippet in results
+        )
+
+        super().__init__(
+            title=f"Tickets Matching \"{query}\"",
+            description=desc,
+            colour=discord.Colour.blurple()
+        )
+
+
 class WelcomeEmbed(discord.Embed):
     """Welcome embed"""
 
@@ -458,93 +542,258 @@ class ExpClusterEmbed(discord.Embed):
 
 
 class EmbedPageManager:
-    """An object to manage multiple embeds in a single message"""
+    """Pages of embeds in a single message, rendered as they are
+    turned to.
+
+    Pages come from a producer, a coroutine function that takes a page
+    index and returns the embed, or None if there is no such page. The
+    producer is made by the factory registered for the manager's
+    source, from a key, which is all that the buttons need to hold.
+    So the buttons keep working after a restart, the same way the
+    ticket buttons hold their ticket id. Managers belong to the guild
+    they were made in, so the same key in another guild never shares
+    their pages.
+    """
+
+    # Custom ids are pages:<source>:<key>:<page index or delete>
+    PATTERN = re.compile(
+        r"pages:(?P<source>\w+):(?P<key>[\w-]*):(?P<action>\d+|delete)"
+    )
+
+    # Factories for the producers of each source, by name
+    _sources: dict[str, Callable[[Inter, str], PageProducer | None]] = {}
+
+    # Recently used managers by source, guild ID and key, so turning a
+    # page uses their cache
+    _managers: OrderedDict[
+        tuple[str, int, str], "EmbedPageManager"
+    ] = OrderedDict()
+
+    def __init__(
+        self,
+        source:str,
+        guild_id:int,
+        key:str,
+        producer:PageProducer,
+        cache_size:int=PAGE_CACHE_SIZE
+    ):
+        """Create a new page manager
+
+        Args:
+            source (str): The name of a registered source.
+            guild_id (int): The guild the pages were made in.
+            key (str): Identifies the pages within the source.
+            producer (PageProducer): Renders the page at an index.
+            cache_size (int, optional): Rendered pages to keep.
+        """
+
+        self.source = source
+        self.guild_id = guild_id
+        self.key = key
+        self._producer = producer
+        self._cache: OrderedDict[int, discord.Embed] = OrderedDict()
+        self._cache_size = cache_size
+
+    @classmethod
+    def register(
+        cls,
+        source:str,
+        factory:Callable[[Inter, str], PageProducer | None]
+    ):
+        """Register the factory that makes the producers of a source
+
+        Args:
+            source (str): The name of the source.
+            factory (Callable): Called with the interaction and key,
+                returns the producer or None if the key is invalid.
+        """
+
+        cls._sources[source] = factory
+
+    @classmethod
+    def unregister(cls, source:str):
+        """Remove a source, its buttons will stop working
 
-    # The last interaction that sent the message
-    _last_inter: Inter = None
+        Args:
+            source (str): The name of the source.
+        """
 
-    # A list of embeds under this manager, each embed is a page
-    _embeds = []
+        cls._sources.pop(source, None)
+        for manager_key in [k for k in cls._managers if k[0] == source]:
+            del cls._managers[manager_key]
 
-    # Properties
-    current_page = 0
+    @classmethod
+    def create(cls, inter:Inter, source:str, key:str) -> "EmbedPageManager":
+        """Create a manager for a source, replacing any that is cached
 
-    @property
-    def pages(self):
-        """Get the number of embeds in this manager
+        Args:
+            inter (Inter): The interaction that wants the pages.
+            source (str): The name of the source.
+            key (str): Identifies the pages within the source.
 
         Returns:
-            int: The number of embeds
+            EmbedPageManager: The manager, None if the key is invalid.
         """
 
-        return len(self._embeds)
+        producer = cls._sources[source](inter, key)
+        if producer is None:
+            return None
+
+        manager_key = (source, inter.guild_id, key)
+        manager = cls(source, inter.guild_id, key, producer)
+        cls._managers[manager_key] = manager
+        cls._managers.move_to_end(manager_key)
 
-    def add_embed(self, embed:discord.Embed):
-        """Add an embed to the message
+        while len(cls._managers) > PAGE_MANAGER_LIMIT:
+            cls._managers.popitem(last=False)
+
+        return manager
+
+    @classmethod
+    def get(cls, inter:Inter, source:str, key:str) -> "EmbedPageManager":
+        """Get the cached manager for a source, or create one
 
         Args:
-            embed (discord.Embed): The embed to add
+            inter (Inter): The interaction that wants the pages.
+            source (str): The name of the source.
+            key (str): Identifies the pages within the source.
+
+        Returns:
+            EmbedPageManager: The manager, None if the key is invalid.
         """
 
-        # Add the page number to the description of the embed
-        embed.description += f'\n\n**Page {self.pages + 1}**'
+        manager_key = (source, inter.guild_id, key)
+        manager = cls._managers.get(manager_key)
+        if manager is None:
+            return cls.create(inter, source, key)
+
+        # Never serve the pages of one guild to another
+        if manager.guild_id != inter.guild_id:
+            return None
 
-        # Now we can save the embed
-        self._embeds.append(embed)
+        cls._managers.move_to_end(manager_key)
+        return manager
 
-    def add_embeds(self, *embeds):
-        """Add multiple embeds to the message
+    async def page(self, index:int) -> discord.Embed | None:
+        """Get a rendered page
 
         Args:
-            *embeds (discord.Embed): The embeds to add
+            index (int): The index of the page.
+
+        Returns:
+            discord.Embed: The page, None if there is no such page.
         """
 
-        log.debug('Adding %s embeds', len(embeds))
+        if index in self._cache:
+            self._cache.move_to_end(index)
+            return self._cache[index]
+
+        log.debug('Rendering page %s of %s:%s', index, self.source, self.key)
+
+        embed = await self._producer(index) if index >= 0 else None
+        if embed is None:
+            # Not cached, the page can exist once new rows are added
+            return None
+
+        # Add the page number to the description of the embed
+        embed.description = \
+            f'{embed.description or ""}\n\n**Page {index + 1}**'
+
+        self._cache[index] = embed
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
 
-        # Just add them as we would a single embed
-        for embed in embeds:
-            self.add_embed(embed)
+        return embed
 
-    def get_embed(self, index:int):
-        """Get an embed from the message
+    async def render(self, index:int) -> tuple[discord.Embed, EmbedPageView]:
+        """Render a page and the controls for it
 
         Args:
-            index (int): The index of the embed
+            index (int): The index of the page.
+
+        Returns:
+            tuple[discord.Embed, EmbedPageView]: The page and controls,
+                or (None, None) if there is no such page.
         """
 
-        log.debug('Getting embed at index: %s', index)
-        return self._embeds[index]
+        embed = await self.page(index)
+        if embed is None:
+            return None, None
 
-    async def delete(self):
-        """Delete the message"""
+        # Render the next page now, so we know if this is the last one,
+        # the next turn will then come from the cache if there is one.
+        has_next = await self.page(index + 1) is not None
 
-        await self._last_inter.delete_original_response()
+        view = EmbedPageView(self.source, self.key, index, has_next)
+        return embed, view
 
-    async def send(self, inter:Inter):
+    async def send(self, inter:Inter, index:int=0, ephemeral:bool=False):
         """Send the message
 
         Args:
             inter (Inter): The interaction to send the message to
+            index (int, optional): The index of the first page.
+            ephemeral (bool, optional): Only show it to the member.
         """
 
-        # Delete the last page, if it exists
-        if self._last_inter:
-            await self._last_inter.delete_original_response()
+        embed, view = await self.render(index)
 
-        # Create the user controls
-        view = EmbedPageView(self)
-        await view.update_buttons(inter)
+        # The interaction may have been deferred while finding the pages
+        if inter.response.is_done():
+            send = inter.followup.send
+        else:
+            send = inter.response.send_message
 
-        # Send the new page
-        await inter.response.send_message(
-            embed=self.get_embed(self.current_page),
-            ephemeral=False,  # IMPORTANT
-            view=view
-        )
+        if embed is None:
+            await send('There is nothing to show.', ephemeral=True)
+            return
+
+        await send(embed=embed, view=view, ephemeral=ephemeral)
+
+    @classmethod
+    async def on_button(cls, inter:Inter, match:re.Match):
+        """Handle a press of the buttons of any manager
+
+        Args:
+            inter (Inter): The button interaction.
+            match (re.Match): The match of the button's custom_id.
+        """
 
-        # Save the interaction so we can delete it later if the
-        # member changes page
-        self._last_inter = inter
+        source, key, action = match.group("source", "key", "action")
+
+        if action == "delete":
+            await inter.response.defer()
+            await inter.delete_original_response()
+            return
+
+        manager = None
+        if source in cls._sources:
+            manager = cls.get(inter, source, key)
+
+        if manager is None:
+            await inter.response.send_message(
+                'These pages are no longer available.',
+                ephemeral=True
+            )
+            return
+
+        embed, view = await manager.render(int(action))
+        if embed is None:
+            # The pages have changed since the buttons were made
+            manager = cls.create(inter, source, key)
+            if manager is not None:
+                embed, view = await manager.render(0)
+
+        if embed is None:
+            await inter.response.edit_message(
+                content='There is nothing to show.',
+                embed=None,
+                view=None
+            )
+            return
+
+        # Edit the message in place to turn the page
+        await inter.response.edit_message(embed=embed, view=view)
 
 
 class HelpChannelsEmbed(discord.Embed):
@@ -684,31 +933,10 @@ class CelebrateBirthdayEmbed(discord.Embed):
 class NextBirthdayEmbed(discord.Embed):
     """Embed for the next persons birthday"""
 
-    def __init__(
-        self,
-        inter:Inter,
-        birthdays:list[tuple[int, datetime]]
-    ):
+    def __init__(self, member:discord.Member, birthday:datetime):
 
         log.debug('Creating new NextBirthdayEmbed')
 
-        now = datetime.now()
-
-        for member_id, birthday in birthdays:
-
-            # If their birthday has not past, break
-            birthday = birthday.replace(year=now.year)
-            if not birthday < now:
-                break
-
-        else:  #nobreak
-            # The next birthday is next year
-            member_id, birthday = birthdays[0]
-            birthday = birthday.replace(now.year + 1)
-
-        # Get the member object
-        member = inter.guild.get_member(member_id)
-
         # Get the unix timestamp for the birthday
         unix = int(birthday.timestamp())
 
@@ -733,3 +961,48 @@ class NextBirthdayEmbed(discord.Embed):
 
         self.set_thumbnail(url=member.display_avatar.url)
         self.set_footer(text=BDAY_HELP_MSG)
+
+
+class UpcomingBirthdaysEmbed(discord.Embed):
+    """Embed for a page of upcoming birthdays"""
+
+    def __init__(
+        self,
+        birthdays:list[tuple[discord.Member, datetime]],
+        current_page:int,
+        total_pages:int
+    ):
+
+        log.debug('Creating new UpcomingBirthdaysEmbed')
+
+        desc = '\n'.join(
+            f'<t:{int(birthday.timestamp())}:D> {member.mention}'
+            for member, birthday in birthdays
+        )
+
+        super().__init__(
+            title='Upcoming Birthdays',
+            description=desc,
+            colour=discord.Colour.gold()
+        )
+        self.set_footer(
+            text=f'Page {current_page}/{total_pages} • {BDAY_HELP_MSG}'
+        )
+
+
+class BirthdayListEmbed(discord.Embed):
+    """Embed for a page of saved birthdays"""
+
+    def __init__(self, birthdays:list[tuple[discord.Member, str]]):
+
+        desc = '\n'.join(
+            f'{member.mention}: {birthday}'
+            for member, birthday in birthdays
+        )
+
+        super().__init__(
+            title='Saved Birthdays',
+            description=desc,
+            colour=discord.Colour.gold()
+        )
+        self.set_footer(text=BDAY_HELP_MSG)
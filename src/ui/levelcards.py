@@ -6,6 +6,7 @@ from functools import cache
 from time import perf_counter
 
 from discord import Status, Colour, Member, File
+from discord import Interaction as Inter
 from easy_pil import (
     Editor,
     Canvas,
@@ -14,14 +15,16 @@ from easy_pil import (
 )
 from PIL import Image
 
-from db import MemberLevelModel
+from db import db, MemberLevelModel
+from db.models import LEVEL_TOP_SQL
 from constants import (
     WHITE,
     BLACK,
     LIGHT_GREY,
     DARK_GREY,
     POPPINS,
-    POPPINS_SMALL
+    POPPINS_SMALL,
+    SHOW_MEMBER_STATUS
 )
 
 
@@ -160,9 +163,16 @@ class CustomImageBase:
 class LevelUpCard(CustomImageBase):
     """A ranking card for members"""
 
-    __slots__ = ("is_darkmode", "editor")
-    lvl_obj: MemberLevelModel
-    member: Member
+    __slots__ = (
+        "lvl_obj", "member", "is_darkmode",
+        "_foreground_1",
+        "_foreground_2",
+        "_background_1",
+        "_background_2",
+        "_accent_colour",
+        "_status_colour",
+        "editor"
+    )
 
     def __init__(
         self, member:Member, lvl_obj:MemberLevelModel, is_darkmode:bool=True
@@ -211,6 +221,79 @@ class ScoreBoard(CustomImageBase):
     def __init__(self, members:tuple[tuple[Member, MemberLevelModel]]):
         self.members = members
 
+    @classmethod
+    def from_interaction(cls, inter:Inter, length:int=6) -> "ScoreBoard":
+        """Create a scoreboard of the top members in the guild of the
+        interaction. Members that have left the guild are skipped.
+
+        Args:
+            inter (Inter): The interaction object
+            length (int, optional): The amount of members to show.
+
+        Returns:
+            ScoreBoard: The scoreboard
+        """
+
+        log.debug("Getting the top %s members of %s", length, inter.guild)
+
+        members = []
+        for member_id, xp in db.records(LEVEL_TOP_SQL, inter.guild_id, length):
+            member = inter.guild.get_member(member_id)
+            if member is not None:
+                members.append(
+                    (member, MemberLevelModel(member_id, inter.guild_id, xp))
+                )
+
+        return cls(tuple(members))
+
+    async def get_grid(self) -> File:
+        """Draw the level card of each member in a grid
+
+        Returns:
+            discord.File: The scoreboard as a discord.File
+        """
+
+        await self.draw()
+        return self.get_file("scoreboard.png")
+
+    async def get_icons(self) -> File:
+        """Draw the avatar of each member in a row, ordered by rank
+
+        Returns:
+            discord.File: The scoreboard as a discord.File
+        """
+
+        log.info("Drawing scoreboard icons")
+
+        self.editor = Editor(Canvas(
+            (220 * max(len(self.members), 1), 220), color=BLACK
+        ))
+
+        for i, (member, _) in enumerate(self.members):
+            avatar = await load_image_async(member.display_avatar.url)
+            self.editor.paste(
+                Editor(avatar).resize((200, 200)).circle_image(),
+                (220 * i + 10, 10)
+            )
+
+        return self.get_file("scoreboard.png")
+
+    async def get_text(self) -> str:
+        """Get the scoreboard as a message, one member per line
+
+        Returns:
+            str: The scoreboard text
+        """
+
+        if not self.members:
+            return "Nobody is on the scoreboard yet"
+
+        return "\n".join(
+            f"**{i}.** {member.display_name} - level {lvl_obj.level} "
+            f"({lvl_obj.xp}/{lvl_obj.next_xp} exp)"
+            for i, (member, lvl_obj) in enumerate(self.members, start=1)
+        )
+
     async def draw(self):
         """Draw the scoreboard"""
 
@@ -226,7 +309,7 @@ class ScoreBoard(CustomImageBase):
 
             log.debug("%s is at position %sx%s", i, x_pos, y_pos)
 
-            card = LevelCard(member, lvl_obj)
+            card = self._create_card(member, lvl_obj)
             await card.draw()
             self.editor.paste(card.editor, (x_pos, y_pos))
 
@@ -240,6 +323,11 @@ class ScoreBoard(CustomImageBase):
 
         self.editor.image = self.editor.image.crop((0, 0, width-20, height-20))
 
+    def _create_card(self, member:Member, lvl_obj:MemberLevelModel) -> "LevelCard":
+        """Create the card for a single member on the scoreboard"""
+
+        return LevelCard(member, lvl_obj)
+
 class LevelCard(CustomImageBase):
     """A ranking card for members"""
 
@@ -287,7 +375,8 @@ class LevelCard(CustomImageBase):
         # Draw the various elements of the card
         self._draw_accent_polygon()
         await self._draw_avatar()
-        self._draw_status_icon()
+        if SHOW_MEMBER_STATUS:
+            self._draw_status_icon()
         self._draw_progress_bar()
         self._draw_name()
         self._draw_exp()
@@ -331,8 +420,7 @@ class LevelCard(CustomImageBase):
         start = perf_counter()
         log.debug("Drawing avatar image")
 
-        # Get the member's avatar as an Image object
-        avatar = await load_image_async(self.member.display_avatar.url)
+        avatar = await self._load_avatar()
 
         # Shape the avatar into a circle with a border
         avatar_image = Editor(Canvas(
@@ -352,6 +440,11 @@ class LevelCard(CustomImageBase):
             end-start
         )
 
+    async def _load_avatar(self) -> Image.Image:
+        """Get the member's avatar as an Image object"""
+
+        return await load_image_async(self.member.display_avatar.url)
+
     def _draw_status_icon(self):
         """Draw the status icon on the card"""
 
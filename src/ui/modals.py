@@ -7,6 +7,8 @@ import discord
 from discord import Interaction as Inter
 from discord import ui as dui
 
+from constants import DATE_FORMAT
+
 
 log = logging.getLogger(__name__)
 
@@ -132,7 +134,7 @@ class BirthdayModal(dui.Modal, title='Birthday'):
 
         # Get the entered birthday
         value = self.birthday_input.value
-        bday = datetime.strptime(value, "%d/%m/%Y")
+        bday = datetime.strptime(value, DATE_FORMAT)
 
         # Get the validation range
         now = datetime.now()
@@ -142,7 +144,8 @@ class BirthdayModal(dui.Modal, title='Birthday'):
         if bday.year not in valid_range:
             raise OverflowError()
 
-        self._save_func(value)
+        # Always save it zero padded, the daily check depends on it
+        self._save_func(bday.strftime(DATE_FORMAT))
 
         await inter.response.send_message(
             'I\'ve saved your special date, '
@@ -12,6 +12,7 @@ from easy_pil import (
 
 from db import db
 from db import MemberLevelModel
+from db.models import LEVEL_TOP_SQL
 
 
 class Scoreboard:
@@ -26,11 +27,7 @@ class Scoreboard:
                 inter.guild.get_member(member_id, inter.guild.id),
                 MemberLevelModel(member_id, inter.guild.id, xp)
             )
-            for member_id, xp in db.records(
-                "SELECT member_id, experience FROM member_levels "
-                "WHERE guild_id=? ORDER BY experience DESC LIMIT ?",
-                inter.guild.id, 6
-            )
+            for member_id, xp in db.records(LEVEL_TOP_SQL, inter.guild.id, 6)
         ]
 
         canvas = Canvas((300, 300), color="#2f3136")
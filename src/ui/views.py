@@ -1,5 +1,6 @@
 """Views for the bot"""
 
+import re
 import logging
 import asyncio
 from typing import Coroutine
@@ -12,11 +13,15 @@ from discord import (
     ButtonStyle
 )
 
+import transcripts
 from db import db
 
 
 log = logging.getLogger(__name__)
 
+# Also timed by src/bench/queries.py
+TICKET_CLOSE_SQL = "UPDATE tickets SET active = 0 WHERE id = ? AND guild_id = ?"
+
 
 # MUSIC COMMAND VIEWS ############################################################
 
@@ -185,69 +190,116 @@ class MusicControlView(dui.View):
 
 
 class ManageTicketView(dui.View):
-    """View for managing a ticket"""
+    """View for managing a ticket.
+
+    The buttons hold the ticket id in their custom_id and are handled
+    by `ManageTicketView.on_button` through the bot's interaction
+    router, so no view has to be kept for each open ticket.
+    """
+
+    # Custom ids are manage_ticket:<close or delete>:<ticket id>
+    PATTERN = re.compile(
+        r"manage_ticket:(?P<action>close|delete):(?P<ticket_id>\d+)"
+    )
 
-    __slots__ = ("_ticket_id",)
-    _deleting:bool = False
+    # Tickets that are having their channel deleted
+    _deleting: set[int] = set()
 
     def __init__(self, ticket_id:int):
         super().__init__(timeout=None)
-        self._ticket_id = ticket_id
 
-        # Add the ticket id to the buttons, otherwise closing/deleting
-        # a ticket will close/delete the wrong ticket.
-        for button in self.children:
-            if not isinstance(button, dui.Button):
-                raise AttributeError("All children must be buttons")
+        self.add_item(dui.Button(
+            label=" Close Ticket ",
+            style=ButtonStyle.secondary,
+            emoji="🔒",
+            custom_id=f"manage_ticket:close:{ticket_id}"
+        ))
+        self.add_item(dui.Button(
+            label=" Permanently Delete Ticket ",
+            style=ButtonStyle.danger,
+            custom_id=f"manage_ticket:delete:{ticket_id}"
+        ))
+
+        # Nothing to listen for, don't keep the view in the view store
+        self.stop()
+
+    @classmethod
+    async def on_button(cls, inter:Inter, match:re.Match):
+        """Handle a press of the buttons of any ticket
+
+        Args:
+            inter (Inter): The button interaction.
+            match (re.Match): The match of the button's custom_id.
+        """
+
+        ticket_id = int(match.group("ticket_id"))
 
-            button.custom_id += str(ticket_id)
+        if match.group("action") == "close":
+            await cls.close_ticket(inter, ticket_id)
+        else:
+            await cls.delete_ticket(inter, ticket_id)
 
-    @dui.button(
-        label=" Close Ticket ",
-        style=ButtonStyle.secondary,
-        emoji="🔒",
-        custom_id="manage_ticket:close:"
-    )
-    async def close_ticket(self, inter:Inter, button:dui.Button):
+    @classmethod
+    async def close_ticket(cls, inter:Inter, ticket_id:int):
         """Close the ticket. A closed ticket can be reopened"""
 
-        if not self._deleting:
-            db.execute(
-                "UPDATE tickets SET active = 0 WHERE id = ?",
-                self._ticket_id
-            )
+        if ticket_id not in cls._deleting:
+            db.execute(TICKET_CLOSE_SQL, ticket_id, inter.guild.id)
 
-        await self.delete_ticket_channel(inter)
+        # Keep the history, so it can be summarised if it's reopened
+        await cls.delete_ticket_channel(inter, ticket_id, archive=True)
 
-    @dui.button(
-        label=" Permanently Delete Ticket ",
-        style=ButtonStyle.danger,
-        custom_id="manage_ticket:delete:"
-    )
-    async def delete_ticket(self, inter:Inter, button:dui.Button):
+    @classmethod
+    async def delete_ticket(cls, inter:Inter, ticket_id:int):
         """Delete the ticket. A deleted ticket cannot be reopened"""
 
-        if not self._deleting:
+        if ticket_id not in cls._deleting:
+            transcripts.delete(ticket_id)
             db.execute(
-                "DELETE FROM tickets WHERE id = ?",
-                self._ticket_id
+                "DELETE FROM tickets WHERE id = ? AND guild_id = ?",
+                ticket_id, inter.guild.id
             )
 
-        await self.delete_ticket_channel(inter)
+        await cls.delete_ticket_channel(inter, ticket_id)
 
-    async def delete_ticket_channel(self, inter:Inter):
-        """Delete the ticket channel when we are done with it"""
+    @classmethod
+    async def delete_ticket_channel(
+        cls,
+        inter:Inter,
+        ticket_id:int,
+        archive:bool=False
+    ):
+        """Delete the ticket channel when we are done with it
+
+        Args:
+            inter (Inter): The button interaction.
+            ticket_id (int): The ticket ID.
+            archive (bool, optional): Archive the channel's history
+                to the ticket's transcript first.
+        """
 
         # Flag that we are deleting the ticket
         # Prevents buttons from being used twice
-        if self._deleting:
+        if ticket_id in cls._deleting:
             await inter.response.send_message(
                 "You can't close/delete the ticket twice!",
                 ephemeral=True
             )
             return
 
-        self._deleting = True
+        cls._deleting.add(ticket_id)
+        try:
+            await cls._delete_ticket_channel(inter, ticket_id, archive)
+        finally:
+            cls._deleting.discard(ticket_id)
+
+    @staticmethod
+    async def _delete_ticket_channel(
+        inter:Inter,
+        ticket_id:int,
+        archive:bool
+    ):
+        """Warn the ticket channel, then archive and delete it"""
 
         log.debug(
             "Attempting to delete ticket channel %s from %s",
@@ -272,6 +324,15 @@ class ManageTicketView(dui.View):
         await asyncio.sleep(seconds)
         await inter.delete_original_response()
 
+        if archive:
+            try:
+                await transcripts.archive(ticket_id, inter.channel)
+            except (discord.HTTPException, OSError) as err:
+                log.error(
+                    "Failed to archive ticket #%s: %s",
+                    ticket_id, err
+                )
+
         # Try to delete the channel
         # If we can't delete the channel, log the error
         try:
@@ -316,77 +377,35 @@ class ExpClusterView(discord.ui.View):
 
 
 class EmbedPageView(discord.ui.View):
-    """Controls for the embed page view"""
-
-    def __init__(self, multi_embed):
-        super().__init__(timeout=None)
-        self.multi_embed = multi_embed
-
-    async def _btn_event(self, inter:Inter, page:int):
-        """Handle the button press event"""
+    """Controls for an EmbedPageManager.
 
-        log.debug('Button pressed for page: %s', page)
+    The buttons hold the manager's source, key and the page they turn
+    to in their custom_id, and are handled by the manager through the
+    bot's interaction router rather than by this view.
+    """
 
-        if page not in range(0, self.multi_embed.pages):
-            log.debug('Invalid page: %s', page)
-            await self.multi_embed.send(inter)
-            return
-
-        log.debug('Moving to page: %s', page)
-
-        self.multi_embed.current_page = page
-        await self.multi_embed.send(inter)
-
-    async def update_buttons(self, inter:Inter):
-        """Update the buttons"""
-
-        log.debug('Updating buttons')
-
-        self.children[0].disabled = self.on_first_page
-        self.children[1].disabled = self.on_last_page
-
-        if inter.response.is_done():
-            await inter.edit_original_response(view=self)
-
-    @property
-    def on_first_page(self) -> bool:
-        """Check if the current page is the first page"""
-
-        return self.multi_embed.current_page == 0
-
-    @property
-    def on_last_page(self) -> bool:
-        """Check if the current page is the last page"""
-
-        return self.multi_embed.current_page \
-            == self.multi_embed.pages - 1
-
-    @discord.ui.button(
-        label='Prev Page',
-        style=discord.ButtonStyle.secondary,
-        custom_id='prev_page',
-    )
-    async def prev_page(self, inter:Inter, _):
-        """When the next page button has been pressed"""
-
-        await self._btn_event(inter, self.multi_embed.current_page - 1)
-
-    @discord.ui.button(
-        label='Next Page',
-        style=discord.ButtonStyle.primary,
-        custom_id='next_page',
-    )
-    async def next_page(self, inter:Inter, _):
-        """When the next page button has been pressed"""
-
-        await self._btn_event(inter, self.multi_embed.current_page + 1)
-
-    @discord.ui.button(
-        label='Delete',
-        style=discord.ButtonStyle.danger,
-        custom_id='delete'
-    )
-    async def delete(self, inter:Inter, _):
-        """When the delete button has been pressed"""
+    def __init__(self, source:str, key:str, page:int, has_next:bool):
+        super().__init__(timeout=None)
 
-        await self.multi_embed.delete()
+        prefix = f'pages:{source}:{key}'
+
+        self.add_item(dui.Button(
+            label='Prev Page',
+            style=ButtonStyle.secondary,
+            custom_id=f'{prefix}:{max(page - 1, 0)}',
+            disabled=page == 0
+        ))
+        self.add_item(dui.Button(
+            label='Next Page',
+            style=ButtonStyle.primary,
+            custom_id=f'{prefix}:{page + 1}',
+            disabled=not has_next
+        ))
+        self.add_item(dui.Button(
+            label='Delete',
+            style=ButtonStyle.danger,
+            custom_id=f'{prefix}:delete'
+        ))
+
+        # Nothing to listen for, don't keep the view in the view store
+        self.stop()